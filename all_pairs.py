@@ -0,0 +1,75 @@
+from typing import List, Optional, Tuple
+import networkx as nx
+import numpy as np
+from batch_routing import shortest_path_trees
+from core_graph import CoreGraph
+
+FLOYD_WARSHALL_MAX_NODES = 500  # Above this, repeated Dijkstra in a process pool is cheaper than O(V^3)
+
+def floyd_warshall(weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized Floyd–Warshall over a dense weight matrix (inf where there is no edge).
+    Returns the distance matrix and the next-hop matrix (-1 where j is unreachable from i).
+    """
+    n = len(weights)
+    dist = np.array(weights, dtype=np.float64)
+    np.fill_diagonal(dist, 0.0)
+    next_hops = np.where(np.isfinite(dist), np.arange(n)[None, :], -1).astype(np.int32)
+
+    for k in range(n):
+        through = dist[:, k, None] + dist[None, k, :]
+        better = through < dist
+        dist = np.where(better, through, dist)
+        # Going through k, the first hop from i is the first hop from i towards k
+        next_hops = np.where(better, next_hops[:, k, None], next_hops)
+
+    return dist, next_hops
+
+class ShortestPathTable:
+    """
+    All-pairs shortest-path distances and next-hop pointers over a small static graph.
+    Paths are recovered by following next hops, in O(path length).
+    """
+
+    def __init__(self, names: List[str], distances: np.ndarray, next_hops: np.ndarray):
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self.distances = distances
+        self.next_hops = next_hops
+
+    @classmethod
+    def from_core(cls, core: CoreGraph, processes: Optional[int] = None) -> "ShortestPathTable":
+        """Build the table from the CSR arrays of a core graph"""
+        return cls.from_csr(list(core.names), core.offsets, core.targets, core.weights, processes=processes)
+
+    @classmethod
+    def from_csr(cls, names: List[str], offsets: np.ndarray, targets: np.ndarray, weights: np.ndarray,
+                 processes: Optional[int] = None) -> "ShortestPathTable":
+        """Build the table with Floyd–Warshall for small graphs, or repeated Dijkstra in a process pool"""
+        sources = np.repeat(np.arange(len(names)), np.diff(offsets))
+        if len(names) <= FLOYD_WARSHALL_MAX_NODES:
+            matrix = np.full((len(names), len(names)), np.inf)
+            np.minimum.at(matrix, (sources, targets), weights)
+            np.minimum.at(matrix, (targets, sources), weights)
+            distances, next_hops = floyd_warshall(matrix)
+        else:
+            distances, prev = shortest_path_trees(offsets, targets, weights, range(len(names)), processes=processes)
+            # The graph is undirected, so the first hop from i towards j is i's predecessor in j's tree
+            next_hops = prev.T.astype(np.int32)
+            np.fill_diagonal(next_hops, np.arange(len(names)))
+
+        return cls(names, distances, next_hops)
+
+    def path(self, start: str, end: str) -> Tuple[List[str], float]:
+        """Return the shortest path between two nodes and its length"""
+        if start not in self.index or end not in self.index:
+            raise nx.NodeNotFound(f"{start if start not in self.index else end} is not in the graph")
+        i, j = self.index[start], self.index[end]
+        if not np.isfinite(self.distances[i, j]):
+            raise nx.NetworkXNoPath(f"No path between {start} and {end}")
+
+        path = [start]
+        while i != j:
+            i = int(self.next_hops[i, j])
+            path.append(self.names[i])
+        return path, float(self.distances[self.index[start], j])
@@ -0,0 +1,158 @@
+import heapq
+from operator import itemgetter
+from typing import List, Optional, Tuple
+import networkx as nx
+import numpy as np
+from metrics import record_search
+from landmarks import LandmarkIndex
+from profiles import DEFAULT_PROFILE
+from way_network import WayNetwork
+
+MAX_STRETCH = 1.4  # Alternatives may be at most this many times as costly as the shortest route
+MAX_OVERLAP = 0.6  # ...share at most this fraction of the shortest route's cost with any route already chosen
+MIN_PLATEAU = 0.2  # ...and follow both search trees for at least this fraction of it (local optimality)
+
+def _bounded_tree(offsets: List[int], targets: List[int], weights: List[float], source: int, target: int,
+                  stretch: float, bound: List[float], limit: float = float('inf')
+                  ) -> Tuple[List[float], List[int], List[int]]:
+    """
+    A* from `source`, where `bound` is a consistent lower bound on each node's distance to the other end,
+    settling every node `v` with dist(v) + bound[v] <= limit. Without a given limit, it becomes `stretch`
+    times the source-target distance once the target is settled.
+    Returns the distances and predecessors (exact for settled nodes) and the settled nodes in order.
+    """
+    n = len(offsets) - 1
+    dist = [float('inf')] * n
+    prev = [-1] * n
+    settled = bytearray(n)
+    order = []
+    dist[source] = 0.0
+    heap = [(bound[source], source)]
+    unbounded = limit == float('inf')
+    pop, push = heapq.heappop, heapq.heappush
+
+    while heap:
+        key, u = pop(heap)
+        if settled[u]:
+            continue
+        if key > limit:
+            break
+        settled[u] = 1
+        order.append(u)
+        d = dist[u]  # Final once settled, as the first entry popped for a node is its cheapest
+        if unbounded and u == target:
+            limit = stretch * d
+            unbounded = False
+        for i in range(offsets[u], offsets[u + 1]):
+            v = targets[i]
+            nd = d + weights[i]
+            if nd < dist[v]:
+                key = nd + bound[v]
+                if key <= limit:
+                    dist[v] = nd
+                    prev[v] = u
+                    push(heap, (key, v))
+    return dist, prev, order
+
+def _via_path(via: int, source: int, target: int, forward_prev: List[int], backward_prev: List[int]) -> List[int]:
+    # Source tree up to the via node, then the target tree on to the target
+    path = [via]
+    while path[-1] != source:
+        path.append(forward_prev[path[-1]])
+    path.reverse()
+    while path[-1] != target:
+        path.append(backward_prev[path[-1]])
+    return path
+
+def _path_costs(path: List[int], via: int, forward: List[float], backward: List[float]) -> np.ndarray:
+    # Cost of each edge along a via path: the difference of the tree distances at its ends
+    split = path.index(via)
+    through = forward[via] + backward[via]
+    return np.diff([forward[v] for v in path[:split]] + [through - backward[v] for v in path[split:]])
+
+def _positions(path: List[int], n: int) -> np.ndarray:
+    # Each node's index along a path, -1 for nodes off it
+    positions = np.full(n, -1)
+    positions[path] = np.arange(len(path))
+    return positions
+
+def alternative_paths(network: WayNetwork, source: int, target: int, k: int = 3, profile: str = DEFAULT_PROFILE,
+                      max_stretch: float = MAX_STRETCH, max_overlap: float = MAX_OVERLAP,
+                      min_plateau: float = MIN_PLATEAU, landmarks: Optional[LandmarkIndex] = None
+                      ) -> List[Tuple[List[int], float]]:
+    """
+    Up to `k` good routes between two node indices, the shortest first, by the via-node (plateau) method.
+    One search from each end builds two shortest-path trees; a path that follows the source tree to a
+    node and the target tree on from it is a candidate, and all candidates, the shortest route among them,
+    come from these two trees, so asking for more alternatives costs no further searches. Where the trees
+    share a stretch of edges (a plateau), the candidate is locally a shortest path along it; a candidate
+    is kept if its plateau covers at least `min_plateau` of the shortest cost, it costs at most `max_stretch`
+    times the shortest, and it shares at most `max_overlap` of the shortest cost with every route already
+    chosen. Costs are in the units of `profile`. Given `landmarks`, their lower bounds guide the search
+    from the source instead of straight-line distances, which are looser.
+    """
+    offsets, targets, weights = network._offsets, network._targets, network._profile_weights[profile]
+    n = len(offsets) - 1
+
+    # Both searches only settle nodes that could lie on a path within the stretch limit: the forward one
+    # guided by a lower bound on the distance to the target (scaled to the profile's cheapest cost per meter),
+    # the backward one by the exact distances the forward search found
+    meters = network.straight_line_distances(target) if landmarks is None else landmarks.lower_bounds(target)
+    bound = (meters * network.min_cost_per_meter[profile]).tolist()
+    forward, forward_prev, forward_order = _bounded_tree(offsets, targets, weights, source, target,
+                                                         max_stretch, bound)
+    best = forward[target]
+    if best == float('inf'):
+        record_search("alternatives", len(forward_order))
+        raise nx.NetworkXNoPath(f"No walkway path between {source} and {target}")
+    if source == target:
+        record_search("alternatives", len(forward_order))
+        return [([source], 0.0)]
+    limit = max_stretch * best
+    backward, backward_prev, backward_order = _bounded_tree(offsets, targets, weights, target, source,
+                                                            max_stretch, forward, limit)
+    record_search("alternatives", len(forward_order) + len(backward_order))
+
+    # The backward search settles exactly the nodes on some path within the limit, all of them settled
+    # by the forward search too. Plateaus are chains of edges both trees use: a node continues its
+    # source-tree parent's plateau when the parent's own parent in the target tree is the node. Every node
+    # of a plateau is a via node of the same path, so each plateau is one candidate: its node farthest from
+    # the source, which its target-tree parent doesn't continue from (the target always ends one). Arrays
+    # hold just these nodes, as converting whole search lists would cost more than the pass itself.
+    nodes = np.array(backward_order)
+    toward_source = itemgetter(*backward_order)(forward_prev)
+    toward_target = itemgetter(*backward_order)(backward_prev)
+    continues = np.array(itemgetter(*toward_source)(backward_prev)) == nodes
+    is_end = np.array(itemgetter(*toward_target)(forward_prev)) != nodes
+    # The source and target have -1 parents, which would index the last node
+    continues[backward_order.index(source)] = False
+    is_end[0] = True  # backward_order starts at the target
+
+    # Cheapest first; the cheapest is the shortest route. The others need a plateau of at least one edge.
+    ends = nodes[is_end]
+    costs = np.array(itemgetter(*ends.tolist())(forward)) + np.array(itemgetter(*ends.tolist())(backward))
+    ranked = np.argsort(costs, kind='stable')
+    shortest_path = _via_path(int(ends[ranked[0]]), source, target, forward_prev, backward_prev)
+    chosen = [(shortest_path, best)]
+    chosen_positions = [_positions(shortest_path, n)]
+    for via in ends[ranked[1:][continues[is_end][ranked[1:]]]].tolist():
+        if len(chosen) == k:
+            break
+        # The plateau runs back along the source tree from its end for as long as it continues
+        start = via
+        while start != source and backward_prev[forward_prev[start]] == start:
+            start = forward_prev[start]
+        if forward[via] - forward[start] < min_plateau * best:
+            continue
+        path = _via_path(via, source, target, forward_prev, backward_prev)
+        if len(set(path)) != len(path):
+            continue  # Loops back on itself
+        # Edges shared with a chosen route join nodes that are next to each other along it
+        edge_costs = _path_costs(path, via, forward, backward)
+        shared = [positions[path] for positions in chosen_positions]
+        if any(edge_costs[(np.minimum(p[:-1], p[1:]) >= 0) & (np.abs(np.diff(p)) == 1)].sum() > max_overlap * best
+               for p in shared):
+            continue
+        chosen.append((path, forward[via] + backward[via]))
+        chosen_positions.append(_positions(path, n))
+    return chosen
@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import signal
+import socket
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import networkx as nx
+from graph_algorithms import CampusGraph
+from metrics import inc, timer
+from profiles import DEFAULT_PROFILE, PROFILES
+from way_network import route_points
+
+ROUTE_ALGORITHMS = ("dijkstra", "astar", "bidijkstra", "biastar", "precomputed", "network", "alt")
+MATRIX_ALGORITHMS = ("dijkstra", "precomputed", "network")
+MAX_BODY = 1 << 20  # bytes
+MAX_MATRIX_CELLS = 250_000
+MAX_TOUR_STOPS = 200
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+class APIError(Exception):
+    """An error returned to the client as {"error": message} with an HTTP status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def _param(params: Dict[str, Any], name: str) -> Any:
+    value = params.get(name)
+    if value is None or value == "":
+        raise APIError(400, f"missing parameter '{name}'")
+    return value
+
+def _string(params: Dict[str, Any], name: str, default: Optional[str] = None) -> str:
+    value = params.get(name, default) if default is not None else _param(params, name)
+    if not isinstance(value, str):
+        raise APIError(400, f"parameter '{name}' must be a string")
+    return value
+
+def _number(params: Dict[str, Any], name: str, default: Optional[float] = None) -> float:
+    value = params.get(name, default)
+    if value is None:
+        raise APIError(400, f"missing parameter '{name}'")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise APIError(400, f"parameter '{name}' must be a number") from None
+
+def _names(params: Dict[str, Any], name: str) -> List[str]:
+    # Lists come as JSON arrays in a POST body, or as '|'-separated query parameters
+    value = _param(params, name)
+    names = value if isinstance(value, list) else str(value).split("|")
+    if not names or not all(isinstance(loc, str) and loc for loc in names):
+        raise APIError(400, f"parameter '{name}' must be a non-empty list of location names")
+    return names
+
+class RoutingAPI:
+    """JSON endpoints over one CampusGraph: paths, distances and GeoJSON, with no map rendering."""
+
+    def __init__(self, campus: CampusGraph):
+        self.campus = campus
+        self.routes = {
+            "/locations": self.locations,
+            "/route": self.route,
+            "/nearest": self.nearest,
+            "/matrix": self.matrix,
+            "/tour": self.tour,
+        }
+
+    def handle(self, method: str, target: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        """Dispatch one request, returning the status and JSON payload"""
+        url = urlsplit(target)
+        endpoint = self.routes.get(url.path)
+        if endpoint is None:
+            return 404, {"error": f"unknown endpoint {url.path}"}
+        if method not in ("GET", "POST"):
+            return 405, {"error": "use GET or POST"}
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        with timer("giki_api_request_seconds", endpoint=url.path):
+            try:
+                if method == "POST" and body:
+                    payload = json.loads(body)
+                    if not isinstance(payload, dict):
+                        raise APIError(400, "the request body must be a JSON object")
+                    params.update(payload)
+                return 200, endpoint(params)
+            except APIError as e:
+                return e.status, {"error": str(e)}
+            except json.JSONDecodeError as e:
+                return 400, {"error": f"invalid JSON: {e}"}
+            except nx.NodeNotFound as e:
+                return 404, {"error": str(e)}
+            except nx.NetworkXNoPath as e:
+                return 404, {"error": str(e)}
+
+    def locations(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        positions = self.campus.node_positions
+        return {"locations": [{"name": name, "lat": lat, "lon": lon} for name, (lat, lon) in positions.items()]}
+
+    def route(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        start, end = _string(params, "from"), _string(params, "to")
+        algorithm = _string(params, "algorithm", "dijkstra")
+        if algorithm not in ROUTE_ALGORITHMS:
+            raise APIError(400, f"algorithm must be one of {', '.join(ROUTE_ALGORITHMS)}")
+        profile = _string(params, "profile", DEFAULT_PROFILE)
+        if profile not in PROFILES:
+            raise APIError(400, f"profile must be one of {', '.join(PROFILES)}")
+        campus = self.campus
+        if algorithm in ("network", "alt") or profile != DEFAULT_PROFILE:
+            route = campus.find_route(start, end, algorithm="alt" if algorithm == "alt" else "dijkstra", profile=profile)
+            path, distance = list(route.path), route.distance
+            coordinates = route_points(route) or [campus.node_positions[start]]
+        else:
+            path, distance = campus.find_path(start, end, algorithm=algorithm)
+            coordinates = [campus.node_positions[loc] for loc in path]
+        feature = {"type": "Feature",
+                   "geometry": {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in coordinates]},
+                   "properties": {"from": start, "to": end, "distance": distance, "algorithm": algorithm,
+                                  "profile": profile}}
+        return {"path": path, "distance": distance, "algorithm": algorithm, "profile": profile, "geojson": feature}
+
+    def nearest(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        lat, lon = _number(params, "lat"), _number(params, "lon")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise APIError(400, "lat/lon out of range")
+        if "radius" in params:
+            radius = _number(params, "radius")
+            if not radius >= 0:
+                raise APIError(400, "parameter 'radius' must not be negative")
+            found = self.campus.locations_within(lat, lon, radius)
+        else:
+            found = [self.campus.nearest_location(lat, lon)]
+        return {"locations": [{"name": name, "distance": float(distance)} for name, distance in found]}
+
+    def matrix(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        sources, targets = _names(params, "sources"), _names(params, "targets")
+        algorithm = _string(params, "algorithm", "dijkstra")
+        if algorithm not in MATRIX_ALGORITHMS:
+            raise APIError(400, f"algorithm must be one of {', '.join(MATRIX_ALGORITHMS)}")
+        if len(sources) * len(targets) > MAX_MATRIX_CELLS:
+            raise APIError(413, f"at most {MAX_MATRIX_CELLS} source-target pairs per request")
+        # Searched inline: each worker process already has a core to itself, and starting a pool per
+        # request from a forked worker would cost more than the searches
+        distances, _ = self.campus.find_paths_batch(sources, targets, algorithm=algorithm, processes=1)
+        return {"sources": sources, "targets": targets, "algorithm": algorithm,
+                "distances": [[d if math.isfinite(d) else None for d in row] for row in distances.tolist()]}
+
+    def tour(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        stops = _names(params, "stops")
+        algorithm = _string(params, "algorithm", "dijkstra")
+        if algorithm not in MATRIX_ALGORITHMS:
+            raise APIError(400, f"algorithm must be one of {', '.join(MATRIX_ALGORITHMS)}")
+        if len(stops) > MAX_TOUR_STOPS:
+            raise APIError(413, f"at most {MAX_TOUR_STOPS} stops per tour")
+        return_to_start = params.get("return", True)
+        if isinstance(return_to_start, str):
+            if return_to_start.lower() not in ("true", "false", "1", "0"):
+                raise APIError(400, "parameter 'return' must be true or false")
+            return_to_start = return_to_start.lower() in ("true", "1")
+        tour = self.campus.plan_tour(stops, return_to_start=bool(return_to_start), algorithm=algorithm, processes=1)
+        if tour.route is not None:
+            coordinates = route_points(tour.route) or [self.campus.node_positions[tour.stops[0]]]
+        else:
+            coordinates = [self.campus.node_positions[loc] for loc in tour.path]
+        feature = {"type": "Feature",
+                   "geometry": {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in coordinates]},
+                   "properties": {"stops": tour.stops, "distance": tour.distance, "algorithm": algorithm}}
+        return {"stops": tour.stops, "distance": tour.distance, "path": tour.path, "optimal": tour.optimal,
+                "algorithm": algorithm, "geojson": feature}
+
+def _response(status: int, payload: Dict[str, Any], keep_alive: bool) -> bytes:
+    body = json.dumps(payload, allow_nan=False).encode()
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+async def _handle_connection(api: RoutingAPI, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    # Minimal HTTP/1.1 with keep-alive: one request at a time per connection
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                break
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ", 2)
+            except ValueError:
+                writer.write(_response(400, {"error": "malformed request line"}, False))
+                break
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            keep_alive = (headers.get("connection", "").lower() != "close"
+                          and (version == "HTTP/1.1" or headers.get("connection", "").lower() == "keep-alive"))
+            length = headers.get("content-length", "0")
+            length = int(length) if length.isdigit() else -1
+            if not 0 <= length <= MAX_BODY:
+                writer.write(_response(413, {"error": "invalid or oversized Content-Length"}, False))
+                break
+            body = await reader.readexactly(length) if length else b""
+            try:
+                status, payload = api.handle(method, target, body)
+            except Exception as e:
+                inc("giki_api_errors_total")
+                print(f"Error handling {method} {target}: {e!r}")
+                status, payload = 500, {"error": "internal error"}
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def serve_socket(api: RoutingAPI, sock: socket.socket) -> None:
+    """Serve the API on an already bound and listening socket until cancelled"""
+    server = await asyncio.start_server(lambda r, w: _handle_connection(api, r, w), sock=sock)
+    async with server:
+        await server.serve_forever()
+
+def _run_worker(api: RoutingAPI, sock: socket.socket) -> None:
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        asyncio.run(serve_socket(api, sock))
+    except KeyboardInterrupt:
+        pass
+
+def serve(campus: CampusGraph, host: str = "0.0.0.0", port: int = 8080, workers: int = 1) -> None:
+    """
+    Serve the JSON API with `workers` processes sharing one listening socket.
+    The graph is loaded once before forking, so workers share its memory copy-on-write
+    (the compiled cache's arrays are memory-mapped and shared outright).
+    Without os.fork (Windows), a single in-process worker is used.
+    """
+    api = RoutingAPI(campus)
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.setblocking(False)
+    print(f"Serving on http://{host}:{sock.getsockname()[1]} with {workers} worker(s)", flush=True)
+    if workers <= 1 or not hasattr(os, "fork"):
+        _run_worker(api, sock)
+        return
+
+    # Stop the workers when the parent is terminated too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(api, sock)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve GIKI Campus Navigator routing as a JSON API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--osm", default="giki.osm", help="OSM file the graph is compiled from")
+    parser.add_argument("--cache", default="giki.graph", help="compiled graph cache")
+    parser.add_argument("--precompute", action="store_true", help="build the all-pairs table before forking")
+    args = parser.parse_args(argv)
+
+    campus = CampusGraph.from_cache(args.cache, osm_file=args.osm, precompute=args.precompute)
+    # Build the lazily created search structures once, so workers inherit them instead of each building a copy
+    campus.astar_search()
+    campus.bidirectional_search()
+    campus.location_resolver()
+    serve(campus, args.host, args.port, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import asyncio
 import streamlit as st
 from graph_algorithms import CampusGraph
 import google.generativeai as genai
@@ -6,6 +7,9 @@ import os
 import folium
 from streamlit_folium import folium_static
 import time
+from gemini_client import AsyncGeminiClient
+from profiles import DEFAULT_PROFILE, PROFILES
+from metrics import request_trace, serve_metrics_from_env, settled_counter
 
 # Load environment variables
 load_dotenv()
@@ -29,13 +33,34 @@ try:
 except Exception as e:
     st.error(f"❌ Error configuring Gemini API: {str(e)}")
 
+# Algorithms compared on the Algorithm Analysis page: display name, find_path name, time complexity
+COMPARED_ALGORITHMS = [
+    ("Dijkstra's Algorithm", "dijkstra", "O(E + V log V)"),
+    ("A* Algorithm", "astar", "O(E) in best case, O(E + V log V) in worst case"),
+    ("Bidirectional Dijkstra", "bidijkstra", "O(E + V log V), about half the search radius per side"),
+    ("Bidirectional A*", "biastar", "O(E) in best case, O(E + V log V) in worst case"),
+]
+
 # Initialize campus graph
 @st.cache_resource
 def get_campus_graph():
-    return CampusGraph()
+    # Load the compiled graph cache, rebuilding it only when giki.osm changes
+    return CampusGraph.from_cache("giki.graph", osm_file="giki.osm", precompute=True)
 
 campus = get_campus_graph()
 
+# Expose /metrics when GIKI_METRICS_PORT is set (started once per server process)
+@st.cache_resource
+def start_metrics_endpoint():
+    return serve_metrics_from_env()
+
+start_metrics_endpoint()
+
+# One client per server process, so every session shares its concurrency limit and event loop
+@st.cache_resource
+def get_gemini_client():
+    return AsyncGeminiClient(model, timeout=15.0, deadline=30.0)
+
 def get_gemini_response(question):
     """Get response from Gemini API"""
     try:
@@ -57,10 +82,13 @@ def get_gemini_response(question):
         
         Answer:"""
         
-        response = model.generate_content(prompt)
-        if not response.text:
+        gemini = get_gemini_client()
+        text = gemini.run(gemini.generate(prompt, call="campus_information"))
+        if not text:
             return "I couldn't generate a response. Please try rephrasing your question."
-        return response.text
+        return text
+    except asyncio.TimeoutError:
+        return "Gemini is taking too long to respond. Please try again in a moment."
     except Exception as e:
         return f"Error getting response: {str(e)}. Please check your internet connection and API key."
 
@@ -261,22 +289,39 @@ def main():
         locations = list(campus.graph.nodes())
         
         # Create columns for inputs
-        col1, col2, col3 = st.columns([2, 2, 1])
+        col1, col2, col3, col4 = st.columns([2, 2, 1, 1])
         with col1:
             start = st.selectbox("📍 Starting Point", locations, index=0)
         with col2:
             end = st.selectbox("🏁 Destination", locations, index=1)
         with col3:
-            algorithm = st.selectbox("🔍 Algorithm", ["Dijkstra", "A*"], 
-                                   help="Dijkstra: Guaranteed shortest path\nA*: Faster with heuristic")
+            algorithm = st.selectbox("🔍 Algorithm", ["Dijkstra", "A*", "Walkways", "Precomputed"], 
+                                   help="Dijkstra: Guaranteed shortest path\nA*: Faster with heuristic\nWalkways: Follows the real campus paths\nPrecomputed: Instant lookup in an all-pairs table")
+        with col4:
+            profile = st.selectbox("🚶 Profile", list(PROFILES),
+                                   format_func=lambda name: name.replace("_", " ").capitalize(),
+                                   help="What the route minimizes along the walkways: distance, walking time, avoiding steps and rough ground, or preferring lit paths")
+        show_alternatives = st.checkbox("🔀 Show alternative routes",
+                                        help="Up to two other walkway routes that avoid most of the best one, for when a path is crowded")
         
         if st.button("Find Path 🚀"):
             try:
                 with st.spinner("🔍 Finding the best path..."):
-                    start_time = time.time()
-                    path, distance = campus.find_path(start, end, 
-                                                    algorithm="astar" if algorithm == "A*" else "dijkstra")
-                    execution_time = time.time() - start_time
+                    start_time = time.perf_counter()
+                    route = None
+                    alternatives = []
+                    if show_alternatives:
+                        # Alternatives follow the walkways, like profiles
+                        route, *alternatives = campus.find_alternatives(start, end, k=3, profile=profile)
+                        path, distance = route.path, route.distance
+                    elif algorithm == "Walkways" or profile != DEFAULT_PROFILE:
+                        # Profiles are computed from way tags, so they always follow the walkways
+                        route = campus.find_route(start, end, profile=profile)
+                        path, distance = route.path, route.distance
+                    else:
+                        path, distance = campus.find_path(start, end, 
+                                                        algorithm={"A*": "astar", "Precomputed": "precomputed"}.get(algorithm, "dijkstra"))
+                    execution_time = time.perf_counter() - start_time
                 
                 # Display results in columns
                 col1, col2 = st.columns(2)
@@ -288,13 +333,43 @@ def main():
                     
                     # Display algorithm info
                     st.markdown("### Algorithm Info:")
-                    if algorithm == "A*":
+                    if route is not None:
+                        st.markdown("""
+                        <div class="algorithm-info">
+                        
+                        - Walkway Routing: Dijkstra's algorithm over the real OSM walkway network
+                        
+                        - Snapping: Each location is joined to its closest walkway node
+                        
+                        - Guarantee: Always finds the shortest walking route
+                        
+                        - Time Complexity: O(E + V log V) over a compact array-backed graph
+                        
+                        - Space Complexity: O(V)
+                        </div>
+                        """, unsafe_allow_html=True)
+                    elif algorithm == "Precomputed":
+                        st.markdown("""
+                        <div class="algorithm-info">
+                        
+                        - Precomputed Routing: All-pairs distances and next hops are computed once at load time
+                        
+                        - Preprocessing: Floyd–Warshall, or repeated Dijkstra in a process pool for larger graphs
+                        
+                        - Guarantee: Always finds the shortest path
+                        
+                        - Time Complexity: O(path length) per query after O(V^3) preprocessing
+                        
+                        - Space Complexity: O(V^2)
+                        </div>
+                        """, unsafe_allow_html=True)
+                    elif algorithm == "A*":
                         st.markdown("""
                         <div class="algorithm-info">
                         
                         - A* Algorithm: Uses heuristic (straight-line distance) to find path faster
                         
-                        - Heuristic: Haversine distance between points
+                        - Heuristic: Straight-line distance between precomputed 3D coordinates
                         
                         - Guarantee: Still finds the shortest path
                         
@@ -317,6 +392,15 @@ def main():
                         </div>
                         """, unsafe_allow_html=True)
                     
+                    if show_alternatives:
+                        st.markdown("### Alternatives:")
+                        if not alternatives:
+                            st.markdown("<div style='color: #ffffff;'>No other route avoids most of this one.</div>", unsafe_allow_html=True)
+                        for i, alternative in enumerate(alternatives, 1):
+                            extra = alternative.distance - distance
+                            st.markdown(f"<div style='color: #ffffff;'>{i}. {alternative.distance:.2f} meters ({extra:+.0f} m) via {' → '.join(alternative.path)}</div>",
+                                        unsafe_allow_html=True)
+                    
                     st.markdown(f"### Performance Metrics")
                     st.markdown(f"""
                     <div class="algorithm-info">
@@ -328,11 +412,46 @@ def main():
                 
                 with col2:
                     st.markdown("### Map View")
-                    m = campus.visualize_path(path)
+                    m = campus.visualize_path(path, route=route, walkways=route is not None, clip_margin=150,
+                                              alternatives=alternatives)
                     folium_static(m)
                 
             except Exception as e:
                 st.error(f"❌ Error finding path: {str(e)}")
+        
+        # Multi-stop tours: the visiting order is optimized, starting from the first stop picked
+        st.markdown("---")
+        st.markdown("### 🧭 Plan a Tour")
+        tour_stops = st.multiselect("Stops to visit (the tour starts at the first one)", locations)
+        return_to_start = st.checkbox("Return to the first stop", value=True)
+        
+        if st.button("Plan Tour 🗺️"):
+            if len(tour_stops) < 2:
+                st.warning("⚠️ Please pick at least two stops.")
+            else:
+                try:
+                    with st.spinner("🔍 Finding the best order..."):
+                        tour = campus.plan_tour(tour_stops, return_to_start=return_to_start,
+                                                algorithm="network" if algorithm == "Walkways" else "dijkstra")
+                    
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.success(f"✅ Tour planned! Total distance: {tour.distance:.2f} meters")
+                        st.markdown("### Visiting Order:")
+                        for i, stop in enumerate(tour.stops, 1):
+                            st.markdown(f"<div style='color: #ffffff;'>{i}. {stop}</div>", unsafe_allow_html=True)
+                        st.markdown(f"""
+                        <div class="algorithm-info">
+                        - Order: {"Shortest possible (Held–Karp dynamic programming)" if tour.optimal else "Best found by 2-opt / Or-opt local search"}
+                        - Path Length: {len(tour.path)} locations
+                        </div>
+                        """, unsafe_allow_html=True)
+                    with col2:
+                        st.markdown("### Map View")
+                        m = campus.visualize_path(tour.path, route=tour.route, walkways=tour.route is not None, clip_margin=150)
+                        folium_static(m)
+                except Exception as e:
+                    st.error(f"❌ Error planning tour: {str(e)}")
     
     elif page == "📊 Algorithm Analysis":
         st.markdown("""
@@ -354,74 +473,57 @@ def main():
         if st.button("Compare Algorithms 🚀"):
             try:
                 with st.spinner("🔍 Analyzing algorithms..."):
-                    # Run Dijkstra's algorithm
-                    dijkstra_start = time.time()
-                    dijkstra_path, dijkstra_distance = campus.find_path(start, end, algorithm="dijkstra")
-                    dijkstra_time = time.time() - dijkstra_start
-                    
-                    # Run A* algorithm
-                    astar_start = time.time()
-                    astar_path, astar_distance = campus.find_path(start, end, algorithm="astar")
-                    astar_time = time.time() - astar_start
+                    # Each algorithm runs uncached, counting the nodes its search settles
+                    results = []
+                    for name, algorithm, complexity in COMPARED_ALGORITHMS:
+                        with settled_counter() as settled:
+                            algorithm_start = time.perf_counter()
+                            path, distance = campus.search(start, end, algorithm=algorithm)
+                            elapsed = time.perf_counter() - algorithm_start
+                        results.append((name, complexity, path, distance, elapsed, sum(settled.values())))
                 
                 # Display comparison results
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown("### Dijkstra's Algorithm")
-                    st.markdown(f"""
-                    <div class="algorithm-info">
-                    <div style="margin-bottom: 10px;">~ Execution Time: {dijkstra_time:.4f} seconds</div>
-                    <div style="margin-bottom: 10px;">~ Path Length: {len(dijkstra_path)} nodes</div>
-                    <div style="margin-bottom: 10px;">~ Total Distance: {dijkstra_distance:.2f} meters</div>
-                    <div style="margin-bottom: 10px;">~ Time Complexity: O(E + V log V)</div>
-                    <div style="margin-bottom: 10px;">~ Space Complexity: O(V)</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Performance bar for Dijkstra
-                    st.markdown("### Performance")
-                    max_time = max(dijkstra_time, astar_time) if dijkstra_time > 0 and astar_time > 0 else 1
-                    st.markdown(f"""
-                    <div class="performance-bar">
-                        <div style="color: #ffffff; margin-bottom: 5px;">Execution Time: {dijkstra_time:.4f}s</div>
-                        <div class="performance-bar-fill" style="width: {min(100, (dijkstra_time/max_time)*100)}%;"></div>
-                    </div>
-                    """, unsafe_allow_html=True)
+                max_time = max(result[4] for result in results) or 1
+                max_settled = max(result[5] for result in results) or 1
+                for row in range(0, len(results), 2):
+                    columns = st.columns(2)
+                    for column, (name, complexity, path, distance, elapsed, settled) in zip(columns, results[row:row + 2]):
+                        with column:
+                            st.markdown(f"### {name}")
+                            st.markdown(f"""
+                            <div class="algorithm-info">
+                            <div style="margin-bottom: 10px;">~ Execution Time: {elapsed:.4f} seconds</div>
+                            <div style="margin-bottom: 10px;">~ Nodes Settled: {settled}</div>
+                            <div style="margin-bottom: 10px;">~ Path Length: {len(path)} nodes</div>
+                            <div style="margin-bottom: 10px;">~ Total Distance: {distance:.2f} meters</div>
+                            <div style="margin-bottom: 10px;">~ Time Complexity: {complexity}</div>
+                            <div style="margin-bottom: 10px;">~ Space Complexity: O(V)</div>
+                            </div>
+                            """, unsafe_allow_html=True)
+                            
+                            st.markdown("### Performance")
+                            st.markdown(f"""
+                            <div class="performance-bar">
+                                <div style="color: #ffffff; margin-bottom: 5px;">Execution Time: {elapsed:.4f}s</div>
+                                <div class="performance-bar-fill" style="width: {min(100, (elapsed/max_time)*100)}%;"></div>
+                            </div>
+                            <div class="performance-bar">
+                                <div style="color: #ffffff; margin-bottom: 5px;">Nodes Settled: {settled}</div>
+                                <div class="performance-bar-fill" style="width: {min(100, (settled/max_settled)*100)}%;"></div>
+                            </div>
+                            """, unsafe_allow_html=True)
                 
-                with col2:
-                    st.markdown("### A* Algorithm")
-                    st.markdown(f"""
-                    <div class="algorithm-info">
-                    <div style="margin-bottom: 10px;">~ Execution Time: {astar_time:.4f} seconds</div>
-                    <div style="margin-bottom: 10px;">~ Path Length: {len(astar_path)} nodes</div>
-                    <div style="margin-bottom: 10px;">~ Total Distance: {astar_distance:.2f} meters</div>
-                    <div style="margin-bottom: 10px;">~ Time Complexity: O(E) in best case, O(E + V log V) in worst case</div>
-                    <div style="margin-bottom: 10px;">~ Space Complexity: O(V)</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Performance bar for A*
-                    st.markdown("### Performance")
-                    st.markdown(f"""
-                    <div class="performance-bar">
-                        <div style="color: #ffffff; margin-bottom: 5px;">Execution Time: {astar_time:.4f}s</div>
-                        <div class="performance-bar-fill" style="width: {min(100, (astar_time/max_time)*100)}%;"></div>
-                    </div>
-                    """, unsafe_allow_html=True)
+                cheapest = min(results, key=lambda result: (result[5], result[4]))
+                st.info(f"On this graph ({len(locations)} locations), {cheapest[0]} settled the fewest nodes for this route.")
                 
                 # Display paths
                 st.markdown("### Path Comparison")
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.markdown("#### Dijkstra's Path")
-                    m_dijkstra = campus.visualize_path(dijkstra_path)
-                    folium_static(m_dijkstra)
-                
-                with col2:
-                    st.markdown("#### A* Path")
-                    m_astar = campus.visualize_path(astar_path)
-                    folium_static(m_astar)
+                for row in range(0, len(results), 2):
+                    columns = st.columns(2)
+                    for column, (name, _, path, _, _, _) in zip(columns, results[row:row + 2]):
+                        with column:
+                            st.markdown(f"#### {name} Path")
+                            folium_static(campus.visualize_path(path))
                 
             except Exception as e:
                 st.error(f"❌ Error comparing algorithms: {str(e)}")
@@ -448,4 +550,6 @@ def main():
                 st.warning("⚠️ Please enter a question.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Each Streamlit rerun is one request; traced when GIKI_TRACE is set
+    with request_trace("streamlit_run"):
+        main() 
\ No newline at end of file
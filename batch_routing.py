@@ -0,0 +1,74 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+PARALLEL_MIN_WORK = 200_000  # Sources x nodes below which a process pool costs more than it saves
+
+def shortest_path_tree(offsets: List[int], targets: List[int], weights: List[float],
+                       source: int) -> Tuple[List[float], List[int]]:
+    """Single-source Dijkstra over CSR lists, returning distances (inf if unreachable) and predecessors (-1)"""
+    dist = [float('inf')] * (len(offsets) - 1)
+    prev = [-1] * (len(offsets) - 1)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for i in range(offsets[u], offsets[u + 1]):
+            v = targets[i]
+            nd = d + weights[i]
+            if nd < dist[v]:
+                dist[v] = nd
+                prev[v] = u
+                heapq.heappush(heap, (nd, v))
+    return dist, prev
+
+def tree_path(prev: Sequence[int], source: int, target: int) -> List[int]:
+    """Follow predecessors from the target back to the source"""
+    path = [target]
+    while path[-1] != source:
+        path.append(int(prev[path[-1]]))
+    path.reverse()
+    return path
+
+_worker_graph = None
+
+def _init_worker(offsets: np.ndarray, targets: np.ndarray, weights: np.ndarray):
+    global _worker_graph
+    _worker_graph = (offsets.tolist(), targets.tolist(), weights.tolist())
+
+def _trees(sources: Sequence[int]) -> List[Tuple[List[float], List[int]]]:
+    return [shortest_path_tree(*_worker_graph, source) for source in sources]
+
+def shortest_path_trees(offsets: np.ndarray, targets: np.ndarray, weights: np.ndarray, sources: Sequence[int],
+                        processes: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run one single-source Dijkstra per source and return (len(sources), V) arrays of distances
+    and predecessors. Large batches are spread over a process pool; `processes=1` always runs inline.
+    """
+    n = len(offsets) - 1
+    dist = np.empty((len(sources), n), dtype=np.float64)
+    prev = np.empty((len(sources), n), dtype=np.int64)
+    if processes is None:
+        processes = (os.cpu_count() or 1) if len(sources) * n >= PARALLEL_MIN_WORK else 1
+    processes = min(processes, len(sources)) or 1
+
+    if processes == 1:
+        graph = (offsets.tolist(), targets.tolist(), weights.tolist())
+        for row, source in enumerate(sources):
+            dist[row], prev[row] = shortest_path_tree(*graph, source)
+        return dist, prev
+
+    chunk_size = max(1, -(-len(sources) // (processes * 4)))
+    chunks = [list(range(start, min(start + chunk_size, len(sources)))) for start in range(0, len(sources), chunk_size)]
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(offsets, targets, weights)) as executor:
+        results = executor.map(_trees, [[sources[row] for row in chunk] for chunk in chunks])
+        for chunk, trees in zip(chunks, results):
+            for row, (row_dist, row_prev) in zip(chunk, trees):
+                dist[row] = row_dist
+                prev[row] = row_prev
+    return dist, prev
@@ -0,0 +1,182 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from graph_algorithms import CampusGraph
+from osm_parser import find_closest_node, parse_osm_file, parse_osm_network
+from osm_stream import load_walkway_network
+
+ALGORITHMS = ["dijkstra", "astar", "bidijkstra", "biastar", "precomputed", "network", "alt"]
+PERCENTILES = [50, 90, 99]
+
+def scale_osm(source: str, destination: str, factor: int) -> None:
+    """
+    Write a synthetic OSM file made of `factor` copies of `source` laid out on a grid.
+    Each copy gets its own node/way ids and location names, and neighboring copies are
+    joined by a footway so the walkway network stays connected.
+    """
+    root = ET.parse(source).getroot()
+    nodes = root.findall("node")
+    ways = root.findall("way")
+    id_span = max(int(element.get("id")) for element in nodes + ways) + 1
+    lats = [float(node.get("lat")) for node in nodes]
+    lons = [float(node.get("lon")) for node in nodes]
+    dlat = (max(lats) - min(lats)) * 1.05
+    dlon = (max(lons) - min(lons)) * 1.05
+    columns = math.ceil(math.sqrt(factor))
+
+    # Join copies through the outermost nodes of the walkway network (the largest component)
+    _, network, _, _ = load_walkway_network(source)
+    east = int(network.node_ids[np.argmax(network.lons)])
+    west = int(network.node_ids[np.argmin(network.lons)])
+    north = int(network.node_ids[np.argmax(network.lats)])
+    south = int(network.node_ids[np.argmin(network.lats)])
+
+    out = ET.Element("osm", version="0.6", generator="benchmark.py")
+    for copy in range(factor):
+        row, column = divmod(copy, columns)
+        for node in nodes:
+            element = ET.SubElement(out, "node", id=str(int(node.get("id")) + copy * id_span),
+                                    lat=f"{float(node.get('lat')) + row * dlat:.7f}",
+                                    lon=f"{float(node.get('lon')) + column * dlon:.7f}", version="1")
+            for tag in node.findall("tag"):
+                value = tag.get("v") if tag.get("k") != "name" or copy == 0 else f"{tag.get('v')} #{copy}"
+                ET.SubElement(element, "tag", k=tag.get("k"), v=value)
+
+    next_way = factor * id_span
+    for copy in range(factor):
+        for way in ways:
+            element = ET.SubElement(out, "way", id=str(int(way.get("id")) + copy * id_span), version="1")
+            for nd in way.findall("nd"):
+                ET.SubElement(element, "nd", ref=str(int(nd.get("ref")) + copy * id_span))
+            for tag in way.findall("tag"):
+                ET.SubElement(element, "tag", k=tag.get("k"), v=tag.get("v"))
+
+        row, column = divmod(copy, columns)
+        neighbors = []
+        if column + 1 < columns and copy + 1 < factor:
+            neighbors.append((east, copy + 1, west))
+        if copy + columns < factor:
+            neighbors.append((north, copy + columns, south))
+        for node, other, other_node in neighbors:
+            element = ET.SubElement(out, "way", id=str(next_way), version="1")
+            ET.SubElement(element, "nd", ref=str(node + copy * id_span))
+            ET.SubElement(element, "nd", ref=str(other_node + other * id_span))
+            ET.SubElement(element, "tag", k="highway", v="footway")
+            next_way += 1
+
+    ET.ElementTree(out).write(destination, encoding="UTF-8", xml_declaration=True)
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int) -> Dict[str, float]:
+    """Time `fn` after `warmup` untimed calls, returning summary statistics in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples = np.array(samples)
+    stats = {"runs": repeat, "warmup": warmup, "mean_ms": float(samples.mean()), "min_ms": float(samples.min()),
+             "max_ms": float(samples.max()), "stdev_ms": float(samples.std())}
+    for p in PERCENTILES:
+        stats[f"p{p}_ms"] = float(np.percentile(samples, p))
+    return stats
+
+def run_suite(osm_file: str, scale: int, repeat: int, warmup: int, seed: int = 0) -> List[Dict]:
+    """Benchmark parsing, graph construction, routing, closest-node lookups and rendering on one file"""
+    results = []
+
+    def record(name: str, stats: Dict[str, float], **extra):
+        results.append({"name": name, "scale": scale, **extra, **stats})
+        print(f"  {name:<32} p50 {stats['p50_ms']:9.3f} ms  p90 {stats['p90_ms']:9.3f} ms  "
+              f"p99 {stats['p99_ms']:9.3f} ms", flush=True)
+
+    # Whole-file operations are slow on big inputs, so they get fewer runs
+    heavy_repeat = max(3, repeat // 10)
+    record("parse_osm_file", measure(lambda: parse_osm_file(osm_file), heavy_repeat, 1))
+    record("CampusGraph", measure(lambda: CampusGraph(osm_file), heavy_repeat, 1))
+
+    # Route caching is disabled so every run does the search
+    campus = CampusGraph(osm_file, route_cache_size=0)
+    rng = random.Random(seed)
+    names = [loc for loc in campus.core.names if loc in campus.location_nodes]
+    pairs = []
+    while len(pairs) < max(repeat, warmup):
+        # The location graph may be disconnected, so only pairs with a path are timed
+        start = rng.choice(names)
+        targets, distances = campus.distances_from(start)
+        reachable = [loc for loc, distance in zip(targets, distances.tolist())
+                     if loc != start and loc in campus.location_nodes and math.isfinite(distance)]
+        if reachable:
+            pairs.append((start, rng.choice(reachable)))
+    for algorithm in ALGORITHMS:
+        queries = iter(pairs * 2)
+        record(f"find_path[{algorithm}]",
+               measure(lambda: campus.find_path(*next(queries), algorithm=algorithm), repeat, warmup),
+               algorithm=algorithm)
+
+    _, _, network = parse_osm_network(osm_file)
+    lats, lons = zip(*(data['pos'] for _, data in network.nodes(data=True)))
+    points = [(rng.uniform(min(lats), max(lats)), rng.uniform(min(lons), max(lons))) for _ in range(repeat + warmup)]
+    coords = iter(points)
+    find_closest_node(network, points[0])
+    record("find_closest_node", measure(lambda: find_closest_node(network, next(coords)), repeat, warmup))
+
+    path, _ = campus.find_path(*pairs[0])
+    route = campus.find_route(*pairs[0])
+    record("visualize_path", measure(lambda: campus.visualize_path(path).get_root().render(), repeat, warmup))
+    record("visualize_path[walkways]",
+           measure(lambda: campus.visualize_path(route=route, walkways=True).get_root().render(), repeat, warmup))
+    return results
+
+def environment() -> Dict[str, str]:
+    """Describe the machine and code revision so results from different runs can be compared"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "processor": platform.processor(), "cpus": str(os.cpu_count()),
+            "commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark GIKI Campus Navigator routing, parsing and rendering")
+    parser.add_argument("--osm", default="giki.osm", help="base OSM file")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="copies of the base file to benchmark (1 is the file itself)")
+    parser.add_argument("--repeat", type=int, default=50, help="timed runs per benchmark")
+    parser.add_argument("--warmup", type=int, default=5, help="untimed runs before timing")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the query pairs")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scales:
+            osm_file = args.osm
+            if scale > 1:
+                osm_file = os.path.join(workdir, f"scaled_{scale}x.osm")
+                scale_osm(args.osm, osm_file, scale)
+            print(f"{scale}x {args.osm}", flush=True)
+            results.extend(run_suite(osm_file, scale, args.repeat, args.warmup, args.seed))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "repeat": args.repeat, "warmup": args.warmup,
+                       "seed": args.seed, "results": results}, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
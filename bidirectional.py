@@ -0,0 +1,99 @@
+import heapq
+from typing import List, Tuple
+import networkx as nx
+import numpy as np
+from core_graph import CoreGraph
+from geodesy import EARTH_RADIUS
+from metrics import record_search
+from spatial_index import unit_vectors
+
+class BidirectionalSearch:
+    """
+    Bidirectional Dijkstra and bidirectional A* over CSR arrays of an undirected graph.
+    One search grows from each end, always advancing the side whose smallest key is lower, and
+    stops once the two smallest keys add up to the best meeting distance found, so each side only
+    covers about half the distance instead of one search covering all of it.
+    A* uses the average potential p(v) = (h_t(v) - h_s(v)) / 2 from straight-line (chord) distances,
+    which keeps both directions consistent, so the same stopping rule stays exact.
+    """
+
+    def __init__(self, names: List, lats: np.ndarray, lons: np.ndarray,
+                 offsets: np.ndarray, targets: np.ndarray, weights: np.ndarray):
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        xyz = unit_vectors(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)) * EARTH_RADIUS
+        self._x, self._y, self._z = xyz[:, 0].tolist(), xyz[:, 1].tolist(), xyz[:, 2].tolist()
+        self._offsets = offsets.tolist()
+        self._targets = targets.tolist()
+        self._weights = weights.tolist()
+
+    @classmethod
+    def from_core(cls, core: CoreGraph) -> "BidirectionalSearch":
+        """Share the CSR arrays and coordinates of a core graph"""
+        return cls(core.names, core.lats, core.lons, core.offsets, core.targets, core.weights)
+
+    def shortest_path(self, source: int, target: int, heuristic: bool = False) -> Tuple[List[int], float]:
+        """Bidirectional Dijkstra between two node indices, or bidirectional A* with `heuristic`"""
+        algorithm = "biastar" if heuristic else "bidijkstra"
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        xs, ys, zs = self._x, self._y, self._z
+        sx, sy, sz = xs[source], ys[source], zs[source]
+        tx, ty, tz = xs[target], ys[target], zs[target]
+        n = len(offsets) - 1
+        dists = ([float('inf')] * n, [float('inf')] * n)
+        prevs = ([-1] * n, [-1] * n)
+        settled = (bytearray(n), bytearray(n))
+        settled_count = 0
+        dists[0][source] = 0.0
+        dists[1][target] = 0.0
+        # Keys are distance + potential forwards and distance - potential backwards; both start at half
+        # the straight-line distance with the heuristic, and at 0 without
+        start_key = 0.5 * ((sx - tx) ** 2 + (sy - ty) ** 2 + (sz - tz) ** 2) ** 0.5 if heuristic else 0.0
+        heaps = ([(start_key, 0.0, source)], [(start_key, 0.0, target)])
+        best, meet = (0.0, source) if source == target else (float('inf'), -1)
+
+        while heaps[0] and heaps[1]:
+            # Every path not found yet costs at least the sum of the two smallest keys
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            heap, dist, prev, done, other = heaps[side], dists[side], prevs[side], settled[side], dists[1 - side]
+            _, d, u = heapq.heappop(heap)
+            if done[u]:
+                continue
+            done[u] = 1
+            settled_count += 1
+            for i in range(offsets[u], offsets[u + 1]):
+                v = targets[i]
+                nd = d + weights[i]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev[v] = u
+                    key = nd
+                    if heuristic:
+                        to_target = ((xs[v] - tx) ** 2 + (ys[v] - ty) ** 2 + (zs[v] - tz) ** 2) ** 0.5
+                        to_source = ((xs[v] - sx) ** 2 + (ys[v] - sy) ** 2 + (zs[v] - sz) ** 2) ** 0.5
+                        key += 0.5 * (to_target - to_source) if side == 0 else 0.5 * (to_source - to_target)
+                    heapq.heappush(heap, (key, nd, v))
+                    # The two searches meet at v
+                    if nd + other[v] < best:
+                        best, meet = nd + other[v], v
+        record_search(algorithm, settled_count)
+        if meet < 0:
+            raise nx.NetworkXNoPath(f"No path between {self.names[source]} and {self.names[target]}")
+
+        path = [meet]
+        while path[-1] != source:
+            path.append(prevs[0][path[-1]])
+        path.reverse()
+        while path[-1] != target:
+            path.append(prevs[1][path[-1]])
+        return path, best
+
+    def find_path(self, start: str, end: str, heuristic: bool = False) -> Tuple[List[str], float]:
+        """Bidirectional search between two node names"""
+        for name in (start, end):
+            if name not in self.index:
+                raise nx.NodeNotFound(f"{name} is not in the graph")
+        path, distance = self.shortest_path(self.index[start], self.index[end], heuristic)
+        return [self.names[i] for i in path], distance
@@ -0,0 +1,169 @@
+import heapq
+from array import array
+from typing import Dict, Iterator, List, Sequence, Tuple
+import networkx as nx
+import numpy as np
+from metrics import record_search
+
+class Location:
+    """A named node of the location graph."""
+    __slots__ = ("id", "name", "lat", "lon")
+
+    def __init__(self, id: int, name: str, lat: float, lon: float):
+        self.id = id
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+
+    def __repr__(self) -> str:
+        return f"Location({self.id}, {self.name!r}, {self.lat}, {self.lon})"
+
+class CoreGraph:
+    """
+    Compact undirected location graph: names are interned to dense integer ids and the
+    adjacency is stored in CSR (compressed sparse row) arrays, like WayNetwork.
+    Node records are created on demand, so the graph itself holds only the names and flat arrays.
+    """
+
+    def __init__(self, names: List[str], lats: np.ndarray, lons: np.ndarray,
+                 offsets: np.ndarray, targets: np.ndarray, weights: np.ndarray):
+        self.names = names  # id -> name
+        self.ids = {name: i for i, name in enumerate(names)}  # name -> id
+        self.lats = lats
+        self.lons = lons
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        # Typed arrays index nearly as fast as lists in the search loop, at a fraction of the memory
+        self._offsets = array('q', np.ascontiguousarray(offsets, dtype=np.int64).tobytes())
+        self._targets = array('q', np.ascontiguousarray(targets, dtype=np.int64).tobytes())
+        self._weights = array('d', np.ascontiguousarray(weights, dtype=np.float64).tobytes())
+
+    @classmethod
+    def from_edges(cls, locations: Dict[str, Tuple[float, float]],
+                   edges: Sequence[Tuple[str, str, float]]) -> "CoreGraph":
+        """
+        Build the graph from named locations and undirected (name, name, weight) edges.
+        A repeated edge keeps its last weight, as networkx's add_edge does; self-loops are dropped.
+        """
+        names = list(locations.keys())
+        ids = {name: i for i, name in enumerate(names)}
+        last = {}
+        for loc1, loc2, weight in edges:
+            u, v = ids[loc1], ids[loc2]
+            if u != v:
+                last[(min(u, v), max(u, v))] = weight
+        low = np.fromiter((u for u, _ in last), dtype=np.int64, count=len(last))
+        high = np.fromiter((v for _, v in last), dtype=np.int64, count=len(last))
+        weights = np.fromiter(last.values(), dtype=np.float64, count=len(last))
+
+        # Store both directions, grouped by source node
+        sources = np.concatenate((low, high))
+        targets = np.concatenate((high, low))
+        weights = np.concatenate((weights, weights))
+        order = np.lexsort((targets, sources))
+        offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(names)), out=offsets[1:])
+        return cls(names,
+                   np.array([locations[name][0] for name in names], dtype=np.float64),
+                   np.array([locations[name][1] for name in names], dtype=np.float64),
+                   offsets, targets[order], weights[order])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.ids
+
+    def __iter__(self) -> Iterator[Location]:
+        for i in range(len(self.names)):
+            yield self.node(i)
+
+    def node(self, node: int) -> Location:
+        """Return the record of a node id"""
+        return Location(node, self.names[node], float(self.lats[node]), float(self.lons[node]))
+
+    def id_of(self, name: str) -> int:
+        """Return the id of a location name, raising NodeNotFound if it isn't in the graph"""
+        try:
+            return self.ids[name]
+        except KeyError:
+            raise nx.NodeNotFound(f"{name} is not in the graph") from None
+
+    def neighbors(self, node: int) -> Iterator[Tuple[int, float]]:
+        """Yield (neighbor id, edge weight) pairs"""
+        for i in range(self._offsets[node], self._offsets[node + 1]):
+            yield self._targets[i], self._weights[i]
+
+    def edges(self) -> Iterator[Tuple[int, int, float]]:
+        """Yield every undirected edge once, as (id, id, weight) with the lower id first"""
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        for u in range(len(self.names)):
+            for i in range(offsets[u], offsets[u + 1]):
+                if u < targets[i]:
+                    yield u, targets[i], weights[i]
+
+    def edge_weight(self, u: int, v: int) -> float:
+        """Return the weight of the edge between two ids"""
+        for i in range(self._offsets[u], self._offsets[u + 1]):
+            if self._targets[i] == v:
+                return self._weights[i]
+        raise KeyError((u, v))
+
+    def shortest_path(self, source: int, target: int) -> Tuple[List[int], float]:
+        """Dijkstra's algorithm over the CSR arrays, stopping once the target is settled"""
+        offsets, targets, weights = self._offsets, self._targets, self._weights
+        n = len(offsets) - 1
+        dist = [float('inf')] * n
+        prev = [-1] * n
+        settled = bytearray(n)
+        settled_count = 0
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+
+        while heap:
+            d, u = heapq.heappop(heap)
+            if settled[u]:
+                continue
+            if u == target:
+                break
+            settled[u] = 1
+            settled_count += 1
+            for i in range(offsets[u], offsets[u + 1]):
+                v = targets[i]
+                nd = d + weights[i]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(heap, (nd, v))
+        else:
+            record_search("dijkstra", settled_count)
+            raise nx.NetworkXNoPath(f"No path between {self.names[source]} and {self.names[target]}")
+        record_search("dijkstra", settled_count + 1)
+
+        path = [target]
+        while path[-1] != source:
+            path.append(prev[path[-1]])
+        path.reverse()
+        return path, dist[target]
+
+    def find_path(self, start: str, end: str) -> Tuple[List[str], float]:
+        """Dijkstra between two location names"""
+        path, distance = self.shortest_path(self.id_of(start), self.id_of(end))
+        return [self.names[i] for i in path], distance
+
+    def nbytes(self) -> int:
+        """Memory used by the coordinate and adjacency arrays"""
+        return (sum(values.nbytes for values in (self.lats, self.lons, self.offsets, self.targets, self.weights))
+                + sum(len(values) * values.itemsize for values in (self._offsets, self._targets, self._weights)))
+
+    def to_networkx(self, positions: bool = True) -> nx.Graph:
+        """Export as a networkx graph keyed by location name, with 'weight' (and 'pos') attributes"""
+        G = nx.Graph()
+        for node in self:
+            if positions:
+                G.add_node(node.name, pos=(node.lat, node.lon))
+            else:
+                G.add_node(node.name)
+        G.add_weighted_edges_from((self.names[u], self.names[v], w) for u, v, w in self.edges())
+        return G
@@ -0,0 +1,87 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+def default_responder(prompt: str) -> str:
+    """Canned answers shaped like Gemini's for the prompts this app sends"""
+    if "SOURCE:" in prompt:
+        match = re.search(r"Query:\s*(.*)", prompt)
+        parts = re.split(r"\bto\b", match.group(1) if match else "", maxsplit=1)
+        source = re.sub(r"^(from|how do i get from|route from)\s+", "", parts[0].strip(), flags=re.I) or "None"
+        destination = parts[1].strip(" ?.") if len(parts) > 1 else "None"
+        return f"SOURCE: {source}\nDESTINATION: {destination}"
+    match = re.search(r"Path found:\s*(.*)", prompt)
+    if match:
+        return f"Follow {match.group(1).strip()}. Enjoy the walk!"
+    return "This is a fake Gemini response."
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the Gemini `generateContent` REST endpoint, for exercising
+    AsyncGeminiClient's timeouts and retries without network access or quota.
+    """
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, host: str = "127.0.0.1", delay: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, responder: Callable[[str], str] = default_responder):
+        super().__init__((host, port), _FakeGeminiHandler)
+        self.delay = delay  # Seconds before answering
+        self.jitter = jitter  # Extra random delay, up to this many seconds
+        self.failure_rate = failure_rate  # Fraction of requests answered with 503
+        self.responder = responder
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGeminiServer":
+        threading.Thread(target=self.serve_forever, daemon=True, name="fake-gemini").start()
+        return self
+
+class _FakeGeminiHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        with server._lock:
+            server.requests += 1
+        if not self.path.split("?")[0].endswith(":generateContent"):
+            self.send_error(404)
+            return
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(server.delay + random.uniform(0, server.jitter))
+        if random.random() < server.failure_rate:
+            self.send_error(503, "Model overloaded")
+            return
+        prompt = "".join(part.get("text", "") for content in payload.get("contents", [])
+                         for part in content.get("parts", []))
+        body = json.dumps({"candidates": [{"content": {"role": "model",
+                                                       "parts": [{"text": server.responder(prompt)}]}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run a fake Gemini generateContent server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.2, help="seconds before each answer")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args(argv)
+    server = FakeGeminiServer(args.port, delay=args.delay, jitter=args.jitter, failure_rate=args.failure_rate)
+    print(f"Fake Gemini listening on {server.url} (set GEMINI_API_ENDPOINT={server.url})")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import random
+import threading
+import urllib.error
+import urllib.request
+import weakref
+from typing import Any, Awaitable, Optional, TypeVar
+from metrics import inc, timer
+
+T = TypeVar("T")
+
+# Exceptions worth retrying: timeouts, dropped connections, and the SDK's rate-limit / overload errors
+RETRYABLE_ERRORS = {"ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError",
+                    "TooManyRequests", "GatewayTimeout"}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class GeminiHTTPError(Exception):
+    """Non-2xx response from the Gemini REST API."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a failed call is worth retrying"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, urllib.error.URLError)):
+        return True
+    if isinstance(error, GeminiHTTPError):
+        return error.status in RETRYABLE_STATUS
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+class TextResponse:
+    """Minimal stand-in for the SDK response object: only `.text` is used."""
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+class RestGeminiModel:
+    """
+    Calls the Gemini `generateContent` REST endpoint directly with urllib.
+    `base_url` can point at a local fake server (see fake_gemini.py) instead of Google's API.
+    """
+
+    def __init__(self, model_name: str = "gemini-1.5-flash", api_key: Optional[str] = None,
+                 base_url: str = "https://generativelanguage.googleapis.com", timeout: float = 30.0):
+        self.model_name = model_name
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def generate_content(self, prompt: str, timeout: Optional[float] = None) -> TextResponse:
+        """Blocking call; `timeout` (seconds) overrides the model's default for this request"""
+        url = f"{self.base_url}/v1beta/models/{self.model_name}:generateContent"
+        body = json.dumps({"contents": [{"parts": [{"text": prompt}]}]}).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["x-goog-api-key"] = self.api_key
+        request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout if timeout is None else timeout) as response:
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise GeminiHTTPError(e.code, e.read().decode(errors="replace")[:200]) from None
+        parts = payload["candidates"][0]["content"]["parts"]
+        return TextResponse("".join(part.get("text", "") for part in parts))
+
+class AsyncGeminiClient:
+    """
+    asyncio wrapper around a Gemini model with per-attempt timeouts, an overall deadline,
+    bounded concurrency and retries with exponential backoff and jitter.
+    The model needs `generate_content_async(prompt)` or a blocking `generate_content(prompt)`.
+    Blocking calls run in a worker thread, which can't be cancelled, so it keeps its concurrency
+    slot until it returns; RestGeminiModel is given each attempt's timeout so its thread ends then.
+    Waiting for a slot counts against the deadline.
+    """
+
+    def __init__(self, model: Any, timeout: float = 10.0, deadline: float = 20.0, max_concurrency: int = 4,
+                 retries: int = 2, backoff: float = 0.5, max_backoff: float = 4.0):
+        self.model = model
+        self.timeout = timeout  # Seconds per attempt
+        self.deadline = deadline  # Seconds for the whole call, including retries
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._semaphores = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+        self._loop = None  # Background loop used by run()
+        self._loop_lock = threading.Lock()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _attempt(self, prompt: str, semaphore: asyncio.Semaphore, timeout: float) -> str:
+        # Takes over the slot acquired by the caller and releases it once the call has finished
+        generate_async = getattr(self.model, "generate_content_async", None)
+        if generate_async is not None:
+            try:
+                response = await asyncio.wait_for(generate_async(prompt), timeout)
+            finally:
+                semaphore.release()
+            return response.text
+
+        if isinstance(self.model, RestGeminiModel):
+            worker = asyncio.ensure_future(asyncio.to_thread(self.model.generate_content, prompt, timeout))
+        else:
+            worker = asyncio.ensure_future(asyncio.to_thread(self.model.generate_content, prompt))
+
+        def finished(task: asyncio.Future):
+            semaphore.release()
+            if not task.cancelled():
+                task.exception()  # Retrieved here in case the attempt timed out before the thread returned
+
+        worker.add_done_callback(finished)
+        # Shielded so that a timeout leaves the worker (and its slot) in place until the thread returns
+        response = await asyncio.wait_for(asyncio.shield(worker), timeout)
+        return response.text
+
+    async def generate(self, prompt: str, call: str = "generate", timeout: Optional[float] = None,
+                       deadline: Optional[float] = None) -> str:
+        """
+        Return the model's text for a prompt. Raises asyncio.TimeoutError once the deadline passes,
+        or the last error when retries run out or the error isn't retryable.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        end = loop.time() + (self.deadline if deadline is None else deadline)
+        attempt = 0
+        while True:
+            remaining = end - loop.time()
+            if remaining <= 0:
+                inc("giki_gemini_timeouts_total", call=call)
+                raise asyncio.TimeoutError(f"Gemini {call} call missed its deadline")
+            semaphore = self._semaphore()
+            try:
+                await asyncio.wait_for(semaphore.acquire(), remaining)
+            except asyncio.TimeoutError:
+                inc("giki_gemini_timeouts_total", call=call)
+                raise asyncio.TimeoutError(f"Gemini {call} call missed its deadline waiting for a slot") from None
+            if end - loop.time() <= 0:
+                semaphore.release()
+                continue
+            try:
+                with timer("giki_gemini_seconds", call=call):
+                    return await self._attempt(prompt, semaphore, min(timeout, end - loop.time()))
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    inc("giki_gemini_timeouts_total", call=call)
+                if attempt >= self.retries or not is_retryable(e):
+                    raise
+                attempt += 1
+                inc("giki_gemini_retries_total", call=call)
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                await asyncio.sleep(min(delay, max(end - loop.time(), 0)))
+
+    def run(self, coroutine: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """
+        Run a coroutine on the client's background event loop and wait for the result.
+        For synchronous callers (e.g. Streamlit script threads); every caller shares one
+        concurrency limit because they share the loop.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True, name="gemini-client").start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
@@ -1,79 +1,209 @@
-import google.generativeai as genai
-from typing import Tuple, Optional
+import asyncio
+from typing import Any, List, NamedTuple, Tuple, Optional
 import os
 from dotenv import load_dotenv
+from gemini_client import AsyncGeminiClient, RestGeminiModel
+from llm_cache import ResponseCache, narrative_key, normalize_query
+from location_resolver import CONFIDENT_SCORE, FUZZY_MIN_SCORE, LocationResolver
+from metrics import inc
 
 load_dotenv()
 
 # Configure Gemini
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')  # Using Gemini Flash model
+# Point at another generateContent endpoint, e.g. a local fake_gemini.py server
+GEMINI_API_ENDPOINT = os.getenv('GEMINI_API_ENDPOINT')
+if GEMINI_API_ENDPOINT:
+    model = RestGeminiModel('gemini-1.5-flash', GOOGLE_API_KEY, base_url=GEMINI_API_ENDPOINT)
+else:
+    import google.generativeai as genai
+    genai.configure(api_key=GOOGLE_API_KEY)
+    model = genai.GenerativeModel('gemini-1.5-flash')  # Using Gemini Flash model
+client = AsyncGeminiClient(model, timeout=8.0, deadline=15.0)
+# Responses are cached on disk across restarts, since the same questions come in over and over
+cache = ResponseCache(os.getenv('GEMINI_CACHE_PATH', 'gemini_cache.sqlite'))
+PROMPT_MAX_LOCATIONS = 100  # Larger maps list only the names closest to the query
 
-def extract_locations(query: str) -> Tuple[Optional[str], Optional[str]]:
-    """
-    Use Gemini to extract source and destination locations from natural language query.
-    """
-    prompt = f"""
+class Navigation(NamedTuple):
+    source: Optional[str]
+    destination: Optional[str]
+    path: List[str]
+    distance: float
+    narrative: str
+    map: Any  # folium.Map, or None if no path was found
+
+def _location_prompt(query: str, locations: List[str]) -> str:
+    valid = f"Valid locations are: {', '.join(locations)}. Use these names exactly." if locations else ""
+    return f"""
     Extract the source and destination locations from the following query about GIKI campus navigation.
-    Valid locations are: Hostel 9, Central Block, Cafe, Tuck Shop, Sports Complex, Main Gate, Library, Faculty Block
-    
+    {valid}
+
     Query: {query}
-    
+
     Respond in the following format only:
     SOURCE: <location>
     DESTINATION: <location>
-    
+
     If a location is not found or unclear, respond with 'None' for that field.
     """
-    
-    try:
-        response = model.generate_content(prompt)
-        response_text = response.text
-        
-        # Parse the response
-        source = None
-        destination = None
-        
-        for line in response_text.split('\n'):
-            if line.startswith('SOURCE:'):
-                source = line.replace('SOURCE:', '').strip()
-                if source.lower() == 'none':
-                    source = None
-            elif line.startswith('DESTINATION:'):
-                destination = line.replace('DESTINATION:', '').strip()
-                if destination.lower() == 'none':
-                    destination = None
-        
-        return source, destination
-    
-    except Exception as e:
-        print(f"Error in Gemini API call: {e}")
-        return None, None
 
-def generate_navigation_response(path: list, distance: float, query: str) -> str:
-    """
-    Generate a natural language response using Gemini based on the path and original query.
-    """
+def _parse_locations(response_text: str) -> Tuple[Optional[str], Optional[str]]:
+    source = None
+    destination = None
+
+    for line in response_text.split('\n'):
+        line = line.strip()
+        if line.startswith('SOURCE:'):
+            source = line.replace('SOURCE:', '').strip()
+            if source.lower() == 'none':
+                source = None
+        elif line.startswith('DESTINATION:'):
+            destination = line.replace('DESTINATION:', '').strip()
+            if destination.lower() == 'none':
+                destination = None
+
+    return source, destination
+
+def _navigation_prompt(path: list, distance: float, query: str) -> str:
     path_str = " → ".join(path)
-    prompt = f"""
+    return f"""
     Generate a helpful and natural response for a navigation query.
-    
+
     Original query: {query}
     Path found: {path_str}
     Total distance: {distance} meters
-    
+
     Generate a friendly response that includes:
     1. A direct answer about the route
     2. The total distance
     3. Any relevant tips about the route (e.g., landmarks to look out for)
-    
+
     Keep the response concise but informative.
     """
-    
+
+def _basic_response(path: list, distance: float) -> str:
+    return f"The shortest path is: {' → '.join(path)}\nTotal distance: {distance} meters"
+
+def _snap(name: Optional[str], resolver: Optional[LocationResolver]) -> Optional[str]:
+    # Map a name the model returned onto the graph's spelling of it
+    if name is None or resolver is None:
+        return name
+    match, score = resolver.match(name)
+    return match if score >= FUZZY_MIN_SCORE else name
+
+async def extract_locations_async(query: str, resolver: Optional[LocationResolver] = None
+                                  ) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Extract source and destination locations from a natural language query.
+    With a resolver (see CampusGraph.location_resolver), confident matches are answered locally;
+    Gemini is only asked when the resolver is unsure, and its prompt lists the graph's location names.
+    """
+    if resolver is not None:
+        resolution = resolver.resolve(query)
+        if resolution.confidence >= CONFIDENT_SCORE:
+            inc("giki_location_resolutions_total", method="local")
+            return resolution.source, resolution.destination
+
+    key = normalize_query(query)
+    cached = cache.get("locations", key)
+    if cached is not None:
+        inc("giki_location_resolutions_total", method="cache")
+        return _snap(cached[0], resolver), _snap(cached[1], resolver)
+    locations = []
+    if resolver is not None:
+        locations = (resolver.names if len(resolver.names) <= PROMPT_MAX_LOCATIONS
+                     else resolver.suggest(query, PROMPT_MAX_LOCATIONS))
+    try:
+        response_text = await client.generate(_location_prompt(query, locations), call="extract_locations")
+        source, destination = _parse_locations(response_text)
+        cache.put("locations", key, [source, destination])
+        inc("giki_location_resolutions_total", method="llm")
+        return _snap(source, resolver), _snap(destination, resolver)
+    except Exception as e:
+        print(f"Error in Gemini API call: {e!r}")
+        return None, None
+
+async def generate_navigation_response_async(path: list, distance: float, query: str) -> str:
+    """
+    Generate a natural language response using Gemini based on the path and original query.
+    Narratives are cached on the path and rounded distance, so they are shared between phrasings.
+    """
+    key = narrative_key(path, distance)
+    cached = cache.get("narrative", key)
+    if cached is not None:
+        return cached
+    try:
+        response_text = await client.generate(_navigation_prompt(path, distance, query),
+                                              call="generate_navigation_response")
+        cache.put("narrative", key, response_text)
+        return response_text
+    except Exception as e:
+        # Fallback to basic response if Gemini fails or times out
+        print(f"Error in Gemini API call: {e!r}")
+        return _basic_response(path, distance)
+
+def extract_locations(query: str, resolver: Optional[LocationResolver] = None
+                      ) -> Tuple[Optional[str], Optional[str]]:
+    """Blocking form of extract_locations_async"""
+    return client.run(extract_locations_async(query, resolver))
+
+def generate_navigation_response(path: list, distance: float, query: str) -> str:
+    """Blocking form of generate_navigation_response_async"""
+    return client.run(generate_navigation_response_async(path, distance, query))
+
+async def navigate_async(campus, query: str, algorithm: str = "dijkstra", walkways: bool = True) -> Navigation:
+    """
+    Answer a navigation query end to end. Once the locations are known and the (fast) location
+    path is found, the narrative is generated while the walkway route and map are built in a
+    worker thread, so the slow LLM call overlaps the rest of the work.
+    """
+    source, destination = await extract_locations_async(query, campus.location_resolver())
+    if source is None or destination is None:
+        return Navigation(source, destination, [], float('inf'),
+                          "Sorry, I couldn't tell where you want to go from and to.", None)
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        path, distance = await asyncio.to_thread(campus.find_path, source, destination, algorithm)
     except Exception as e:
-        # Fallback to basic response if Gemini fails
-        return f"The shortest path is: {path_str}\nTotal distance: {distance} meters" 
\ No newline at end of file
+        return Navigation(source, destination, [], float('inf'), f"Sorry, I couldn't find a route: {e}", None)
+
+    def render():
+        route = campus.find_route(source, destination) if walkways else None
+        return campus.visualize_path(path, route=route, walkways=route is not None, clip_margin=150)
+
+    narrative, route_map = await asyncio.gather(generate_navigation_response_async(path, distance, query),
+                                                asyncio.to_thread(render), return_exceptions=True)
+    if isinstance(route_map, Exception):
+        print(f"Error rendering route map: {route_map}")
+        route_map = None
+    return Navigation(source, destination, path, distance, narrative, route_map)
+
+def navigate(campus, query: str, algorithm: str = "dijkstra", walkways: bool = True) -> Navigation:
+    """Blocking form of navigate_async"""
+    return client.run(navigate_async(campus, query, algorithm, walkways))
+
+
+async def prewarm_cache_async(campus) -> int:
+    """
+    Fill the cache for every ordered pair of locations: "<A> to <B>" queries are stored directly,
+    and missing route narratives are generated (the client's concurrency limit applies).
+    Returns the number of narratives generated.
+    """
+    names = list(campus.core.names)
+    distances, paths = campus.find_paths_batch(names, names, return_paths=True)
+    pending = []
+    for i, source in enumerate(names):
+        for j, destination in enumerate(names):
+            if i == j or paths[i][j] is None:
+                continue
+            for query in (f"{source} to {destination}", f"from {source} to {destination}"):
+                cache.put("locations", normalize_query(query), [source, destination])
+            path, distance = paths[i][j], float(distances[i, j])
+            if not cache.contains("narrative", narrative_key(path, distance)):
+                pending.append(generate_navigation_response_async(
+                    path, distance, f"How do I get from {source} to {destination}?"))
+    await asyncio.gather(*pending)
+    return len(pending)
+
+def prewarm_cache(campus) -> int:
+    """Blocking form of prewarm_cache_async"""
+    return client.run(prewarm_cache_async(campus))
@@ -1,120 +1,794 @@
 import networkx as nx
-from typing import Dict, List, Tuple, Optional, Callable
-import math
-from osm_parser import parse_osm_file
+from typing import Collection, Dict, List, NamedTuple, Tuple, Optional, Callable
+import os
+import threading
+import numpy as np
+from osm_parser import nearest_location_edges
+from geodesy import rowwise_distances
+from osm_stream import WALKABLE_HIGHWAYS, WayRefs, load_walkway_network
+from graph_patch import GraphPatch
+from graph_cache import file_hash, read_compiled_graph, write_compiled_graph
+from way_network import WayNetwork, Route, access_segment, join_routes, reverse_route, route_points
+from route_cache import RouteCache
+from all_pairs import ShortestPathTable
+from astar import CoordinateAStar
+from bidirectional import BidirectionalSearch
+from core_graph import CoreGraph
+from location_resolver import LocationResolver
+from profiles import DEFAULT_PROFILE, check_profile
+from batch_routing import shortest_path_trees, tree_path
+from landmarks import LandmarkIndex
+from alternatives import alternative_paths
+from tours import TIME_BUDGET, Tour, optimize_order
+from spatial_index import SpatialIndex
+from metrics import timed, timer
+from map_layers import (BoundingBox, SerializedGeoJson, clip_polylines, in_bounds, multilinestring_feature,
+                        network_polylines, route_bounds, serialize_geojson, simplify_polylines)
 import folium
 from folium import plugins
 
+ALTERNATIVE_COLORS = ["#1f77b4", "#9467bd", "#ff7f0e"]  # Map colors of alternative routes, in order
+
+class WalkwayState(NamedTuple):
+    """Everything walkway routing reads, swapped as one object so a search sees a consistent snapshot."""
+    network: Optional[WayNetwork]
+    location_nodes: Dict[str, int]  # location name -> snapped network node index
+    node_locations: Dict[int, List[str]]  # network node index -> location names snapped to it
+    landmarks: Optional[LandmarkIndex]  # ALT preprocessing, built on first use
+
+class MapLayers(NamedTuple):
+    """Geometry of the static map layers, built once per graph version."""
+    version: int
+    center: Tuple[float, float]
+    locations: List[dict]  # GeoJSON point features, styled through their properties
+    edges: List[np.ndarray]  # Location-graph edges as (lat, lon) polylines
+    walkways: List[np.ndarray]  # Walkway network merged into polylines between junctions
+    simplified: Dict[int, List[np.ndarray]]  # Zoom level -> simplified walkway polylines
+    serialized: Dict[Tuple[int, bool], str]  # (zoom, walkways) -> GeoJSON of the unclipped base layer
+
 class CampusGraph:
-    def __init__(self, osm_file: str = "giki.osm"):
-        self.graph = nx.Graph()
+    def __init__(self, osm_file: Optional[str] = "giki.osm", route_cache_size: int = 1024,
+                 precompute: bool = False, highways: Optional[Collection[str]] = WALKABLE_HIGHWAYS):
+        self.core = CoreGraph.from_edges({}, [])  # Location graph: interned names and CSR adjacency
         self.node_positions = {}  # For visualization
+        self.location_index = None  # Spatial index over the named locations
+        self.location_ids = {}  # Location name -> OSM node id, for GraphPatch.from_osm_change
+        self.ways = None  # Node references of every walkway, used by apply_patch
+        self.source_hash = None  # SHA-256 of the OSM file the graph was built from
+        self.version = 0  # Bumped whenever the graph changes so cached routes go stale
+        self.route_cache = RouteCache(maxsize=route_cache_size)
+        self.precompute = precompute  # Build the all-pairs table at load time instead of on first use
+        self._shortest_paths = None
+        self._astar = (None, None)  # (core graph, CoordinateAStar built from it)
+        self._bidirectional = (None, None)  # (core graph, BidirectionalSearch built from it)
+        self._networkx = (None, None)  # (core graph, its networkx export)
+        self._resolver = (None, None)  # (core graph, LocationResolver over its names)
+        self._map_layers = None  # Static geometry reused by visualize_path, rebuilt when the version changes
+        self._walkways = WalkwayState(None, {}, {}, None)
+        self._update_lock = threading.Lock()
+        self.highways = highways  # Highway values kept in the walkway network (None keeps every way)
+        if osm_file is not None:
+            self._initialize_campus_graph(osm_file)
+
+    @property
+    def graph(self) -> nx.Graph:
+        """The location graph as networkx, exported from the core graph on first use after each change"""
+        core, graph = self._networkx
+        current = self.core
+        if core is not current:
+            graph = current.to_networkx(positions=False)
+            self._networkx = (current, graph)
+        return graph
+
+    @property
+    def network(self) -> Optional[WayNetwork]:
+        """Walkway network used by the "network" and "alt" algorithms"""
+        return self._walkways.network
+
+    @property
+    def location_nodes(self) -> Dict[str, int]:
+        """Location name -> snapped network node index"""
+        return self._walkways.location_nodes
+
+    @classmethod
+    @timed("giki_graph_build_seconds", source="cache")
+    def from_cache(cls, path: str, osm_file: str = "giki.osm", **kwargs) -> "CampusGraph":
+        """
+        Load a compiled graph written by `save`, memory-mapping its arrays instead of parsing OSM.
+        The cache is rebuilt from `osm_file` when it is missing, from another format version,
+        or was compiled from a different version of the OSM file or with another highway filter.
+        """
+        source_hash = file_hash(osm_file) if os.path.exists(osm_file) else None
+        highways = kwargs.get("highways", WALKABLE_HIGHWAYS)
+        try:
+            metadata, arrays = read_compiled_graph(path)
+        except (OSError, ValueError):
+            metadata, arrays = None, None
+
+        if (metadata is None or (source_hash is not None and metadata.get("source_hash") != source_hash)
+                or metadata.get("highways") != (sorted(highways) if highways is not None else None)):
+            campus = cls(osm_file, **kwargs)
+            try:
+                campus.save(path)
+            except OSError as e:
+                print(f"Could not write graph cache {path}: {e}")
+            return campus
+
+        names = metadata["names"]
+        locations = {loc: (float(lat), float(lon))
+                     for loc, lat, lon in zip(names, arrays["location_lats"], arrays["location_lons"])}
+        edges = [(names[i], names[j], float(weight))
+                 for i, j, weight in zip(arrays["edge_sources"].tolist(), arrays["edge_targets"].tolist(),
+                                         arrays["edge_weights"].tolist())]
+        network = WayNetwork(arrays["network_node_ids"], arrays["network_lats"], arrays["network_lons"],
+                             arrays["network_offsets"], arrays["network_targets"], arrays["network_weights"],
+                             edge_classes=arrays["network_edge_classes"], tag_classes=metadata["tag_classes"])
+        ways = WayRefs(arrays["way_ids"], arrays["way_ends"], arrays["way_refs"])
+        location_nodes = {loc: node for loc, node in zip(names, arrays["location_nodes"].tolist()) if node >= 0}
+        location_ids = {loc: node_id for loc, node_id in zip(names, arrays["location_ids"].tolist()) if node_id >= 0}
+        landmarks = LandmarkIndex(arrays["landmark_nodes"], arrays["landmark_distances"])
+
+        campus = cls(None, **kwargs)
+        campus._load_graph(locations, edges, network, ways, location_nodes, landmarks)
+        campus.location_ids = location_ids
+        campus.source_hash = metadata.get("source_hash")
+        return campus
+
+    def save(self, path: str) -> None:
+        """
+        Write the compiled graph (names, coordinates and OSM ids, location edges, walkway CSR arrays and
+        tag classes, way references and ALT landmark distances) to `path`
+        """
+        state = self._walkways
+        landmarks = self.landmark_index(state)
+        names = list(self.node_positions.keys())
+        index = {loc: i for i, loc in enumerate(names)}
+        core = self.core
+        edges = [(core.names[u], core.names[v], weight) for u, v, weight in core.edges()]
+        arrays = {
+            "location_lats": np.array([self.node_positions[loc][0] for loc in names], dtype=np.float64),
+            "location_lons": np.array([self.node_positions[loc][1] for loc in names], dtype=np.float64),
+            "location_nodes": np.array([state.location_nodes.get(loc, -1) for loc in names], dtype=np.int64),
+            "location_ids": np.array([self.location_ids.get(loc, -1) for loc in names], dtype=np.int64),
+            "edge_sources": np.array([index[loc1] for loc1, _, _ in edges], dtype=np.int32),
+            "edge_targets": np.array([index[loc2] for _, loc2, _ in edges], dtype=np.int32),
+            "edge_weights": np.array([weight for _, _, weight in edges], dtype=np.float64),
+            "network_node_ids": state.network.node_ids,
+            "network_lats": state.network.lats,
+            "network_lons": state.network.lons,
+            "network_offsets": state.network.offsets,
+            "network_targets": state.network.targets,
+            "network_weights": state.network.weights,
+            "network_edge_classes": state.network.edge_classes,
+            "way_ids": self.ways.ids,
+            "way_ends": self.ways.ends,
+            "way_refs": self.ways.refs,
+            "landmark_nodes": landmarks.landmarks,
+            "landmark_distances": landmarks.distances,
+        }
+        write_compiled_graph(path, arrays, {
+            "source_hash": self.source_hash,
+            "highways": sorted(self.highways) if self.highways is not None else None,
+            "names": names,
+            "tag_classes": state.network.tag_classes,
+        })
+
+    def reload(self, osm_file: str = "giki.osm"):
+        """Rebuild the graph from an OSM file, dropping every cached route"""
         self._initialize_campus_graph(osm_file)
 
+    @timed("giki_graph_build_seconds", source="osm")
     def _initialize_campus_graph(self, osm_file: str):
-        # Parse OSM file to get locations and edges
-        locations, edges = parse_osm_file(osm_file)
-        
-        # Add nodes with positions
-        for loc, coords in locations.items():
-            self.graph.add_node(loc)
-            self.node_positions[loc] = coords
-
-        # Add edges with weights (distances in meters)
-        for edge in edges:
-            loc1, loc2, distance = edge
-            self.graph.add_edge(loc1, loc2, weight=distance)
-
-    def _heuristic(self, node1: str, node2: str) -> float:
-        """Calculate Haversine distance between two nodes using real-world coordinates"""
-        lat1, lon1 = self.node_positions[node1]
-        lat2, lon2 = self.node_positions[node2]
-        return self._haversine_distance(lat1, lon1, lat2, lon2)
-
-    def _haversine_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """Calculate the Haversine distance between two points in meters."""
-        R = 6371000  # Earth's radius in meters
-        
-        phi1 = math.radians(lat1)
-        phi2 = math.radians(lat2)
-        delta_phi = math.radians(lat2 - lat1)
-        delta_lambda = math.radians(lon2 - lon1)
-        
-        a = (math.sin(delta_phi/2) * math.sin(delta_phi/2) +
-             math.cos(phi1) * math.cos(phi2) *
-             math.sin(delta_lambda/2) * math.sin(delta_lambda/2))
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        return R * c
-
-    def find_path(self, start: str, end: str, algorithm: str = "dijkstra") -> Tuple[List[str], float]:
-        """Find shortest path using specified algorithm"""
-        if algorithm == "astar":
-            # Use A* with Haversine distance as heuristic
-            path = nx.astar_path(self.graph, start, end, 
-                               heuristic=lambda n1, n2: self._heuristic(n1, n2),
-                               weight="weight")
+        # Stream the OSM file into named locations and the walkway network
+        locations, network, ways, location_ids = load_walkway_network(osm_file, highways=self.highways)
+        edges = nearest_location_edges(locations)
+        self._load_graph(locations, edges, network, ways)
+        self.location_ids = location_ids
+        self.source_hash = file_hash(osm_file)
+
+    def _load_graph(self, locations: Dict[str, Tuple[float, float]], edges: List[Tuple[str, str, float]],
+                    network: WayNetwork, ways: WayRefs, location_nodes: Optional[Dict[str, int]] = None,
+                    landmarks: Optional[LandmarkIndex] = None):
+        # Intern the location names and pack the weighted edges into CSR arrays
+        self.core = CoreGraph.from_edges(locations, edges)
+        self.node_positions = dict(locations)
+        self.location_index = self._build_location_index(self.node_positions)
+        self.ways = ways
+
+        # Snap each named location to its closest walkway node in one batched query
+        if location_nodes is None:
+            location_nodes = self._snap_locations(network, self.node_positions)
+        self._walkways = self._walkway_state(network, location_nodes, landmarks)
+
+        # Results computed on the previous graph are no longer valid
+        self.version += 1
+        self.route_cache.clear()
+        self._shortest_paths = None
+        if self.precompute:
+            self.shortest_path_table()
+
+    @staticmethod
+    def _build_location_index(positions: Dict[str, Tuple[float, float]]) -> SpatialIndex:
+        names = list(positions.keys())
+        return SpatialIndex(names, [positions[loc][0] for loc in names], [positions[loc][1] for loc in names])
+
+    @staticmethod
+    def _snap_locations(network: WayNetwork, positions: Dict[str, Tuple[float, float]]) -> Dict[str, int]:
+        names = list(positions.keys())
+        if not len(network) or not names:
+            return {}
+        nodes = network.nearest_nodes([positions[loc][0] for loc in names], [positions[loc][1] for loc in names])
+        return dict(zip(names, nodes.tolist()))
+
+    @staticmethod
+    def _walkway_state(network: WayNetwork, location_nodes: Dict[str, int],
+                       landmarks: Optional[LandmarkIndex] = None) -> WalkwayState:
+        node_locations = {}
+        for loc, node in location_nodes.items():
+            node_locations.setdefault(node, []).append(loc)
+        return WalkwayState(network, location_nodes, node_locations, landmarks)
+
+    def apply_patch(self, patch: GraphPatch) -> int:
+        """
+        Apply walkway and location changes (e.g. from `GraphPatch.from_osm_change`) to the live graph.
+        Only the touched adjacency, snapped locations and cached routes are updated, and searches
+        already running keep using the previous snapshot. Returns the new graph version.
+        """
+        with self._update_lock:
+            state = self._walkways
+            network = state.network
+
+            # Edges of the previous version of each changed way are removed, those of the new version added
+            removed = list(patch.removed_edges)
+            added = list(patch.added_edges)
+            added_tags = [()] * len(added)  # Profile tags of each added edge
+            for way_id, refs in patch.ways.items():
+                old_refs = self.ways.refs_of(way_id)
+                if old_refs is not None:
+                    removed.extend(zip(old_refs.tolist(), old_refs[1:].tolist()))
+                if refs is not None:
+                    added.extend(zip(refs, refs[1:]))
+                    added_tags.extend([patch.way_tags.get(way_id, ())] * (len(refs) - 1))
+
+            # Nodes used by new edges that the network doesn't have yet are appended after the existing ones
+            referenced = np.unique(np.asarray(added, dtype=np.int64).reshape(-1))
+            missing = referenced[network.indices_of(referenced) < 0].tolist()
+            new_ids = [node_id for node_id in missing if node_id in patch.nodes]
+            appended = {node_id: len(network) + i for i, node_id in enumerate(new_ids)}
+            lats = np.concatenate((network.lats, [patch.nodes[node_id][0] for node_id in new_ids]))
+            lons = np.concatenate((network.lons, [patch.nodes[node_id][1] for node_id in new_ids]))
+
+            def all_indices(edges: List[Tuple[int, int]]) -> np.ndarray:
+                # Node index pairs, with -1 for nodes that are in neither the network nor the patch
+                flat = np.asarray(edges, dtype=np.int64).reshape(-1)
+                indices = network.indices_of(flat)
+                for k in np.nonzero(indices < 0)[0]:
+                    indices[k] = appended.get(int(flat[k]), -1)
+                return indices.reshape(-1, 2)
+
+            def to_indices(edges: List[Tuple[int, int]]) -> np.ndarray:
+                pairs = all_indices(edges)
+                return pairs[(pairs >= 0).all(axis=1)]
+
+            def lengths(pairs: np.ndarray) -> np.ndarray:
+                return rowwise_distances(lats[pairs[:, 0]], lons[pairs[:, 0]], lats[pairs[:, 1]], lons[pairs[:, 1]])
+
+            added_pairs = all_indices(added)
+            known = (added_pairs >= 0).all(axis=1)
+            added_pairs = added_pairs[known]
+            added_tags = [tags for tags, ok in zip(added_tags, known.tolist()) if ok]
+            opened_pairs = to_indices(patch.opened_edges)
+            closed_pairs = to_indices(patch.closed_edges)
+            new_network = network.patched(
+                new_ids, lats[len(network):], lons[len(network):],
+                remove=to_indices(removed).tolist(),
+                add=[(u, v, w) for (u, v), w in zip(added_pairs.tolist(), lengths(added_pairs).tolist())],
+                add_tags=added_tags,
+                reweight=[(u, v, float('inf')) for u, v in closed_pairs.tolist()] +
+                         [(u, v, w) for (u, v), w in zip(opened_pairs.tolist(), lengths(opened_pairs).tolist())])
+
+            # Named locations: rebuild the small location graph only if a location changed
+            locations_changed = bool(patch.locations or patch.removed_locations)
+            if locations_changed:
+                positions = {loc: coords for loc, coords in self.node_positions.items()
+                             if loc not in patch.removed_locations}
+                positions.update(patch.locations)
+                core = CoreGraph.from_edges(positions, nearest_location_edges(positions))
+                # Published before the walkway state, which readers take first
+                self.node_positions = positions
+                self.core = core
+                self.location_index = self._build_location_index(positions)
+                self.location_ids = {loc: node_id for loc, node_id in self.location_ids.items()
+                                     if loc not in patch.removed_locations}
+                self.location_ids.update(patch.location_ids)
+                self._shortest_paths = None
+
+            # New nodes may now be the closest to a location, and removed edges may have left a location's
+            # node without any; re-snapping is one batched query
+            location_nodes = state.location_nodes
+            if locations_changed or new_ids or len(removed):
+                location_nodes = self._snap_locations(new_network, self.node_positions)
+
+            # Removing or closing edges only lengthens paths, so landmark lower bounds stay admissible
+            could_shorten = bool(len(added_pairs) or len(opened_pairs) or new_ids)
+            snaps_changed = location_nodes != state.location_nodes
+            landmarks = None if could_shorten else state.landmarks
+            self._walkways = self._walkway_state(new_network, location_nodes, landmarks)
+            self.ways = self.ways.replace(patch.ways) if patch.ways else self.ways
+
+            # Keep cached results the change cannot have affected
+            blocked = {frozenset(edge) for edge in removed + list(patch.closed_edges)}
+
+            def still_valid(key: Tuple, value) -> bool:
+                if locations_changed:
+                    return False
+                if key[2].startswith("alternatives:"):
+                    # Which alternatives qualify depends on every walkway around the shortest route
+                    return not (could_shorten or snaps_changed or blocked)
+                if key[2].startswith("route:"):
+                    if could_shorten or snaps_changed:
+                        return False
+                    return not any(frozenset(edge) in blocked for edge in zip(value.nodes, value.nodes[1:]))
+                return True
+
+            old_version = self.version
+            self.version += 1
+            self.route_cache.rekey(old_version, self.version, still_valid)
+            if locations_changed and self.precompute:
+                self.shortest_path_table()
+            return self.version
+
+    def landmark_index(self, state: Optional[WalkwayState] = None) -> LandmarkIndex:
+        """Return the ALT landmark preprocessing of the walkway network, building it on first use"""
+        state = state or self._walkways
+        landmarks = state.landmarks
+        if landmarks is None:
+            landmarks = LandmarkIndex.build(state.network)
+            # Only publish it if the network hasn't been patched in the meantime
+            if self._walkways is state:
+                self._walkways = state._replace(landmarks=landmarks)
+        return landmarks
+
+    def shortest_path_table(self) -> ShortestPathTable:
+        """Return the all-pairs shortest-path table of the location graph, building it on first use"""
+        table = self._shortest_paths
+        if table is None:
+            table = self._shortest_paths = ShortestPathTable.from_core(self.core)
+        return table
+
+    def distance_matrix(self) -> Tuple[List[str], np.ndarray]:
+        """Return the location names and the matrix of shortest-path distances between them (in meters)"""
+        table = self.shortest_path_table()
+        return list(table.names), table.distances
+
+    def nearest_location(self, lat: float, lon: float) -> Tuple[str, float]:
+        """Return the named location closest to the given coordinates and its distance in meters"""
+        return self.location_index.nearest(lat, lon)
+
+    def locations_within(self, lat: float, lon: float, radius: float) -> List[Tuple[str, float]]:
+        """Return the named locations within `radius` meters of the given coordinates, nearest first"""
+        return self.location_index.within_radius(lat, lon, radius)
+
+    def find_route(self, start: str, end: str, algorithm: str = "dijkstra", profile: str = DEFAULT_PROFILE) -> Route:
+        """
+        Find the shortest walking route between two locations along the OSM walkway network.
+        `algorithm` is "dijkstra" or "alt" (A* with landmark lower bounds).
+        `profile` picks the edge costs minimized (see profiles.PROFILES); the route's distance is always in meters.
+        """
+        check_profile(profile)
+        version = self.version
+        state = self._walkways
+        positions = self.node_positions
+        if start not in state.location_nodes or end not in state.location_nodes:
+            raise nx.NodeNotFound(f"{start if start not in state.location_nodes else end} is not on the walkway network")
+        key = f"route:{algorithm}" if profile == DEFAULT_PROFILE else f"route:{algorithm}:{profile}"
+        return self.route_cache.get_or_compute(
+            start, end, key, version,
+            lambda: self._build_route(state, positions, start, positions[start], state.location_nodes[start], end,
+                                      algorithm, profile),
+            reverse=reverse_route)
+
+    def find_route_from(self, lat: float, lon: float, end: str, label: str = "Current Location",
+                        algorithm: str = "dijkstra", profile: str = DEFAULT_PROFILE) -> Route:
+        """Find the shortest walking route from arbitrary coordinates (e.g. a GPS fix) to a location"""
+        check_profile(profile)
+        state = self._walkways
+        positions = self.node_positions
+        if end not in state.location_nodes:
+            raise nx.NodeNotFound(f"{end} is not on the walkway network")
+        return self._build_route(state, positions, label, (lat, lon), state.network.nearest_node(lat, lon), end,
+                                 algorithm, profile)
+
+    def find_alternatives(self, start: str, end: str, k: int = 3, profile: str = DEFAULT_PROFILE) -> List[Route]:
+        """
+        Find up to `k` walking routes between two locations along the walkways, the shortest first.
+        The others are real alternatives rather than small detours around it: each costs at most 40% more
+        and shares at most 60% of the shortest route with every route before it (see alternatives.py).
+        All of them come from one search from each end, so asking for more routes costs no further searches,
+        and the shortest is also cached as the `find_route` answer. The search from the start is guided by
+        the ALT landmarks, which are built on first use.
+        """
+        check_profile(profile)
+        version = self.version
+        state = self._walkways
+        positions = self.node_positions
+        if start not in state.location_nodes or end not in state.location_nodes:
+            raise nx.NodeNotFound(f"{start if start not in state.location_nodes else end} is not on the walkway network")
+
+        def compute() -> List[Route]:
+            paths = alternative_paths(state.network, state.location_nodes[start], state.location_nodes[end], k, profile,
+                                      landmarks=self.landmark_index(state))
+            routes = [self._route_along(state, positions, start, positions[start], nodes, end) for nodes, _ in paths]
+            route_key = "route:dijkstra" if profile == DEFAULT_PROFILE else f"route:dijkstra:{profile}"
+            self.route_cache.put(start, end, route_key, version, routes[0])
+            return routes
+
+        key = f"alternatives:{k}" if profile == DEFAULT_PROFILE else f"alternatives:{k}:{profile}"
+        routes = self.route_cache.get_or_compute(start, end, key, version, compute,
+                                                 reverse=lambda routes: [reverse_route(route) for route in routes])
+        return list(routes)
+
+    def _network_path(self, state: WalkwayState, source: int, target: int, algorithm: str,
+                      profile: str = DEFAULT_PROFILE) -> Tuple[List[int], float]:
+        # Landmark distances are lower bounds in meters, so ALT only applies to the distance profile
+        if algorithm == "alt" and profile == DEFAULT_PROFILE:
+            return self.landmark_index(state).shortest_path(state.network, source, target)
+        return state.network.shortest_path(source, target, profile)
+
+    def _build_route(self, state: WalkwayState, positions: Dict[str, Tuple[float, float]], start: str,
+                     start_coords: Tuple[float, float], source: int, end: str, algorithm: str = "dijkstra",
+                     profile: str = DEFAULT_PROFILE) -> Route:
+        nodes, _ = self._network_path(state, source, state.location_nodes[end], algorithm, profile)
+        return self._route_along(state, positions, start, start_coords, nodes, end)
+
+    def _route_along(self, state: WalkwayState, positions: Dict[str, Tuple[float, float]], start: str,
+                     start_coords: Tuple[float, float], nodes: List[int], end: str) -> Route:
+        network = state.network
+        if start == end:
+            # Already there: no walk out to the snapped node and back
+            return Route([start], 0.0, [], [])
+
+        # Walk from the start to its snapped node, along the walkways, then on to the end location
+        segments = [access_segment(start_coords, network.coordinates(nodes[0]))]
+        segments.extend(network.segments(nodes))
+        segments.append(access_segment(network.coordinates(nodes[-1]), positions[end]))
+        distance = sum(segment.length for segment in segments)
+
+        # Named locations passed along the way
+        path = [start]
+        for node in nodes:
+            for loc in state.node_locations.get(node, []):
+                if loc not in (start, end) and loc not in path:
+                    path.append(loc)
+        path.append(end)
+
+        return Route(path, distance, [int(network.node_ids[node]) for node in nodes], segments)
+
+    def find_path(self, start: str, end: str, algorithm: str = "dijkstra",
+                  heuristic_weight: float = 1.0, profile: str = DEFAULT_PROFILE) -> Tuple[List[str], float]:
+        """
+        Find shortest path using specified algorithm, reusing cached results for the current graph.
+        `algorithm` is "dijkstra", "astar", "bidijkstra" or "biastar" (bidirectional Dijkstra and A*)
+        over the location graph, "precomputed" (all-pairs table), or "network" / "alt" along the walkways.
+        For "astar", `heuristic_weight` scales the straight-line heuristic; above 1 the search
+        is faster but the path is only guaranteed within that factor of the shortest.
+        A `profile` other than "distance" (e.g. "wheelchair") routes along the walkways, whose edges
+        carry the way tags profiles are computed from; the distance returned is still in meters.
+        """
+        with timer("giki_find_path_seconds", algorithm=algorithm):
+            return self._find_path(start, end, algorithm, heuristic_weight, profile)
+
+    def _find_path(self, start: str, end: str, algorithm: str, heuristic_weight: float,
+                   profile: str = DEFAULT_PROFILE) -> Tuple[List[str], float]:
+        if algorithm in ("network", "alt") or profile != DEFAULT_PROFILE:
+            # Route along the real walkways instead of the location graph
+            route = self.find_route(start, end, algorithm="alt" if algorithm == "alt" else "dijkstra", profile=profile)
+            return list(route.path), route.distance
+
+        if algorithm == "precomputed":
+            # Walk the next-hop pointers of the all-pairs table
+            return self.shortest_path_table().path(start, end)
+
+        version = self.version
+        key = f"astar:{heuristic_weight}" if algorithm == "astar" and heuristic_weight != 1.0 else algorithm
+        path, distance = self.route_cache.get_or_compute(
+            start, end, key, version, lambda: self.search(start, end, algorithm, heuristic_weight))
+        return list(path), distance
+
+    def astar_search(self) -> CoordinateAStar:
+        """Return the array-backed A* search over the location graph, building it when the graph changes"""
+        core, search = self._astar
+        current = self.core
+        if core is not current:
+            search = CoordinateAStar.from_core(current)
+            self._astar = (current, search)
+        return search
+
+    def bidirectional_search(self) -> BidirectionalSearch:
+        """Return the bidirectional Dijkstra / A* search over the location graph, building it when the graph changes"""
+        core, search = self._bidirectional
+        current = self.core
+        if core is not current:
+            search = BidirectionalSearch.from_core(current)
+            self._bidirectional = (current, search)
+        return search
+
+    def location_resolver(self) -> LocationResolver:
+        """Return the fuzzy resolver over the location names, rebuilding it when the graph changes"""
+        core, resolver = self._resolver
+        current = self.core
+        if core is not current:
+            resolver = LocationResolver(current.names)
+            self._resolver = (current, resolver)
+        return resolver
+
+    def distances_from(self, source: str, algorithm: str = "dijkstra") -> Tuple[List[str], np.ndarray]:
+        """Return every location name and its shortest-path distance from `source` (in meters, inf if unreachable)"""
+        if algorithm == "network":
+            names = list(self._walkways.location_nodes)
         else:
-            # Use Dijkstra's algorithm
-            path = nx.dijkstra_path(self.graph, start, end, weight="weight")
-        
-        # Calculate total path distance
-        distance = sum(self.graph[path[i]][path[i+1]]['weight'] for i in range(len(path)-1))
-        return path, distance
-
-    def visualize_path(self, path: List[str] = None) -> folium.Map:
-        """Visualize the graph and highlight the given path using folium"""
-        # Calculate center of the map
-        lats = [lat for lat, _ in self.node_positions.values()]
-        lons = [lon for _, lon in self.node_positions.values()]
-        center_lat = sum(lats) / len(lats)
-        center_lon = sum(lons) / len(lons)
-        
-        # Create the map
-        m = folium.Map(location=[center_lat, center_lon], zoom_start=16)
-        
-        # Add all nodes as markers
-        for node, (lat, lon) in self.node_positions.items():
-            color = 'green' if path and node in path else 'blue'
-            folium.CircleMarker(
-                location=[lat, lon],
-                radius=6,
-                color=color,
-                fill=True,
-                fill_color=color,
-                popup=node
+            names = list(self.core.names)
+        distances, _ = self.find_paths_batch([source], names, algorithm=algorithm)
+        return names, distances[0]
+
+    def find_paths_batch(self, sources: List[str], targets: List[str], algorithm: str = "dijkstra",
+                         return_paths: bool = False, processes: Optional[int] = None
+                         ) -> Tuple[np.ndarray, Optional[List[List[Optional[object]]]]]:
+        """
+        Find the shortest paths from every source to every target with one single-source Dijkstra per source.
+        `algorithm` is "dijkstra" (location graph), "network" (walkway network) or "precomputed" (all-pairs table).
+        Large batches are searched in a process pool of `processes` workers (one per CPU by default).
+        Returns:
+            - distances: (len(sources), len(targets)) matrix in meters, inf where no path exists
+            - paths: if `return_paths`, paths[i][j] is the location list (a Route for "network"), or None
+        """
+        if algorithm == "network":
+            return self._route_batch(sources, targets, return_paths, processes)
+
+        core = self.core
+        for loc in list(sources) + list(targets):
+            if loc not in core:
+                raise nx.NodeNotFound(f"{loc} is not a known location")
+
+        if algorithm == "precomputed":
+            table = self.shortest_path_table()
+            distances = table.distances[np.ix_([table.index[loc] for loc in sources], [table.index[loc] for loc in targets])]
+            paths = None
+            if return_paths:
+                paths = [[table.path(start, end)[0] if np.isfinite(distances[i, j]) else None
+                          for j, end in enumerate(targets)] for i, start in enumerate(sources)]
+            return distances, paths
+
+        names, index = core.names, core.ids
+        unique_sources = list(dict.fromkeys(index[loc] for loc in sources))
+        rows = {node: row for row, node in enumerate(unique_sources)}
+        dist, prev = shortest_path_trees(core.offsets, core.targets, core.weights, unique_sources, processes)
+
+        source_rows = [rows[index[loc]] for loc in sources]
+        target_cols = [index[loc] for loc in targets]
+        distances = dist[np.ix_(source_rows, target_cols)]
+        paths = None
+        if return_paths:
+            paths = [[[names[node] for node in tree_path(prev[row], index[start], col)] if np.isfinite(dist[row, col]) else None
+                      for col in target_cols] for start, row in zip(sources, source_rows)]
+        return distances, paths
+
+    def plan_tour(self, stops: List[str], return_to_start: bool = True, algorithm: str = "dijkstra",
+                  time_budget: float = TIME_BUDGET, processes: Optional[int] = None) -> Tour:
+        """
+        Find a short order to visit every stop, starting at the first one (and ending there if `return_to_start`).
+        The stop-to-stop distances come from one batched `find_paths_batch` call. Orders of up to
+        tours.EXACT_MAX_STOPS stops are exact (Held-Karp); longer ones start from nearest neighbor
+        and are improved by 2-opt and Or-opt moves for up to `time_budget` seconds.
+        `algorithm` is "dijkstra", "precomputed" or "network" (along the walkways, giving the tour a Route).
+        `processes` is passed on to `find_paths_batch`.
+        """
+        stops = list(dict.fromkeys(stops))
+        if not stops:
+            raise ValueError("A tour needs at least one stop")
+        distances, paths = self.find_paths_batch(stops, stops, algorithm=algorithm, return_paths=True,
+                                                 processes=processes)
+        order, distance, optimal = optimize_order(distances, closed=return_to_start, time_budget=time_budget)
+        if not np.isfinite(distance):
+            raise nx.NetworkXNoPath(f"Not every stop can be reached from {stops[0]}")
+
+        visits = order + [order[0]] if return_to_start and len(order) > 1 else order
+        legs = [paths[i][j] for i, j in zip(visits, visits[1:])]
+        route = None
+        if algorithm == "network":
+            route = join_routes(legs) if legs else None
+            path = route.path if route is not None else [stops[0]]
+        else:
+            path = [stops[0]]
+            for leg in legs:
+                path.extend(leg[1:])
+        return Tour([stops[i] for i in visits], distance, path, legs, route, optimal)
+
+    def _route_batch(self, sources: List[str], targets: List[str], return_paths: bool,
+                     processes: Optional[int]) -> Tuple[np.ndarray, Optional[List[List[Optional[Route]]]]]:
+        state = self._walkways
+        positions = self.node_positions
+        network = state.network
+        for loc in list(sources) + list(targets):
+            if loc not in state.location_nodes:
+                raise nx.NodeNotFound(f"{loc} is not on the walkway network")
+
+        # Walking distance between each location and its snapped node, added at both ends of a route
+        def access_lengths(names: List[str]) -> np.ndarray:
+            nodes = [state.location_nodes[loc] for loc in names]
+            return rowwise_distances(np.array([positions[loc][0] for loc in names]),
+                                     np.array([positions[loc][1] for loc in names]),
+                                     network.lats[nodes], network.lons[nodes])
+
+        unique_sources = list(dict.fromkeys(state.location_nodes[loc] for loc in sources))
+        rows = {node: row for row, node in enumerate(unique_sources)}
+        dist, prev = shortest_path_trees(network.offsets, network.targets, network.weights, unique_sources, processes)
+
+        source_rows = [rows[state.location_nodes[loc]] for loc in sources]
+        target_cols = [state.location_nodes[loc] for loc in targets]
+        distances = (dist[np.ix_(source_rows, target_cols)]
+                     + access_lengths(list(sources))[:, None] + access_lengths(list(targets))[None, :])
+        # A location is no distance from itself, though the access legs above would walk to its node and back
+        distances[np.array(sources, dtype=object)[:, None] == np.array(targets, dtype=object)[None, :]] = 0.0
+        paths = None
+        if return_paths:
+            paths = [[self._route_along(state, positions, start, positions[start],
+                                        tree_path(prev[row], state.location_nodes[start], col), end)
+                      if np.isfinite(distances[i, j]) else None
+                      for j, (end, col) in enumerate(zip(targets, target_cols))]
+                     for i, (start, row) in enumerate(zip(sources, source_rows))]
+        return distances, paths
+
+    def search(self, start: str, end: str, algorithm: str = "dijkstra", heuristic_weight: float = 1.0) -> Tuple[List[str], float]:
+        """
+        Run one search over the location graph without the route cache, e.g. to compare algorithms.
+        `algorithm` is "dijkstra", "astar", "bidijkstra" or "biastar".
+        """
+        if algorithm == "astar":
+            # A* over precomputed coordinate arrays with a straight-line heuristic
+            return self.astar_search().find_path(start, end, heuristic_weight)
+        if algorithm in ("bidijkstra", "biastar"):
+            # One search from each end, meeting in the middle
+            return self.bidirectional_search().find_path(start, end, heuristic=algorithm == "biastar")
+
+        # Dijkstra over the core graph's CSR arrays
+        return self.core.find_path(start, end)
+
+    def map_layers(self) -> MapLayers:
+        """
+        Return the static map geometry (locations, location-graph edges and merged walkway polylines).
+        Built once per graph version and reused by every `visualize_path` call; styles are stored
+        in the features so the map doesn't need a style function.
+        """
+        layers = self._map_layers
+        version = self.version
+        if layers is not None and layers.version == version:
+            return layers
+
+        positions = self.node_positions
+        network = self._walkways.network
+        lats = [lat for lat, _ in positions.values()]
+        lons = [lon for _, lon in positions.values()]
+        locations = [
+            {"type": "Feature",
+             "geometry": {"type": "Point", "coordinates": [lon, lat]},
+             "properties": {"name": node, "style": {"color": "blue", "fillColor": "blue"}}}
+            for node, (lat, lon) in positions.items()
+        ]
+        core = self.core
+        edges = [np.array([positions[core.names[u]], positions[core.names[v]]])
+                 for u, v, _ in core.edges() if core.names[u] in positions and core.names[v] in positions]
+        walkways = network_polylines(network) if network is not None else []
+        layers = MapLayers(version, (sum(lats) / len(lats), sum(lons) / len(lons)), locations, edges, walkways, {}, {})
+        self._map_layers = layers
+        return layers
+
+    def walkway_polylines(self, zoom: int) -> List[np.ndarray]:
+        """Return the walkway polylines simplified (Douglas-Peucker) for display at the given zoom level"""
+        layers = self.map_layers()
+        lines = layers.simplified.get(zoom)
+        if lines is None:
+            lines = layers.simplified[zoom] = simplify_polylines(layers.walkways, zoom)
+        return lines
+
+    def base_layer(self, zoom: int, walkways: bool, bounds: Optional[BoundingBox] = None) -> str:
+        """
+        Return the static map layers (walkways if asked for, location-graph edges and locations) as
+        one serialized GeoJSON FeatureCollection. Unclipped layers are serialized once per graph version
+        and zoom level; clipping to `bounds` depends on the route, so those are serialized per call.
+        """
+        layers = self.map_layers()
+        data = layers.serialized.get((zoom, walkways)) if bounds is None else None
+        if data is not None:
+            return data
+
+        features = []
+        if walkways:
+            lines = self.walkway_polylines(zoom)
+            features.append(multilinestring_feature(clip_polylines(lines, bounds) if bounds else lines,
+                                                    {"color": "#555555", "weight": 1.5, "opacity": 0.6}))
+        features.append(multilinestring_feature(clip_polylines(layers.edges, bounds) if bounds else layers.edges,
+                                                {"color": "gray", "weight": 2, "opacity": 0.5}))
+        features.extend(
+            feature for feature in layers.locations
+            if in_bounds(feature["geometry"]["coordinates"][1], feature["geometry"]["coordinates"][0], bounds))
+        data = serialize_geojson({"type": "FeatureCollection", "features": features})
+        if bounds is None:
+            layers.serialized[zoom, walkways] = data
+        return data
+
+    @timed("giki_visualize_path_seconds")
+    def visualize_path(self, path: List[str] = None, route: Optional[Route] = None, walkways: bool = False,
+                       zoom: int = 16, clip_margin: Optional[float] = None,
+                       alternatives: Optional[List[Route]] = None) -> folium.Map:
+        """
+        Visualize the graph and highlight the given path (or walkway route) using folium.
+        With `walkways`, the walkway network is drawn as one MultiLineString simplified for `zoom`.
+        With `clip_margin`, only geometry within that many meters of the path's bounding box is sent.
+        `alternatives` (e.g. from `find_alternatives`, without the highlighted route) are drawn dashed beneath it.
+        """
+        if route is not None:
+            path = route.path
+        positions = self.node_positions
+        alternatives = alternatives or []
+
+        bounds: Optional[BoundingBox] = None
+        if clip_margin is not None and (route is not None or path):
+            if route is not None and route.segments:
+                points = route_points(route)
+            else:
+                points = [positions[node] for node in path]
+            for alternative in alternatives:
+                points.extend(segment.end for segment in alternative.segments)
+            bounds = route_bounds(points, clip_margin)
+
+        # Static layers: one pre-serialized GeoJSON layer, cached per graph version and zoom level
+        m = folium.Map(location=list(self.map_layers().center), zoom_start=zoom)
+        SerializedGeoJson(self.base_layer(zoom, walkways, bounds)).add_to(m)
+        if bounds:
+            m.fit_bounds([[bounds[0], bounds[1]], [bounds[2], bounds[3]]])
+
+        # Route overlay: only the path's own markers and lines are added per request
+        if path:
+            for node in path:
+                if node in positions:
+                    lat, lon = positions[node]
+                    folium.CircleMarker(
+                        location=[lat, lon],
+                        radius=6,
+                        color='green',
+                        fill=True,
+                        fill_color='green',
+                        popup=node
+                    ).add_to(m)
+
+        # Alternative routes, drawn before the main route so it stays on top
+        for i, alternative in enumerate(alternatives):
+            folium.PolyLine(
+                locations=[list(point) for point in route_points(alternative)],
+                color=ALTERNATIVE_COLORS[i % len(ALTERNATIVE_COLORS)],
+                weight=4,
+                opacity=0.8,
+                dash_array='8 6',
+                tooltip=f"Alternative {i + 1}: {alternative.distance:.0f} m"
             ).add_to(m)
-        
-        # Add all edges
-        for edge in self.graph.edges():
-            node1, node2 = edge
-            lat1, lon1 = self.node_positions[node1]
-            lat2, lon2 = self.node_positions[node2]
-            
-            # Create a line between the nodes
-            line = folium.PolyLine(
-                locations=[[lat1, lon1], [lat2, lon2]],
-                color='gray',
-                weight=2,
-                opacity=0.5
-            )
-            line.add_to(m)
-        
+
+        # Highlight the walkway route geometry if provided
+        if route is not None and route.segments:
+            folium.PolyLine(
+                locations=[list(point) for point in route_points(route)],
+                color='red',
+                weight=4,
+                opacity=1
+            ).add_to(m)
+
         # Highlight the path if provided
-        if path:
-            for i in range(len(path) - 1):
-                node1 = path[i]
-                node2 = path[i + 1]
-                lat1, lon1 = self.node_positions[node1]
-                lat2, lon2 = self.node_positions[node2]
-                
-                # Create a highlighted line for the path
-                path_line = folium.PolyLine(
-                    locations=[[lat1, lon1], [lat2, lon2]],
-                    color='red',
-                    weight=4,
-                    opacity=1
-                )
-                path_line.add_to(m)
-        
+        elif path and route is None:
+            folium.PolyLine(
+                locations=[list(positions[node]) for node in path],
+                color='red',
+                weight=4,
+                opacity=1
+            ).add_to(m)
+
         return m 
\ No newline at end of file
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+import struct
+from typing import Dict, Tuple
+import numpy as np
+
+MAGIC = b"GIKIGRPH"
+FORMAT_VERSION = 4
+ALIGNMENT = 64  # Arrays start on 64-byte boundaries so they can be memory-mapped directly
+_PREAMBLE = struct.Struct("<8sII")  # magic, format version, header length
+
+def file_hash(path: str) -> str:
+    """Return the SHA-256 hex digest of a file, used to detect a changed OSM source"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def write_compiled_graph(path: str, arrays: Dict[str, np.ndarray], metadata: Dict) -> None:
+    """
+    Write arrays and JSON metadata to a versioned binary file.
+    Layout: preamble | JSON header | padding | arrays (each 64-byte aligned).
+    The file is written to a temporary path and renamed so readers never see a partial file.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # The header records array offsets, which depend on the header length, so grow it until both agree
+    header_size = 0
+    while True:
+        offset = _align(_PREAMBLE.size + header_size)
+        layout = {}
+        for name, array in arrays.items():
+            layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset = _align(offset + array.nbytes)
+        header = json.dumps({**metadata, "arrays": layout}).encode("utf-8")
+        if len(header) <= header_size:
+            header += b" " * (header_size - len(header))
+            break
+        header_size = _align(_PREAMBLE.size + len(header)) - _PREAMBLE.size
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.write(b"\0" * (layout[name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+def read_compiled_graph(path: str) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    Read the metadata of a compiled graph file and memory-map its arrays (read-only).
+    Raises ValueError if the file is not a compiled graph of the current format version.
+    """
+    with open(path, "rb") as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError(f"{path} is not a compiled campus graph")
+        magic, version, header_length = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled campus graph")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        metadata = json.loads(f.read(header_length).decode("utf-8"))
+
+    arrays = {}
+    for name, spec in metadata.pop("arrays").items():
+        shape = tuple(spec["shape"])
+        if 0 in shape:
+            # Empty arrays cannot be memory-mapped
+            arrays[name] = np.empty(shape, dtype=spec["dtype"])
+        else:
+            arrays[name] = np.memmap(path, dtype=spec["dtype"], mode="r", offset=spec["offset"], shape=shape)
+    return metadata, arrays
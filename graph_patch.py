@@ -0,0 +1,107 @@
+import osmium as osm
+from typing import Collection, Mapping, Optional, Sequence
+from osm_stream import WALKABLE_HIGHWAYS, is_walkable
+from profiles import TagSet, profile_tags
+
+class GraphPatch:
+    """
+    A batch of changes to apply to a live CampusGraph with `CampusGraph.apply_patch`.
+    Walkway edges are identified by the OSM node ids at both ends.
+    """
+
+    def __init__(self):
+        self.nodes = {}  # OSM node id -> (lat, lon) for nodes used by new edges or ways
+        self.added_edges = []  # (node1, node2)
+        self.removed_edges = []  # (node1, node2)
+        self.closed_edges = []  # (node1, node2): kept in the graph but impassable
+        self.opened_edges = []  # (node1, node2): closed edges to make passable again
+        self.ways = {}  # way id -> node ids, for new or modified ways (None deletes the way)
+        self.way_tags = {}  # way id -> profile tags of new or modified ways
+        self.locations = {}  # name -> (lat, lon) for new or moved named locations
+        self.location_ids = {}  # name -> OSM node id of new locations, when known
+        self.removed_locations = []  # names
+
+    def add_node(self, node_id: int, lat: float, lon: float) -> "GraphPatch":
+        self.nodes[node_id] = (lat, lon)
+        return self
+
+    def add_edge(self, node1: int, node2: int) -> "GraphPatch":
+        self.added_edges.append((node1, node2))
+        return self
+
+    def remove_edge(self, node1: int, node2: int) -> "GraphPatch":
+        self.removed_edges.append((node1, node2))
+        return self
+
+    def close_edge(self, node1: int, node2: int) -> "GraphPatch":
+        self.closed_edges.append((node1, node2))
+        return self
+
+    def open_edge(self, node1: int, node2: int) -> "GraphPatch":
+        self.opened_edges.append((node1, node2))
+        return self
+
+    def set_way(self, way_id: int, node_ids: Sequence[int], tags: TagSet = ()) -> "GraphPatch":
+        self.ways[way_id] = list(node_ids)
+        self.way_tags[way_id] = tags
+        return self
+
+    def delete_way(self, way_id: int) -> "GraphPatch":
+        self.ways[way_id] = None
+        return self
+
+    def add_location(self, name: str, lat: float, lon: float, node_id: Optional[int] = None) -> "GraphPatch":
+        self.locations[name] = (lat, lon)
+        if node_id is not None:
+            self.location_ids[name] = node_id
+        return self
+
+    def remove_location(self, name: str) -> "GraphPatch":
+        self.removed_locations.append(name)
+        return self
+
+    def __bool__(self) -> bool:
+        return bool(self.added_edges or self.removed_edges or self.closed_edges or self.opened_edges
+                    or self.ways or self.locations or self.removed_locations)
+
+    @classmethod
+    def from_osm_change(cls, file_path: str, highways: Optional[Collection[str]] = WALKABLE_HIGHWAYS,
+                        location_ids: Optional[Mapping[str, int]] = None) -> "GraphPatch":
+        """
+        Read an osmChange (.osc) file into a patch.
+        Created/modified walkable ways replace their previous node list, deleted ways (or ways that
+        are no longer walkable) are removed, and created/modified named nodes become locations.
+        `location_ids` (CampusGraph.location_ids) gives the OSM node of every current location, so
+        that deleting a named node, or renaming it, removes its old location too.
+        Moving an existing untagged node is not supported and is ignored.
+        """
+        handler = OsmChangeHandler(highways, location_ids)
+        handler.apply_file(file_path)
+        return handler.patch
+
+class OsmChangeHandler(osm.SimpleHandler):
+    """Collects the walkway-relevant parts of an osmChange file into a GraphPatch."""
+
+    def __init__(self, highways: Optional[Collection[str]] = WALKABLE_HIGHWAYS,
+                 location_ids: Optional[Mapping[str, int]] = None):
+        osm.SimpleHandler.__init__(self)
+        self.highways = highways
+        self.names = {node_id: name for name, node_id in (location_ids or {}).items()}  # OSM node id -> location
+        self.patch = GraphPatch()
+
+    def node(self, n):
+        old_name = self.names.get(n.id)
+        name = None if n.deleted else n.tags.get('name')
+        if old_name is not None and old_name != name:
+            self.patch.remove_location(old_name)
+        if n.deleted:
+            return
+        self.patch.add_node(n.id, n.location.lat, n.location.lon)
+        if name is not None:
+            self.patch.add_location(name, n.location.lat, n.location.lon, n.id)
+
+    def way(self, w):
+        if w.deleted or len(w.nodes) < 2 or not is_walkable(w.tags, self.highways):
+            self.patch.delete_way(w.id)
+        else:
+            self.patch.set_way(w.id, [n.ref for n in w.nodes], profile_tags(w.tags))
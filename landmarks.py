@@ -0,0 +1,143 @@
+import heapq
+import random
+import sys
+from typing import List, Tuple
+import networkx as nx
+import numpy as np
+from metrics import record_search
+from way_network import WayNetwork
+
+UNREACHABLE = 1e15  # Stand-in landmark distance for nodes in another component
+
+class LandmarkIndex:
+    """
+    ALT (A*, Landmarks, Triangle inequality) preprocessing for the walkway network.
+    Stores the distance from a few well-spread landmark nodes to every node, which gives
+    the lower bound |d(L, t) - d(L, v)| <= d(v, t) for A* on an undirected graph.
+    """
+
+    def __init__(self, landmarks: np.ndarray, distances: np.ndarray):
+        self.landmarks = landmarks  # Network node indices of the landmarks
+        self.distances = distances  # Shape (len(landmarks), len(network)), memory-mapped when loaded from a cache
+        self._rows = None  # Per-node tuples of landmark distances, built on the first query
+        self._finite = None  # The distances with unreachable ones made finite, built on the first `lower_bounds`
+
+    def rows(self) -> List[Tuple[float, ...]]:
+        """
+        Landmark distances of every node as tuples, which keep the heuristic a tight Python loop.
+        Built on first use, so loading a compiled graph doesn't copy the distances into the heap.
+        Unreachable nodes get a large finite distance so that two of them bound to 0, not NaN.
+        """
+        rows = self._rows
+        if rows is None:
+            finite = np.where(np.isfinite(self.distances), self.distances, UNREACHABLE)
+            rows = self._rows = [tuple(row) for row in np.asarray(finite).T.tolist()]
+        return rows
+
+    @classmethod
+    def build(cls, network: WayNetwork, count: int = 8) -> "LandmarkIndex":
+        """Pick landmarks by farthest-point selection and run one Dijkstra from each"""
+        count = min(count, len(network))
+        if not count:
+            return cls(np.empty(0, dtype=np.int64), np.empty((0, len(network))))
+
+        # Start from the node farthest from an arbitrary node, then keep adding the node
+        # farthest from every landmark chosen so far
+        closest = np.asarray(network.shortest_distances(0))
+        landmarks = []
+        distances = []
+        for _ in range(count):
+            candidate = int(np.argmax(np.where(np.isfinite(closest), closest, -1)))
+            if landmarks and closest[candidate] <= 0:
+                break
+            landmarks.append(candidate)
+            distances.append(network.shortest_distances(candidate))
+            closest = np.minimum(closest, distances[-1]) if len(landmarks) > 1 else np.asarray(distances[-1])
+
+        return cls(np.array(landmarks, dtype=np.int64), np.array(distances, dtype=np.float64))
+
+    def lower_bound(self, node: int, target: int) -> float:
+        """Lower bound on the network distance between two nodes"""
+        rows = self.rows()
+        return max((abs(a - b) for a, b in zip(rows[node], rows[target])), default=0.0)
+
+    def lower_bounds(self, target: int) -> np.ndarray:
+        """Lower bounds on the network distance from every node to a node, for searches that read most of them"""
+        finite = self._finite
+        if finite is None:
+            finite = self._finite = np.where(np.isfinite(self.distances), self.distances, UNREACHABLE)
+        return np.abs(finite - finite[:, target, None]).max(axis=0, initial=0.0)
+
+    def shortest_path(self, network: WayNetwork, source: int, target: int) -> Tuple[List[int], float]:
+        """A* over the CSR arrays, guided by the landmark lower bounds"""
+        offsets, targets, weights = network._offsets, network._targets, network._weights
+        rows = self.rows()
+        target_row = rows[target]
+        n = len(offsets) - 1
+        dist = [float('inf')] * n
+        prev = [-1] * n
+        settled = bytearray(n)
+        settled_count = 0
+        dist[source] = 0.0
+        heap = [(self.lower_bound(source, target), 0.0, source)]
+
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if settled[u]:
+                continue
+            if u == target:
+                break
+            settled[u] = 1
+            settled_count += 1
+            for i in range(offsets[u], offsets[u + 1]):
+                v = targets[i]
+                nd = d + weights[i]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev[v] = u
+                    h = max((abs(a - b) for a, b in zip(rows[v], target_row)), default=0.0)
+                    heapq.heappush(heap, (nd + h, nd, v))
+        else:
+            record_search("alt", settled_count)
+            raise nx.NetworkXNoPath(f"No walkway path between {source} and {target}")
+        record_search("alt", settled_count + 1)
+
+        path = [target]
+        while path[-1] != source:
+            path.append(prev[path[-1]])
+        path.reverse()
+        return path, dist[target]
+
+def verify_against_networkx(network: WayNetwork, landmarks: LandmarkIndex, samples: int = 200,
+                            seed: int = 0) -> List[Tuple[int, int, float, float]]:
+    """
+    Compare ALT distances with nx.dijkstra_path on random node pairs.
+    Returns the mismatching pairs as (source id, target id, alt distance, networkx distance).
+    """
+    graph = network.to_networkx()
+    rng = random.Random(seed)
+    mismatches = []
+    for _ in range(samples):
+        source, target = rng.randrange(len(network)), rng.randrange(len(network))
+        source_id, target_id = int(network.node_ids[source]), int(network.node_ids[target])
+        try:
+            _, distance = landmarks.shortest_path(network, source, target)
+        except nx.NetworkXNoPath:
+            distance = float('inf')
+        try:
+            path = nx.dijkstra_path(graph, source_id, target_id, weight="weight")
+            expected = sum(graph[path[i]][path[i + 1]]['weight'] for i in range(len(path) - 1))
+        except nx.NetworkXNoPath:
+            expected = float('inf')
+        if distance != expected and not abs(distance - expected) <= 1e-6:
+            mismatches.append((source_id, target_id, distance, expected))
+    return mismatches
+
+if __name__ == "__main__":
+    from osm_stream import load_walkway_network
+
+    _, network, _, _ = load_walkway_network(sys.argv[1] if len(sys.argv) > 1 else "giki.osm")
+    index = LandmarkIndex.build(network)
+    mismatches = verify_against_networkx(network, index)
+    print(f"{len(index.landmarks)} landmarks, {len(network)} nodes: {len(mismatches)} mismatches")
+    sys.exit(1 if mismatches else 0)
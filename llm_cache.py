@@ -0,0 +1,89 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from metrics import inc
+
+DEFAULT_TTL = 7 * 24 * 3600  # seconds
+DISTANCE_ROUNDING = 10  # Narratives are shared by distances within the same 10 m
+
+def normalize_query(query: str) -> str:
+    """Case-fold and strip punctuation and extra whitespace, so trivially different phrasings share an entry"""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.casefold()).split())
+
+def narrative_key(path: List[str], distance: float, rounding: int = DISTANCE_ROUNDING) -> str:
+    """Cache key of a route narrative: the path and its distance rounded to `rounding` meters"""
+    return json.dumps([path, int(round(distance / rounding) * rounding)], ensure_ascii=False)
+
+class ResponseCache:
+    """
+    Persistent cache of LLM responses in SQLite, with a time-to-live per entry.
+    Entries are grouped by `kind` (e.g. "locations", "narrative") and hold any JSON value.
+    Safe to share between threads; hit and miss counts are kept per kind.
+    """
+
+    def __init__(self, path: str = "gemini_cache.sqlite", ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = {}  # kind -> count
+        self.misses = {}  # kind -> count
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                                kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,
+                                expires REAL NOT NULL, PRIMARY KEY (kind, key))""")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses WHERE expires > ?", (time.time(),)).fetchone()[0]
+
+    def get(self, kind: str, key: str) -> Any:
+        """Return the cached value, or None on a miss or an expired entry"""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM responses WHERE kind = ? AND key = ? AND expires > ?",
+                                   (kind, key, time.time())).fetchone()
+            counts = self.misses if row is None else self.hits
+            counts[kind] = counts.get(kind, 0) + 1
+        inc("giki_llm_cache_misses_total" if row is None else "giki_llm_cache_hits_total", kind=kind)
+        return None if row is None else json.loads(row[0])
+
+    def contains(self, kind: str, key: str) -> bool:
+        """Whether a live entry exists, without counting a hit or miss"""
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM responses WHERE kind = ? AND key = ? AND expires > ?",
+                                    (kind, key, time.time())).fetchone() is not None
+
+    def put(self, kind: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value for `ttl` seconds (the cache default if not given)"""
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses (kind, key, value, expires) VALUES (?, ?, ?, ?)",
+                             (kind, key, json.dumps(value, ensure_ascii=False), expires))
+
+    def purge_expired(self) -> int:
+        """Delete expired entries, returning how many were removed"""
+        with self._lock:
+            return self._db.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),)).rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self.hits.clear()
+            self.misses.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Hits, misses and hit rate per kind since the cache was opened"""
+        with self._lock:
+            kinds = set(self.hits) | set(self.misses)
+            result = {}
+            for kind in sorted(kinds):
+                hits, misses = self.hits.get(kind, 0), self.misses.get(kind, 0)
+                result[kind] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+            return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
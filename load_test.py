@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+import numpy as np
+
+PERCENTILES = [50, 90, 99]
+DEFAULT_MIX = {"route": 0.7, "nearest": 0.2, "matrix": 0.1}
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection to the API server."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, target: str, body: Optional[bytes] = None) -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = f"{method} {target} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body or b'')}\r\n"
+        if body:
+            head += "Content-Type: application/json\r\n"
+        self.writer.write(head.encode() + b"\r\n" + (body or b""))
+        await self.writer.drain()
+        status_line, _, headers = (await self.reader.readuntil(b"\r\n\r\n")).decode("latin-1").partition("\r\n")
+        length = 0
+        close = False
+        for line in headers.split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+            elif name.lower() == "connection" and value.strip().lower() == "close":
+                close = True
+        payload = await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return int(status_line.split()[1]), payload
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+def _make_request(kind: str, names: List[str], bounds: Tuple[float, float, float, float],
+                  rng: random.Random, algorithm: str) -> Tuple[str, str, Optional[bytes]]:
+    if kind == "route":
+        start, end = rng.sample(names, 2)
+        return "GET", "/route?" + urlencode({"from": start, "to": end, "algorithm": algorithm}), None
+    if kind == "nearest":
+        lat = rng.uniform(bounds[0], bounds[2])
+        lon = rng.uniform(bounds[1], bounds[3])
+        return "GET", "/nearest?" + urlencode({"lat": lat, "lon": lon}), None
+    sources = rng.sample(names, min(5, len(names)))
+    targets = rng.sample(names, min(5, len(names)))
+    return "POST", "/matrix", json.dumps({"sources": sources, "targets": targets}).encode()
+
+async def run_load(url: str, concurrency: int, duration: float, mix: Dict[str, float],
+                   algorithm: str = "dijkstra", seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """
+    Send a random mix of requests from `concurrency` keep-alive connections for `duration` seconds.
+    Returns per-endpoint request counts, errors, throughput and latency percentiles in milliseconds.
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname or "127.0.0.1", parts.port or 80
+    setup = Connection(host, port)
+    status, payload = await setup.request("GET", "/locations")
+    setup.close()
+    if status != 200:
+        raise RuntimeError(f"/locations returned HTTP {status}")
+    locations = json.loads(payload)["locations"]
+    names = [loc["name"] for loc in locations]
+    lats = [loc["lat"] for loc in locations]
+    lons = [loc["lon"] for loc in locations]
+    bounds = (min(lats), min(lons), max(lats), max(lons))
+
+    kinds, weights = zip(*mix.items())
+    samples = {kind: [] for kind in kinds}
+    errors = {kind: 0 for kind in kinds}
+    end = time.perf_counter() + duration
+
+    async def client(index: int):
+        rng = random.Random(seed + index)
+        connection = Connection(host, port)
+        try:
+            while time.perf_counter() < end:
+                kind = rng.choices(kinds, weights)[0]
+                method, target, body = _make_request(kind, names, bounds, rng, algorithm)
+                start = time.perf_counter()
+                try:
+                    status, _ = await connection.request(method, target, body)
+                except (OSError, asyncio.IncompleteReadError):
+                    connection.close()
+                    status = 0
+                samples[kind].append((time.perf_counter() - start) * 1000)
+                # 404 is a valid answer (no path between a random pair); anything else is a failure
+                if status not in (200, 404):
+                    errors[kind] += 1
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for kind in kinds:
+        latencies = np.array(samples[kind]) if samples[kind] else np.zeros(1)
+        results[kind] = {"requests": len(samples[kind]), "errors": errors[kind],
+                         "rps": len(samples[kind]) / elapsed, "mean_ms": float(latencies.mean())}
+        for p in PERCENTILES:
+            results[kind][f"p{p}_ms"] = float(np.percentile(latencies, p))
+    total = sum(len(values) for values in samples.values())
+    results["total"] = {"requests": total, "errors": sum(errors.values()), "rps": total / elapsed}
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the GIKI Campus Navigator JSON API")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--concurrency", type=int, default=32, help="simultaneous keep-alive connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--algorithm", default="dijkstra", help="algorithm for /route requests")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_load(args.url, args.concurrency, args.duration, DEFAULT_MIX, args.algorithm, args.seed))
+    for kind, stats in results.items():
+        line = f"{kind:<8} {stats['requests']:>8} requests  {stats['errors']:>5} errors  {stats['rps']:9.1f} req/s"
+        if "p50_ms" in stats:
+            line += f"  p50 {stats['p50_ms']:8.2f} ms  p90 {stats['p90_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms"
+        print(line)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if results["total"]["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
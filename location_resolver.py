@@ -0,0 +1,200 @@
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from llm_cache import normalize_query
+
+FUZZY_MIN_SCORE = 0.5  # Trigram similarity below this is not treated as a mention
+CONFIDENT_SCORE = 0.65  # Resolutions at least this confident don't need the LLM
+
+# Common ways people refer to campus places; only aliases of locations present in the graph are used
+DEFAULT_ALIASES = {
+    "main gate": "Entrance",
+    "gate": "Entrance",
+    "tuck shop": "Tuc Shop",
+    "tuck": "Tuc Shop",
+    "guest house": "GIKI Guest House",
+    "school": "GIKI School",
+    "admin block": "Administration Block",
+    "admin": "Administration Block",
+    "clinic": "Medical Center",
+    "hospital": "Medical Center",
+    "medical centre": "Medical Center",
+    "girls hostel": "Girls Hostel",
+    "h7": "Hostel 7",
+    "checkpost": "Rightbank checkpost",
+    "brabers": "Brabers Building",
+}
+
+# Words around a mention that say which end of the trip it is
+SOURCE_CUES = {"from", "leaving", "starting", "start", "at"}
+DESTINATION_CUES = {"to", "towards", "toward", "reach", "into", "for", "find"}
+ARTICLES = {"the", "a", "an", "my"}
+STOPWORDS = SOURCE_CUES | DESTINATION_CUES | ARTICLES | {
+    "how", "do", "i", "get", "go", "going", "where", "is", "and", "between", "me", "take",
+    "route", "path", "way", "of", "in", "near", "can", "what", "which", "shortest", "best", "walk",
+    "please", "show", "directions", "navigate", "far", "it", "there",
+}
+
+class Mention(NamedTuple):
+    name: str  # Location name in the graph
+    start: int  # Token span in the normalized query
+    end: int
+    score: float  # 1.0 for an exact name or alias, trigram similarity otherwise
+
+class Resolution(NamedTuple):
+    source: Optional[str]
+    destination: Optional[str]
+    confidence: float  # 0 if either end is missing
+
+def _numbers(text: str) -> frozenset:
+    return frozenset(token for token in text.split() if any(c.isdigit() for c in token))
+
+def _trigrams(text: str) -> Counter:
+    padded = f"  {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+class LocationResolver:
+    """
+    Finds the source and destination of a navigation query among the graph's location names
+    and aliases. Exact mentions are found with a token trie; misspelled ones with a character
+    trigram index, scored by Dice similarity.
+    """
+
+    def __init__(self, names: Iterable[str], aliases: Optional[Dict[str, str]] = None):
+        self.names = list(names)
+        known = set(self.names)
+        aliases = DEFAULT_ALIASES if aliases is None else aliases
+        self.keys = {}  # normalized name or alias -> location name
+        for name in self.names:
+            key = normalize_query(name)
+            self.keys[key] = name
+            if key.startswith("giki ") and len(key) > 5:
+                self.keys.setdefault(key[5:], name)  # "Library" for "GIKI Library"
+        for alias, name in aliases.items():
+            if name in known:
+                self.keys.setdefault(normalize_query(alias), name)
+
+        # Token trie over every key; "" marks the end of a key
+        self.trie = {}
+        for key, name in self.keys.items():
+            node = self.trie
+            for token in key.split():
+                node = node.setdefault(token, {})
+            node[""] = name
+        self.max_tokens = max((len(key.split()) for key in self.keys), default=0)
+
+        # Trigram -> key ids, with each key's trigram counts for scoring
+        self._key_list = list(self.keys)
+        self._key_grams = [_trigrams(key) for key in self._key_list]
+        self._key_sizes = [sum(grams.values()) for grams in self._key_grams]
+        self._key_numbers = [_numbers(key) for key in self._key_list]
+        self.grams = {}
+        for i, grams in enumerate(self._key_grams):
+            for gram in grams:
+                self.grams.setdefault(gram, []).append(i)
+
+    def match(self, text: str) -> Tuple[Optional[str], float]:
+        """Return the location a piece of text most likely names, and its similarity score"""
+        name, score, _ = self._match(normalize_query(text))
+        return name, score
+
+    def _match(self, key: str) -> Tuple[Optional[str], float, bool]:
+        # Also says whether a similar enough location was passed over only because its numbers differ
+        if key in self.keys:
+            return self.keys[key], 1.0, False
+        grams = _trigrams(key)
+        size = sum(grams.values())
+        shared = Counter()
+        for gram, count in grams.items():
+            for i in self.grams.get(gram, ()):
+                shared[i] += min(count, self._key_grams[i][gram])
+        numbers = _numbers(key)
+        best, best_score = None, 0.0
+        number_mismatch = False
+        for i, common in shared.items():
+            score = 2 * common / (size + self._key_sizes[i])
+            if self._key_numbers[i] != numbers:
+                # "Hostel 9" is not a misspelling of "Hostel 7"
+                number_mismatch |= score >= FUZZY_MIN_SCORE
+                continue
+            if score > best_score:
+                best, best_score = self.keys[self._key_list[i]], score
+        return best, best_score, number_mismatch and best_score < FUZZY_MIN_SCORE
+
+    def suggest(self, text: str, limit: int) -> List[str]:
+        """Return up to `limit` location names ranked by trigram overlap with the text"""
+        grams = _trigrams(normalize_query(text))
+        votes = Counter()
+        for gram in grams:
+            for i in self.grams.get(gram, ()):
+                votes[self.keys[self._key_list[i]]] += 1
+        ranked = [name for name, _ in votes.most_common()]
+        return (ranked + [name for name in self.names if name not in votes])[:limit]
+
+    def mentions(self, query: str) -> List[Mention]:
+        """Find non-overlapping location mentions in a query, in order"""
+        tokens = normalize_query(query).split()
+        found = []
+        # Exact names and aliases: longest match from each position
+        for start in range(len(tokens)):
+            node, match = self.trie, None
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if "" in node:
+                    match = Mention(node[""], start, end + 1, 1.0)
+            if match:
+                found.append(match)
+        # Misspellings: spans of content words, compared by trigram similarity
+        rejected = []
+        for start in range(len(tokens)):
+            for end in range(start + 1, min(start + self.max_tokens, len(tokens)) + 1):
+                if tokens[end - 1] in STOPWORDS or tokens[start] in STOPWORDS:
+                    break
+                name, score, number_mismatch = self._match(" ".join(tokens[start:end]))
+                if number_mismatch:
+                    rejected.append((start, end))
+                elif name is not None and score >= FUZZY_MIN_SCORE:
+                    found.append(Mention(name, start, end, score))
+        # A span that only missed a location by its number names an unknown place, so no part of it is a
+        # mention either: "hostel 9" is not "Girls Hostel"
+        found = [mention for mention in found
+                 if not any(start <= mention.start and mention.end <= end for start, end in rejected)]
+
+        # Keep the best mentions that don't overlap, preferring exact and longer ones
+        chosen = []
+        taken = set()
+        for mention in sorted(found, key=lambda m: (-m.score, m.start - m.end)):
+            span = set(range(mention.start, mention.end))
+            if not span & taken:
+                chosen.append(mention)
+                taken |= span
+        chosen.sort(key=lambda m: m.start)
+        return chosen
+
+    def resolve(self, query: str) -> Resolution:
+        """Pick the source and destination of a query, using cue words like "from" and "to" around mentions"""
+        tokens = normalize_query(query).split()
+        mentions = self.mentions(query)
+        source = destination = None
+        unassigned = []
+        for mention in mentions:
+            cue = mention.start - 1
+            while cue >= 0 and tokens[cue] in ARTICLES:
+                cue -= 1
+            if cue >= 0 and tokens[cue] in SOURCE_CUES and source is None:
+                source = mention
+            elif cue >= 0 and tokens[cue] in DESTINATION_CUES and destination is None:
+                destination = mention
+            else:
+                unassigned.append(mention)
+        # Otherwise the first mention is where the trip starts and the next one where it ends
+        for mention in unassigned:
+            if source is None:
+                source = mention
+            elif destination is None:
+                destination = mention
+        if source is not None and destination is not None and source.name == destination.name:
+            destination = None
+        confidence = min(source.score, destination.score) if source and destination else 0.0
+        return Resolution(source.name if source else None, destination.name if destination else None, confidence)
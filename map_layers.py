@@ -0,0 +1,164 @@
+import json
+import math
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from branca.element import MacroElement
+from jinja2 import Template
+from geodesy import EARTH_RADIUS
+from way_network import WayNetwork
+
+BoundingBox = Tuple[float, float, float, float]  # (min lat, min lon, max lat, max lon)
+
+def network_polylines(network: WayNetwork) -> List[np.ndarray]:
+    """
+    Merge the walkway edges into maximal polylines that only pass through degree-2 nodes,
+    so a way is drawn (and simplified) as one line instead of one line per edge.
+    Each polyline is an (n, 2) array of (lat, lon).
+    """
+    offsets, targets = network._offsets, network._targets
+    degree = np.diff(network.offsets).tolist()
+    visited = set()
+    chains = []
+
+    def walk(u: int, v: int) -> List[int]:
+        chain = [u, v]
+        visited.add((min(u, v), max(u, v)))
+        while degree[v] == 2:
+            a, b = targets[offsets[v]], targets[offsets[v] + 1]
+            w = b if a == chain[-2] else a
+            if (min(v, w), max(v, w)) in visited:
+                break
+            visited.add((min(v, w), max(v, w)))
+            chain.append(w)
+            v = w
+        return chain
+
+    # Chains start and end at junctions and dead ends; what's left over are closed loops
+    for start in [u for u in range(len(degree)) if degree[u] != 2] + list(range(len(degree))):
+        for i in range(offsets[start], offsets[start + 1]):
+            v = targets[i]
+            if (min(start, v), max(start, v)) not in visited:
+                chains.append(walk(start, v))
+
+    return [np.column_stack((network.lats[chain], network.lons[chain])) for chain in chains]
+
+def meters_per_pixel(zoom: int, lat: float) -> float:
+    """Ground resolution of a web-mercator map tile at the given zoom level and latitude"""
+    return 2 * math.pi * EARTH_RADIUS * math.cos(math.radians(lat)) / (256 * 2 ** zoom)
+
+def douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Simplify an (n, 2) polyline of (lat, lon) with the Douglas-Peucker algorithm, keeping every
+    point that is more than `tolerance` meters from the simplified line. The endpoints are always kept.
+    """
+    if len(points) < 3 or tolerance <= 0:
+        return points
+    # Project to local meters, which is accurate enough at map-rendering tolerances
+    lat0 = math.radians(float(points[:, 0].mean()))
+    y = np.radians(points[:, 0]) * EARTH_RADIUS
+    x = np.radians(points[:, 1]) * EARTH_RADIUS * math.cos(lat0)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length = math.hypot(dx, dy)
+        if length == 0:
+            distances = np.hypot(px, py)
+        else:
+            distances = np.abs(px * dy - py * dx) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+def simplify_polylines(lines: Sequence[np.ndarray], zoom: int, pixels: float = 1.0) -> List[np.ndarray]:
+    """Simplify every polyline so that no detail smaller than `pixels` screen pixels at `zoom` is kept"""
+    if not lines:
+        return []
+    lat = float(np.mean([line[0, 0] for line in lines]))
+    tolerance = pixels * meters_per_pixel(zoom, lat)
+    return [douglas_peucker(line, tolerance) for line in lines]
+
+def route_bounds(points: Sequence[Tuple[float, float]], margin: float) -> BoundingBox:
+    """Bounding box of (lat, lon) points, grown by `margin` meters on every side"""
+    lats = [lat for lat, _ in points]
+    lons = [lon for _, lon in points]
+    dlat = math.degrees(margin / EARTH_RADIUS)
+    dlon = dlat / max(math.cos(math.radians((min(lats) + max(lats)) / 2)), 1e-6)
+    return min(lats) - dlat, min(lons) - dlon, max(lats) + dlat, max(lons) + dlon
+
+def in_bounds(lat: float, lon: float, bounds: Optional[BoundingBox]) -> bool:
+    """Whether a point lies inside the bounding box (always True without one)"""
+    return bounds is None or (bounds[0] <= lat <= bounds[2] and bounds[1] <= lon <= bounds[3])
+
+def clip_polylines(lines: Sequence[np.ndarray], bounds: BoundingBox) -> List[np.ndarray]:
+    """
+    Keep only the parts of each polyline whose segments overlap the bounding box.
+    Runs of consecutive overlapping segments become separate polylines.
+    """
+    min_lat, min_lon, max_lat, max_lon = bounds
+    clipped = []
+    for line in lines:
+        lats, lons = line[:, 0], line[:, 1]
+        if lats.max() < min_lat or lats.min() > max_lat or lons.max() < min_lon or lons.min() > max_lon:
+            continue
+        overlaps = ((np.maximum(lats[:-1], lats[1:]) >= min_lat) & (np.minimum(lats[:-1], lats[1:]) <= max_lat)
+                    & (np.maximum(lons[:-1], lons[1:]) >= min_lon) & (np.minimum(lons[:-1], lons[1:]) <= max_lon))
+        if overlaps.all():
+            clipped.append(line)
+            continue
+        # Split into runs of overlapping segments; a run of segments i..j covers points i..j+1
+        edges = np.diff(np.concatenate(([0], overlaps.astype(np.int8), [0])))
+        for first, last in zip(np.nonzero(edges == 1)[0], np.nonzero(edges == -1)[0]):
+            clipped.append(line[first:last + 1])
+    return clipped
+
+def multilinestring_feature(lines: Sequence[np.ndarray], style: dict) -> dict:
+    """One GeoJSON MultiLineString feature holding every polyline, styled through its properties"""
+    return {
+        "type": "Feature",
+        "geometry": {"type": "MultiLineString",
+                     "coordinates": [np.round(line[:, ::-1], 7).tolist() for line in lines]},
+        "properties": {"style": style},
+    }
+
+def serialize_geojson(data: dict) -> str:
+    """Compact JSON for a GeoJSON object, escaped like folium's `tojson` so it can be inlined in a script"""
+    text = json.dumps(data, separators=(",", ":"))
+    return text.replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+
+class SerializedGeoJson(MacroElement):
+    """
+    A GeoJSON layer rendered from an already serialized string, so a cached layer costs neither
+    folium's data processing nor JSON encoding on each map. Features are styled through their
+    `properties.style`; points are drawn as circle markers with their `name` as popup.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.geoJson({{ this.data }}, {
+                style: function(feature) { return feature.properties.style; },
+                pointToLayer: function(feature, latlng) { return L.circleMarker(latlng, {radius: 6, fill: true}); },
+                onEachFeature: function(feature, layer) {
+                    if (feature.properties.name !== undefined) {
+                        var popup = document.createElement("div");
+                        popup.textContent = feature.properties.name;
+                        layer.bindPopup(popup);
+                    }
+                }
+            }).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+        """)
+
+    def __init__(self, data: str):
+        super().__init__()
+        self._name = "SerializedGeoJson"
+        self.data = data
@@ -0,0 +1,280 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+TRACE_ENV = "GIKI_TRACE"  # "1" writes traces to stderr, any other value is a file to append them to
+METRICS_PORT_ENV = "GIKI_METRICS_PORT"  # Serve /metrics and /metrics.json on this port
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)  # seconds
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class Histogram:
+    """Cumulative latency histogram in the Prometheus layout."""
+    __slots__ = ("buckets", "counts", "count", "total")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+class MetricsRegistry:
+    """Thread-safe counters and latency histograms, exported as Prometheus text or JSON."""
+
+    def __init__(self):
+        self._counters = {}  # name -> label key -> value
+        self._histograms = {}  # name -> label key -> Histogram
+        self._help = {}  # name -> description
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Add `value` to a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Record one duration in a histogram"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Time the block into a histogram (and a trace span, when tracing), counting errors separately"""
+        start = time.perf_counter()
+        with span(name, **labels):
+            try:
+                yield
+            except Exception:
+                self.inc(f"{name.rsplit('_seconds', 1)[0]}_errors_total", **labels)
+                raise
+            finally:
+                self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Return every metric as plain data"""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(key), "value": value}
+                        for name, series in self._counters.items() for key, value in series.items()]
+            histograms = [{"name": name, "labels": dict(key), "count": h.count, "sum": h.total,
+                           "buckets": {str(bound): n for bound, n in zip(h.buckets, h.counts)}}
+                          for name, series in self._histograms.items() for key, h in series.items()]
+        return {"counters": counters, "histograms": histograms}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    for bound, n in zip(h.buckets, h.counts):
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', str(bound)))} {n}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.total}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("giki_osm_parse_seconds", "Time to parse an OSM file into locations and edges")
+REGISTRY.describe("giki_graph_build_seconds", "Time to build or load the campus graph")
+REGISTRY.describe("giki_find_path_seconds", "find_path latency, including cache hits")
+REGISTRY.describe("giki_nodes_settled_total", "Nodes settled by shortest-path searches")
+REGISTRY.describe("giki_searches_total", "Shortest-path searches run (cache misses)")
+REGISTRY.describe("giki_visualize_path_seconds", "Time to build the folium map for a path")
+REGISTRY.describe("giki_gemini_seconds", "Gemini API call latency, per attempt")
+REGISTRY.describe("giki_gemini_retries_total", "Gemini calls retried after a retryable error")
+REGISTRY.describe("giki_gemini_timeouts_total", "Gemini attempts that hit their timeout or deadline")
+REGISTRY.describe("giki_llm_cache_hits_total", "Gemini responses served from the persistent cache")
+REGISTRY.describe("giki_llm_cache_misses_total", "Gemini response cache lookups that missed")
+REGISTRY.describe("giki_api_request_seconds", "JSON API request latency per endpoint")
+REGISTRY.describe("giki_location_resolutions_total", "Navigation queries resolved locally, from the cache or by Gemini")
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    REGISTRY.inc(name, value, **labels)
+
+def observe(name: str, seconds: float, **labels) -> None:
+    REGISTRY.observe(name, seconds, **labels)
+
+def timer(name: str, **labels):
+    return REGISTRY.timer(name, **labels)
+
+def timed(name: str, **labels) -> Callable:
+    """Decorator form of `timer`"""
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with REGISTRY.timer(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_search(algorithm: str, settled: int) -> None:
+    """Count one shortest-path search and the nodes it settled"""
+    REGISTRY.inc("giki_searches_total", algorithm=algorithm)
+    REGISTRY.inc("giki_nodes_settled_total", settled, algorithm=algorithm)
+    counts = _settled.get()
+    if counts is not None:
+        counts[algorithm] = counts.get(algorithm, 0) + settled
+    annotate(settled=settled)
+
+_settled = ContextVar("giki_settled", default=None)
+
+@contextmanager
+def settled_counter() -> Iterator[Dict[str, int]]:
+    """Collect the nodes settled by the searches run inside the block, per algorithm, for this thread only"""
+    counts = {}
+    token = _settled.set(counts)
+    try:
+        yield counts
+    finally:
+        _settled.reset(token)
+
+# Per-request tracing: spans opened while a request trace is active are collected and written
+# as one JSON line when the request ends. Enabled by setting GIKI_TRACE; otherwise a no-op.
+
+_trace = ContextVar("giki_trace", default=None)
+_trace_lock = threading.Lock()
+
+def tracing_enabled() -> bool:
+    return bool(os.environ.get(TRACE_ENV))
+
+@contextmanager
+def request_trace(name: str, **attributes) -> Iterator[Optional[Dict[str, Any]]]:
+    """Collect every span of one request and write them out when it finishes"""
+    if not tracing_enabled() or _trace.get() is not None:
+        yield None
+        return
+    trace = {"request": name, "attributes": attributes, "start": time.time(), "spans": [], "_stack": []}
+    token = _trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+        trace["duration_ms"] = (time.perf_counter() - start) * 1000
+        del trace["_stack"]
+        _write_trace(trace)
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[None]:
+    """Record a timed span in the active request trace, if any"""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    record = {"name": name, "depth": len(trace["_stack"]), "attributes": dict(attributes)}
+    trace["spans"].append(record)
+    trace["_stack"].append(record)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record["duration_ms"] = (time.perf_counter() - start) * 1000
+        trace["_stack"].pop()
+
+def annotate(**attributes) -> None:
+    """Attach attributes (e.g. nodes settled) to the innermost open span of the active trace"""
+    trace = _trace.get()
+    if trace is not None and trace["_stack"]:
+        trace["_stack"][-1]["attributes"].update(attributes)
+
+def _write_trace(trace: Dict[str, Any]) -> None:
+    destination = os.environ.get(TRACE_ENV, "")
+    line = json.dumps(trace, default=str)
+    with _trace_lock:
+        if destination == "1":
+            print(line, file=sys.stderr, flush=True)
+        else:
+            try:
+                with open(destination, "a") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"Could not write trace to {destination}: {e}")
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path in ("/metrics", "/"):
+            body, content_type = self.registry.to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = self.registry.to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_metrics(port: int, host: str = "0.0.0.0", registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus text) and /metrics.json from a background thread"""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
+
+def serve_metrics_from_env() -> Optional[ThreadingHTTPServer]:
+    """Start the metrics endpoint if GIKI_METRICS_PORT is set"""
+    port = os.environ.get(METRICS_PORT_ENV)
+    if not port:
+        return None
+    try:
+        return serve_metrics(int(port))
+    except (OSError, ValueError) as e:
+        print(f"Could not start metrics endpoint on port {port}: {e}")
+        return None
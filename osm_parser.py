@@ -1,7 +1,13 @@
 import osmium as osm
 import networkx as nx
-from typing import Dict, List, Tuple
-import math
+import numpy as np
+from array import array
+from typing import Dict, List, Optional, Tuple
+from geodesy import rowwise_distances
+from metrics import timed
+from osm_stream import NodeCollector
+from profiles import profile_tags
+from spatial_index import SpatialIndex
 
 class GIKIHandler(osm.SimpleHandler):
     def __init__(self):
@@ -9,6 +15,7 @@ class GIKIHandler(osm.SimpleHandler):
         self.locations = {}  # name -> (lat, lon)
         self.buildings = {}  # name -> (lat, lon)
         self.ways = []  # List of ways (paths)
+        self.way_tags = []  # Routing-relevant tags of each way (highway, surface, lit...)
         self.nodes = {}  # node_id -> (lat, lon)
         
     def node(self, n):
@@ -27,93 +34,112 @@ class GIKIHandler(osm.SimpleHandler):
         # Store ways (paths) between nodes
         if len(w.nodes) >= 2:
             self.ways.append([n.ref for n in w.nodes])
+            self.way_tags.append(profile_tags(w.tags))
 
-def parse_osm_file(file_path: str) -> Tuple[Dict[str, Tuple[float, float]], List[Tuple[str, str, float]]]:
+def build_way_graph(handler: GIKIHandler) -> nx.Graph:
     """
-    Parse the OSM file and return locations and edges with distances.
+    Build the node-level walkway graph from the ways collected by the handler.
+    Edge weights are Haversine distances in meters; each edge keeps its way's profile tags as 'tags'.
+    """
+    G = nx.Graph()
+    
+    # Add all nodes
+    for node_id, coords in handler.nodes.items():
+        G.add_node(node_id, pos=coords)
+    
+    # Add edges from ways, measuring them all in one vectorized call
+    pairs = [(node1, node2, tags) for way, tags in zip(handler.ways, handler.way_tags)
+             for node1, node2 in zip(way, way[1:]) if node1 in handler.nodes and node2 in handler.nodes]
+    if pairs:
+        start = np.array([handler.nodes[node1] for node1, _, _ in pairs])
+        end = np.array([handler.nodes[node2] for _, node2, _ in pairs])
+        distances = rowwise_distances(start[:, 0], start[:, 1], end[:, 0], end[:, 1])
+        G.add_edges_from((node1, node2, {"weight": distance, "tags": tags})
+                         for (node1, node2, tags), distance in zip(pairs, distances.tolist()))
+    
+    # Build the spatial index once so closest-node lookups don't scan every node
+    G.graph['spatial_index'] = SpatialIndex.from_graph(G)
+    
+    return G
+
+@timed("giki_osm_parse_seconds", loader="parse_osm_network")
+def parse_osm_network(file_path: str, k: int = 3, max_distance: Optional[float] = None
+                      ) -> Tuple[Dict[str, Tuple[float, float]], List[Tuple[str, str, float]], nx.Graph]:
+    """
+    Parse the OSM file and return locations, location edges and the walkway graph.
+    Each location is connected to its `k` nearest neighbors within `max_distance` meters.
     Returns:
         - locations: Dictionary mapping location names to their (lat, lon) coordinates
         - edges: List of tuples (location1, location2, distance_in_meters)
+        - way_graph: Node-level graph of the OSM ways keyed by OSM node id
     """
     handler = GIKIHandler()
     handler.apply_file(file_path)
     
     # Create a graph from the ways
-    G = nx.Graph()
-    
-    # Add all nodes
-    for node_id, coords in handler.nodes.items():
-        G.add_node(node_id, pos=coords)
-    
-    # Add edges from ways
-    for way in handler.ways:
-        for i in range(len(way) - 1):
-            node1 = way[i]
-            node2 = way[i + 1]
-            if node1 in handler.nodes and node2 in handler.nodes:
-                # Calculate distance in meters using Haversine formula
-                lat1, lon1 = handler.nodes[node1]
-                lat2, lon2 = handler.nodes[node2]
-                distance = haversine_distance(lat1, lon1, lat2, lon2)
-                G.add_edge(node1, node2, weight=distance)
+    G = build_way_graph(handler)
     
     # Combine all named locations
     all_locations = {**handler.locations, **handler.buildings}
     
-    # Create edges between named locations
-    edges = []
-    location_names = list(all_locations.keys())
-    
     # Connect each location to its nearest neighbors
-    for i in range(len(location_names)):
-        name1 = location_names[i]
-        coords1 = all_locations[name1]
-        
-        # Find distances to all other locations
-        distances = []
-        for j in range(len(location_names)):
-            if i != j:
-                name2 = location_names[j]
-                coords2 = all_locations[name2]
-                distance = haversine_distance(coords1[0], coords1[1], coords2[0], coords2[1])
-                distances.append((distance, j))
-        
-        # Sort by distance and connect to the 3 nearest neighbors
-        distances.sort()
-        for dist, j in distances[:3]:  # Connect to 3 nearest neighbors
-            name2 = location_names[j]
-            edges.append((name1, name2, dist))
+    edges = nearest_location_edges(all_locations, k=k, max_distance=max_distance)
     
-    return all_locations, edges
+    return all_locations, edges, G
 
-def find_closest_node(graph: nx.Graph, coords: Tuple[float, float]) -> int:
-    """Find the closest node in the graph to the given coordinates."""
-    min_dist = float('inf')
-    closest_node = None
-    
-    for node, data in graph.nodes(data=True):
-        node_coords = data['pos']
-        dist = haversine_distance(coords[0], coords[1], node_coords[0], node_coords[1])
-        if dist < min_dist:
-            min_dist = dist
-            closest_node = node
-    
-    return closest_node
+@timed("giki_osm_parse_seconds", loader="parse_osm_file")
+def parse_osm_file(file_path: str, k: int = 3, max_distance: Optional[float] = None
+                   ) -> Tuple[Dict[str, Tuple[float, float]], List[Tuple[str, str, float]]]:
+    """
+    Parse the OSM file and return locations and edges with distances.
+    Each location is connected to its `k` nearest neighbors within `max_distance` meters.
+    Only named nodes are kept: no way or walkway graph is built.
+    Returns:
+        - locations: Dictionary mapping location names to their (lat, lon) coordinates
+        - edges: List of tuples (location1, location2, distance_in_meters)
+    """
+    # With no wanted node ids the collector only records the named locations
+    nodes = NodeCollector(array('q'))
+    nodes.apply_file(file_path)
+    all_locations = {**nodes.locations, **nodes.buildings}
+    return all_locations, nearest_location_edges(all_locations, k=k, max_distance=max_distance)
 
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+def nearest_location_edges(locations: Dict[str, Tuple[float, float]], k: int = 3,
+                           max_distance: Optional[float] = None) -> List[Tuple[str, str, float]]:
     """
-    Calculate the Haversine distance between two points in meters.
+    Connect each location to its `k` nearest neighbors using a spatial index.
+    Neighbors further than `max_distance` meters are skipped.
+    Returns a list of tuples (location1, location2, distance_in_meters).
     """
-    R = 6371000  # Earth's radius in meters
+    names = list(locations.keys())
+    if len(names) < 2 or k <= 0:
+        return []
+    
+    coords = np.array([locations[name] for name in names], dtype=np.float64)
+    index = SpatialIndex(np.arange(len(names)), coords[:, 0], coords[:, 1])
     
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
+    # Query one extra neighbor since every point is its own nearest neighbor
+    neighbors, _ = index.query(coords[:, 0], coords[:, 1], k=min(k + 1, len(names)), max_distance=max_distance)
     
-    a = (math.sin(delta_phi/2) * math.sin(delta_phi/2) +
-         math.cos(phi1) * math.cos(phi2) *
-         math.sin(delta_lambda/2) * math.sin(delta_lambda/2))
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    # Drop self matches and missing neighbors, then keep the first k per row
+    valid = (neighbors != np.arange(len(names))[:, None]) & (neighbors < len(names))
+    valid &= np.cumsum(valid, axis=1) <= k
+    rows, cols = np.nonzero(valid)
+    targets = neighbors[rows, cols]
+    distances = rowwise_distances(coords[rows, 0], coords[rows, 1], coords[targets, 0], coords[targets, 1])
     
-    return R * c 
\ No newline at end of file
+    return [(names[i], names[j], float(dist)) for i, j, dist in zip(rows, targets, distances)]
+
+def find_closest_node(graph: nx.Graph, coords: Tuple[float, float]) -> int:
+    """
+    Find the closest node in the graph to the given coordinates.
+    Uses the graph's spatial index, building and storing it on first use.
+    """
+    index = graph.graph.get('spatial_index')
+    if index is None or len(index) != graph.number_of_nodes():
+        index = graph.graph['spatial_index'] = SpatialIndex.from_graph(graph)
+    if not len(index):
+        return None
+    
+    closest_node, _ = index.nearest(coords[0], coords[1])
+    return closest_node
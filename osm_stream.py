@@ -0,0 +1,163 @@
+import osmium as osm
+from array import array
+from bisect import bisect_left
+from typing import Collection, Dict, Mapping, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from geodesy import rowwise_distances
+from metrics import timed
+from profiles import intern_tags, profile_tags
+from way_network import WayNetwork
+
+# Highway values a pedestrian can walk along
+WALKABLE_HIGHWAYS = frozenset({
+    'footway', 'path', 'pedestrian', 'steps', 'living_street', 'residential', 'service',
+    'track', 'unclassified', 'tertiary', 'tertiary_link', 'secondary', 'secondary_link',
+    'primary', 'primary_link', 'cycleway', 'corridor', 'bridleway', 'road',
+})
+
+def is_walkable(tags, highways: Optional[Collection[str]] = WALKABLE_HIGHWAYS) -> bool:
+    """Return whether a way with these tags passes the highway filter (None keeps every way)"""
+    if highways is None:
+        return True
+    return tags.get('highway') in highways and tags.get('foot') != 'no'
+
+class WayRefs(NamedTuple):
+    """Node references of the kept ways, flattened into arrays sorted by way id."""
+    ids: np.ndarray  # Way ids, sorted
+    ends: np.ndarray  # End offset of each way's references in `refs`
+    refs: np.ndarray  # Node ids of every way, concatenated
+
+    @classmethod
+    def build(cls, ids: np.ndarray, lengths: np.ndarray, refs: np.ndarray) -> "WayRefs":
+        """Sort ways by id, moving each way's block of references along with it"""
+        ids = np.asarray(ids, dtype=np.int64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        starts = np.cumsum(lengths) - lengths
+        order = np.argsort(ids, kind='stable')
+        sorted_lengths = lengths[order]
+        sorted_starts = np.cumsum(sorted_lengths) - sorted_lengths
+        gather = np.repeat(starts[order] - sorted_starts, sorted_lengths) + np.arange(int(sorted_lengths.sum()))
+        return cls(ids[order], np.cumsum(sorted_lengths), np.asarray(refs, dtype=np.int64)[gather])
+
+    def refs_of(self, way_id: int) -> Optional[np.ndarray]:
+        """Return the node references of a way, or None if it is not stored"""
+        i = int(np.searchsorted(self.ids, way_id))
+        if i >= len(self.ids) or self.ids[i] != way_id:
+            return None
+        return self.refs[(self.ends[i - 1] if i else 0):self.ends[i]]
+
+    def replace(self, changes: Mapping[int, Optional[Sequence[int]]]) -> "WayRefs":
+        """Return a copy with the given ways replaced by new references (None deletes the way)"""
+        keep = ~np.isin(self.ids, np.fromiter(changes.keys(), dtype=np.int64, count=len(changes)))
+        lengths = np.diff(self.ends, prepend=0)
+        added = {way_id: refs for way_id, refs in changes.items() if refs is not None}
+        return WayRefs.build(
+            np.concatenate((self.ids[keep], np.fromiter(added.keys(), dtype=np.int64, count=len(added)))),
+            np.concatenate((lengths[keep], [len(refs) for refs in added.values()])),
+            np.concatenate([self.refs[np.repeat(keep, lengths)]] + [np.asarray(refs, dtype=np.int64) for refs in added.values()]))
+
+class WayCollector(osm.SimpleHandler):
+    """
+    First pass: keep only the node references of ways that pass the highway filter.
+    References are stored flat in a typed array, with a second array of way end offsets.
+    The tags routing profiles use are interned into a small table, with one class id per way.
+    """
+
+    def __init__(self, highways: Optional[Collection[str]] = WALKABLE_HIGHWAYS):
+        osm.SimpleHandler.__init__(self)
+        self.highways = highways  # None keeps every way
+        self.way_ids = array('q')
+        self.refs = array('q')
+        self.way_ends = array('q')
+        self.way_classes = array('i')
+        self.tag_classes = [()]  # Class id -> profile tags; 0 is untagged
+        self._class_index = {(): 0}
+
+    def way(self, w):
+        if len(w.nodes) < 2 or not is_walkable(w.tags, self.highways):
+            return
+        self.way_ids.append(w.id)
+        self.refs.extend(n.ref for n in w.nodes)
+        self.way_ends.append(len(self.refs))
+        self.way_classes.append(intern_tags(self.tag_classes, self._class_index, profile_tags(w.tags)))
+
+class NodeCollector(osm.SimpleHandler):
+    """
+    Second pass: store the coordinates of the referenced nodes in typed arrays,
+    and collect every named location as GIKIHandler does.
+    """
+
+    def __init__(self, wanted: array):
+        osm.SimpleHandler.__init__(self)
+        self.wanted = wanted  # Sorted node ids referenced by the collected ways
+        self.ids = array('q')
+        self.lats = array('d')
+        self.lons = array('d')
+        self.locations = {}  # name -> (lat, lon)
+        self.buildings = {}  # name -> (lat, lon)
+        self.location_ids = {}  # name -> OSM node id, for locations and buildings alike
+
+    def node(self, n):
+        if 'name' in n.tags:
+            name = n.tags['name']
+            self.location_ids[name] = n.id
+            if 'building' in n.tags:
+                self.buildings[name] = (n.location.lat, n.location.lon)
+            else:
+                self.locations[name] = (n.location.lat, n.location.lon)
+
+        i = bisect_left(self.wanted, n.id)
+        if i < len(self.wanted) and self.wanted[i] == n.id:
+            self.ids.append(n.id)
+            self.lats.append(n.location.lat)
+            self.lons.append(n.location.lon)
+
+@timed("giki_osm_parse_seconds", loader="load_walkway_network")
+def load_walkway_network(file_path: str, highways: Optional[Collection[str]] = WALKABLE_HIGHWAYS
+                         ) -> Tuple[Dict[str, Tuple[float, float]], WayNetwork, WayRefs, Dict[str, int]]:
+    """
+    Stream an .osm/.pbf file in two passes and build the walkway network directly into arrays.
+    Only nodes referenced by ways whose highway tag is in `highways` are kept (None keeps every way),
+    so memory scales with the pedestrian network rather than the whole file.
+    Returns:
+        - locations: Dictionary mapping location names to their (lat, lon) coordinates
+        - network: WayNetwork over the largest connected component of the walkways, with the
+          routing-relevant tags of each edge's way
+        - ways: Node references of every kept way, used to apply incremental updates
+        - location_ids: OSM node id of each location, so an osmChange can delete or rename it
+    """
+    ways = WayCollector(highways)
+    ways.apply_file(file_path)
+    refs = np.frombuffer(ways.refs, dtype=np.int64) if len(ways.refs) else np.empty(0, dtype=np.int64)
+    way_ends = np.frombuffer(ways.way_ends, dtype=np.int64) if len(ways.way_ends) else np.empty(0, dtype=np.int64)
+
+    wanted = array('q')
+    wanted.frombytes(np.unique(refs).tobytes())
+    nodes = NodeCollector(wanted)
+    nodes.apply_file(file_path)
+    ids = np.frombuffer(nodes.ids, dtype=np.int64) if len(nodes.ids) else np.empty(0, dtype=np.int64)
+    lats = np.frombuffer(nodes.lats, dtype=np.float64) if len(nodes.lats) else np.empty(0)
+    lons = np.frombuffer(nodes.lons, dtype=np.float64) if len(nodes.lons) else np.empty(0)
+
+    # Consecutive references form an edge, except across the boundary between two ways
+    consecutive = np.ones(max(len(refs) - 1, 0), dtype=bool)
+    consecutive[way_ends[:-1] - 1] = False
+    first, second = refs[:-1][consecutive], refs[1:][consecutive]
+    # Each edge takes the tag class of its way
+    way_classes = np.frombuffer(ways.way_classes, dtype=np.int32) if len(ways.way_classes) else np.empty(0, dtype=np.int32)
+    classes = np.repeat(way_classes, np.diff(way_ends, prepend=0))[:-1][consecutive] if len(refs) else way_classes
+
+    # Map OSM ids to node positions, dropping edges whose nodes are missing from the file
+    order = np.argsort(ids)
+    sorted_ids = ids[order]
+    first_pos = np.minimum(np.searchsorted(sorted_ids, first), max(len(ids) - 1, 0))
+    second_pos = np.minimum(np.searchsorted(sorted_ids, second), max(len(ids) - 1, 0))
+    found = (sorted_ids[first_pos] == first) & (sorted_ids[second_pos] == second) if len(ids) else np.zeros(len(first), dtype=bool)
+    sources, targets = order[first_pos[found]], order[second_pos[found]]
+
+    weights = rowwise_distances(lats[sources], lons[sources], lats[targets], lons[targets])
+    network = WayNetwork.from_arrays(ids, lats, lons, sources, targets, weights,
+                                     edge_classes=classes[found], tag_classes=ways.tag_classes)
+    way_ids = np.frombuffer(ways.way_ids, dtype=np.int64) if len(ways.way_ids) else np.empty(0, dtype=np.int64)
+    way_refs = WayRefs.build(way_ids, np.diff(way_ends, prepend=0), refs)
+    return {**nodes.locations, **nodes.buildings}, network, way_refs, nodes.location_ids
@@ -0,0 +1,90 @@
+from typing import Callable, Dict, List, Mapping, Sequence, Tuple
+import numpy as np
+
+# Way tags that routing profiles look at; every other tag is dropped when parsing
+PROFILE_TAGS = ("highway", "surface", "lit", "wheelchair", "incline", "smoothness")
+
+WALKING_SPEED = 1.4  # m/s on a paved path
+STEPS_SPEED = 0.5  # m/s of horizontal distance on a staircase
+UNPAVED_SPEED = 1.15  # m/s on gravel, dirt, grass...
+
+UNPAVED_SURFACES = frozenset({
+    'unpaved', 'gravel', 'fine_gravel', 'pebblestone', 'dirt', 'earth', 'ground', 'grass', 'mud', 'sand',
+    'woodchips', 'compacted', 'rock', 'grass_paver',
+})
+ROUGH_SMOOTHNESS = frozenset({'bad', 'very_bad', 'horrible', 'very_horrible', 'impassable'})
+# Roads that are usually street-lit even when the lit tag is missing
+USUALLY_LIT = frozenset({'residential', 'living_street', 'pedestrian', 'service', 'tertiary', 'secondary', 'primary'})
+
+TagSet = Tuple[Tuple[str, str], ...]
+
+def profile_tags(tags: Mapping[str, str]) -> TagSet:
+    """Keep only the tags routing profiles use, as a hashable sorted tuple"""
+    return tuple(sorted((key, tags[key]) for key in PROFILE_TAGS if key in tags))
+
+def _walking_time(tags: Dict[str, str]) -> float:
+    # Seconds per meter
+    if tags.get('highway') == 'steps':
+        return 1 / STEPS_SPEED
+    if tags.get('surface') in UNPAVED_SURFACES or tags.get('highway') == 'track':
+        return 1 / UNPAVED_SPEED
+    return 1 / WALKING_SPEED
+
+def _wheelchair(tags: Dict[str, str]) -> float:
+    # Meters, with rough ground counted several times over and impassable ways excluded
+    if tags.get('highway') == 'steps' or tags.get('wheelchair') == 'no':
+        return float('inf')
+    if tags.get('wheelchair') == 'yes':
+        return 1.0
+    if tags.get('surface') in UNPAVED_SURFACES or tags.get('smoothness') in ROUGH_SMOOTHNESS:
+        return 4.0
+    if tags.get('incline') not in (None, 'no', '0', '0%'):
+        return 2.0
+    return 1.0
+
+def _night_safe(tags: Dict[str, str]) -> float:
+    # Meters, with unlit ways counted several times over
+    lit = tags.get('lit')
+    if lit in ('yes', '24/7', 'automatic', 'limited'):
+        return 1.0
+    if lit == 'no':
+        return 3.0
+    return 1.25 if tags.get('highway') in USUALLY_LIT else 2.0
+
+# Cost per meter of an edge with the given tags
+PROFILES: Dict[str, Callable[[Dict[str, str]], float]] = {
+    "distance": lambda tags: 1.0,  # Meters
+    "walking_time": _walking_time,  # Seconds
+    "wheelchair": _wheelchair,
+    "night_safe": _night_safe,
+}
+DEFAULT_PROFILE = "distance"
+
+def compile_profiles(lengths: np.ndarray, edge_classes: np.ndarray,
+                     tag_classes: Sequence[TagSet]) -> Dict[str, np.ndarray]:
+    """
+    Precompute one edge-cost array per profile over the same edges. Profiles are evaluated once
+    per distinct tag combination, not per edge, and searches then just read a different array.
+    """
+    lengths = np.asarray(lengths, dtype=np.float64)
+    weights = {}
+    for name, cost in PROFILES.items():
+        factors = np.array([cost(dict(tags)) for tags in tag_classes], dtype=np.float64)[edge_classes]
+        # Impassable stays impassable even for zero-length edges (0 * inf would be nan)
+        with np.errstate(invalid='ignore'):
+            weights[name] = np.where(np.isinf(factors), np.inf, lengths * factors)
+    return weights
+
+def check_profile(profile: str) -> str:
+    """Return the profile name, raising ValueError if it is unknown"""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}; expected one of {', '.join(PROFILES)}")
+    return profile
+
+def intern_tags(table: List[TagSet], index: Dict[TagSet, int], tags: TagSet) -> int:
+    """Return the id of a tag combination in `table` (looked up through `index`), appending it if new"""
+    class_id = index.get(tags)
+    if class_id is None:
+        class_id = index[tags] = len(table)
+        table.append(tags)
+    return class_id
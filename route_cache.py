@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+def reverse_path(result: Tuple[List[str], float]) -> Tuple[List[str], float]:
+    """Reverse a (path, distance) result; shortest paths on an undirected graph work both ways"""
+    path, distance = result
+    return path[::-1], distance
+
+class RouteCache:
+    """
+    Thread-safe LRU cache of routing results keyed on (start, end, algorithm, graph version).
+    A miss also checks the reverse direction before computing, since the graph is undirected.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Tuple[Hashable, ...]) -> Any:
+        # Caller must hold the lock
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def get(self, start: str, end: str, algorithm: str, version: int,
+            reverse: Callable[[Any], Any] = reverse_path) -> Any:
+        """Return the cached result for a query (or its reverse), or None on a miss"""
+        with self._lock:
+            value = self._lookup((start, end, algorithm, version))
+            if value is None:
+                value = self._lookup((end, start, algorithm, version))
+                if value is not None:
+                    value = reverse(value)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, start: str, end: str, algorithm: str, version: int, value: Any) -> None:
+        """Store a result, evicting the least recently used entries beyond `maxsize`"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[(start, end, algorithm, version)] = value
+            self._entries.move_to_end((start, end, algorithm, version))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, start: str, end: str, algorithm: str, version: int, compute: Callable[[], Any],
+                       reverse: Callable[[Any], Any] = reverse_path) -> Any:
+        """Return the cached result for a query, computing and storing it on a miss"""
+        value = self.get(start, end, algorithm, version, reverse=reverse)
+        if value is None:
+            # Compute outside the lock so slow searches don't block other sessions
+            value = compute()
+            self.put(start, end, algorithm, version, value)
+        return value
+
+    def rekey(self, old_version: int, new_version: int, keep: Callable[[Tuple, Any], bool]) -> None:
+        """
+        Carry entries of `old_version` over to `new_version` when `keep(key, value)` says the
+        graph change cannot have affected them; every other entry is dropped.
+        """
+        with self._lock:
+            entries = OrderedDict()
+            for key, value in self._entries.items():
+                if key[3] == old_version and keep(key, value):
+                    entries[key[:3] + (new_version,)] = value
+            self._entries = entries
+
+    def clear(self) -> None:
+        """Drop every cached result and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Return the cache size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,98 @@
+import math
+from typing import Any, List, Optional, Sequence, Tuple
+import networkx as nx
+import numpy as np
+from scipy.spatial import cKDTree
+from geodesy import EARTH_RADIUS
+
+def unit_vectors(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Convert latitudes/longitudes in degrees to 3D points on the unit sphere.
+    Euclidean (chord) distance between these points grows monotonically with the
+    great-circle distance, so a KD-tree over them answers exact nearest-neighbor queries.
+    """
+    phi = np.radians(lats)
+    lam = np.radians(lons)
+    cos_phi = np.cos(phi)
+    return np.column_stack((cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)))
+
+def chord_length(distance: float) -> float:
+    """Convert a great-circle distance in meters to the matching unit-sphere chord length."""
+    return 2 * math.sin(min(distance / (2 * EARTH_RADIUS), math.pi / 2))
+
+def chord_to_meters(chord: np.ndarray) -> np.ndarray:
+    """Convert unit-sphere chord lengths back to great-circle distances in meters."""
+    return 2 * EARTH_RADIUS * np.arcsin(np.minimum(np.asarray(chord) / 2, 1.0))
+
+class SpatialIndex:
+    """
+    KD-tree over points on the unit sphere, built once and queried many times.
+    Every query returns the stored ids together with great-circle distances in meters.
+    """
+
+    def __init__(self, ids: Sequence[Any], lats: np.ndarray, lons: np.ndarray):
+        self.ids = np.asarray(ids) if len(ids) else np.empty(0, dtype=np.int64)
+        self.tree = cKDTree(unit_vectors(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)).reshape(-1, 3))
+
+    @classmethod
+    def from_graph(cls, graph: nx.Graph) -> "SpatialIndex":
+        """Index every node of a graph whose nodes carry a (lat, lon) 'pos' attribute"""
+        nodes = list(graph.nodes())
+        coords = np.array([graph.nodes[node]['pos'] for node in nodes], dtype=np.float64).reshape(-1, 2)
+        return cls(nodes, coords[:, 0], coords[:, 1])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def query(self, lats: np.ndarray, lons: np.ndarray, k: int = 1,
+              max_distance: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batched k-nearest query returning raw positions into `ids` and distances in meters.
+        Both arrays have shape (len(lats), k); missing neighbors have position len(self) and distance inf.
+        """
+        points = unit_vectors(np.atleast_1d(lats), np.atleast_1d(lons))
+        bound = chord_length(max_distance) if max_distance is not None else np.inf
+        chords, positions = self.tree.query(points, k=k, distance_upper_bound=bound)
+        chords = np.asarray(chords).reshape(len(points), k)
+        positions = np.asarray(positions).reshape(len(points), k)
+        return positions, np.where(np.isinf(chords), np.inf, chord_to_meters(np.where(np.isinf(chords), 0, chords)))
+
+    def nearest(self, lat: float, lon: float) -> Tuple[Any, float]:
+        """Return the id closest to the given coordinates and its distance in meters"""
+        ids, distances = self.nearest_many([lat], [lon])
+        return ids[0].item(), float(distances[0])
+
+    def nearest_many(self, lats: Sequence[float], lons: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the closest id and its distance in meters for each pair of coordinates"""
+        if not len(self):
+            raise ValueError("Spatial index is empty")
+        positions, distances = self.query(lats, lons)
+        return self.ids[positions[:, 0]], distances[:, 0]
+
+    def k_nearest(self, lat: float, lon: float, k: int) -> List[Tuple[Any, float]]:
+        """Return up to k (id, distance) pairs closest to the given coordinates, nearest first"""
+        ids, distances = self.k_nearest_many([lat], [lon], k)
+        return [(node.item(), float(dist)) for node, dist in zip(ids[0], distances[0])]
+
+    def k_nearest_many(self, lats: Sequence[float], lons: Sequence[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return arrays of shape (len(lats), min(k, len(self))) with the closest ids and their distances"""
+        k = min(k, len(self))
+        if k <= 0:
+            return self.ids[:0].reshape(len(lats), 0), np.empty((len(lats), 0))
+        positions, distances = self.query(lats, lons, k=k)
+        return self.ids[positions], distances
+
+    def within_radius(self, lat: float, lon: float, radius: float) -> List[Tuple[Any, float]]:
+        """Return every (id, distance) pair within `radius` meters, nearest first"""
+        return self.within_radius_many([lat], [lon], radius)[0]
+
+    def within_radius_many(self, lats: Sequence[float], lons: Sequence[float], radius: float) -> List[List[Tuple[Any, float]]]:
+        """Return, for each pair of coordinates, every (id, distance) pair within `radius` meters, nearest first"""
+        points = unit_vectors(np.atleast_1d(lats), np.atleast_1d(lons))
+        results = []
+        for point, positions in zip(points, self.tree.query_ball_point(points, chord_length(radius))):
+            positions = np.asarray(positions, dtype=np.int64)
+            distances = chord_to_meters(np.linalg.norm(self.tree.data[positions] - point, axis=1))
+            order = np.argsort(distances, kind='stable')
+            results.append([(self.ids[i].item(), float(distances[j])) for j, i in zip(order, positions[order])])
+        return results
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from alternatives import MAX_STRETCH, alternative_paths
+from geodesy import haversine_distance
+from graph_algorithms import CampusGraph
+from landmarks import LandmarkIndex
+from metrics import settled_counter
+from way_network import WayNetwork
+
+STEP = 0.0009  # About 100 m of latitude
+
+def corridors():
+    """
+    Three corridors between the same two ends: a straight middle one of 6 edges, one 1 step to the
+    north and one 1.1 steps to the south (both within the stretch limit), plus a short bump on the
+    middle corridor that is a detour rather than an alternative. Returns the network and the node
+    indices of the ends, the north and south corridors and the bump.
+    """
+    points = {}
+    edges = []
+
+    def node(name, lat, lon):
+        points[name] = (lat, lon)
+        return name
+
+    def chain(names):
+        edges.extend(zip(names, names[1:]))
+
+    middle = [node(("m", c), 0.0, c * STEP) for c in range(7)]
+    north = [node(("n", c), STEP, c * STEP) for c in range(7)]
+    south = [node(("s", c), -1.1 * STEP, c * STEP) for c in range(7)]
+    bump = [node(("b", c), 0.2 * STEP, c * STEP) for c in (2, 3)]
+    chain(middle)
+    chain([middle[0]] + north + [middle[-1]])
+    chain([middle[0]] + south + [middle[-1]])
+    chain([middle[2]] + bump + [middle[3]])
+
+    names = list(points)
+    index = {name: i for i, name in enumerate(names)}
+    lats = np.array([points[name][0] for name in names])
+    lons = np.array([points[name][1] for name in names])
+    sources = np.array([index[u] for u, _ in edges])
+    targets = np.array([index[v] for _, v in edges])
+    weights = np.array([haversine_distance(*points[u], *points[v]) for u, v in edges])
+    network = WayNetwork.from_arrays(np.arange(len(names)), lats, lons, sources, targets, weights)
+    nodes = {name: network.index_of(i) for name, i in index.items()}
+    return network, nodes
+
+@pytest.fixture(scope="module")
+def grid():
+    return corridors()
+
+def test_alternatives_take_the_other_corridors(grid):
+    network, nodes = grid
+    source, target = nodes["m", 0], nodes["m", 6]
+    routes = alternative_paths(network, source, target, k=3)
+
+    assert [path for path, _ in routes] == [
+        [nodes["m", c] for c in range(7)],
+        [source] + [nodes["n", c] for c in range(7)] + [target],
+        [source] + [nodes["s", c] for c in range(7)] + [target],
+    ]
+    costs = [cost for _, cost in routes]
+    assert costs == sorted(costs)
+    assert costs[-1] <= MAX_STRETCH * costs[0]
+
+def test_detour_is_rejected_by_overlap_and_plateau(grid):
+    network, nodes = grid
+    source, target = nodes["m", 0], nodes["m", 6]
+    detour = [nodes["m", 0], nodes["m", 1], nodes["m", 2], nodes["b", 2], nodes["b", 3],
+              nodes["m", 3], nodes["m", 4], nodes["m", 5], nodes["m", 6]]
+
+    def paths(**limits):
+        return [path for path, _ in alternative_paths(network, source, target, k=4, **limits)]
+
+    assert detour not in paths(min_plateau=0.0)
+    assert detour not in paths(max_overlap=1.0)
+    assert paths(min_plateau=0.0, max_overlap=1.0)[1] == detour
+
+def test_more_alternatives_cost_no_more_searching(grid):
+    network, nodes = grid
+    source, target = nodes["m", 0], nodes["m", 6]
+    with settled_counter() as two:
+        fewer = alternative_paths(network, source, target, k=2)
+    with settled_counter() as three:
+        more = alternative_paths(network, source, target, k=3)
+    assert fewer == more[:2]
+    assert two == three
+
+def test_landmark_bounds_find_the_same_routes(grid):
+    network, nodes = grid
+    landmarks = LandmarkIndex.build(network, count=4)
+    for source, target in [(nodes["m", 0], nodes["m", 6]), (nodes["n", 5], nodes["s", 1])]:
+        assert (alternative_paths(network, source, target, landmarks=landmarks)
+                == alternative_paths(network, source, target))
+
+def test_shortest_alternative_answers_find_route():
+    campus = CampusGraph("giki.osm")
+    best, *_ = campus.find_alternatives("GIKI Guest House", "Tuc Shop")
+    assert campus.find_route("GIKI Guest House", "Tuc Shop") is best
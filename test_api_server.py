@@ -0,0 +1,56 @@
+import json
+import pytest
+from api_server import RoutingAPI
+from graph_algorithms import CampusGraph
+
+@pytest.fixture(scope="module")
+def api():
+    return RoutingAPI(CampusGraph("giki.osm"))
+
+def post(api, endpoint, payload):
+    return api.handle("POST", endpoint, json.dumps(payload).encode())
+
+def test_tour_without_stops_is_a_bad_request(api):
+    status, payload = post(api, "/tour", {"stops": []})
+    assert status == 400
+    assert "stops" in payload["error"]
+
+def test_tour_visits_every_stop(api):
+    stops = list(api.campus.node_positions)[:4]
+    status, payload = post(api, "/tour", {"stops": stops})
+    assert status == 200
+    assert sorted(payload["stops"][:-1]) == sorted(stops)
+    assert payload["stops"][0] == payload["stops"][-1] == stops[0]
+
+def test_route_to_itself_along_the_walkways_is_empty(api):
+    status, payload = api.handle("GET", "/route?from=Library&to=Library&algorithm=network", b"")
+    assert status == 200
+    assert payload["path"] == ["Library"]
+    assert payload["distance"] == 0.0
+
+def test_matrix_diagonal_along_the_walkways_is_zero(api):
+    names = list(api.campus.node_positions)[:5]
+    status, payload = post(api, "/matrix", {"sources": names, "targets": names, "algorithm": "network"})
+    assert status == 200
+    assert [payload["distances"][i][i] for i in range(len(names))] == [0.0] * len(names)
+    assert all(d > 0 for i, row in enumerate(payload["distances"]) for j, d in enumerate(row) if i != j)
+
+@pytest.mark.parametrize("payload", [
+    {"from": ["Library"], "to": "Entrance"},
+    {"from": "Library", "to": {"name": "Entrance"}},
+    {"from": "Library", "to": "Entrance", "algorithm": 1},
+    {"from": "Library", "to": "Entrance", "profile": ["walking"]},
+])
+def test_route_with_non_string_parameters_is_a_bad_request(api, payload):
+    status, response = post(api, "/route", payload)
+    assert status == 400
+    assert "must be a string" in response["error"]
+
+def test_nearest_with_negative_radius_is_a_bad_request(api):
+    lat, lon = api.campus.node_positions["Library"]
+    status, payload = api.handle("GET", f"/nearest?lat={lat}&lon={lon}&radius=-5", b"")
+    assert status == 400
+    assert "radius" in payload["error"]
+    status, payload = api.handle("GET", f"/nearest?lat={lat}&lon={lon}&radius=50", b"")
+    assert status == 200
+    assert payload["locations"][0]["name"] == "Library"
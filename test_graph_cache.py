@@ -0,0 +1,36 @@
+import itertools
+import shutil
+import pytest
+from graph_algorithms import CampusGraph
+from graph_cache import file_hash, read_compiled_graph
+
+@pytest.fixture
+def osm_file(tmp_path):
+    path = tmp_path / "campus.osm"
+    shutil.copy("giki.osm", path)
+    return str(path)
+
+def test_cached_graph_routes_like_a_fresh_one(osm_file, tmp_path):
+    cache = str(tmp_path / "campus.graph")
+    fresh = CampusGraph(osm_file)
+    fresh.save(cache)
+    loaded = CampusGraph.from_cache(cache, osm_file=osm_file)
+
+    # Landmark distances stay memory-mapped until the first ALT query
+    assert loaded.network is not None and loaded._walkways.landmarks._rows is None
+    names = list(fresh.node_positions)
+    assert list(loaded.node_positions) == names
+    for start, end in itertools.permutations(names, 2):
+        for algorithm in ("dijkstra", "astar", "network", "alt"):
+            assert loaded.find_path(start, end, algorithm) == fresh.find_path(start, end, algorithm)
+
+def test_changed_osm_file_rebuilds_the_cache(osm_file, tmp_path):
+    cache = str(tmp_path / "campus.graph")
+    CampusGraph.from_cache(cache, osm_file=osm_file)
+    assert read_compiled_graph(cache)[0]["source_hash"] == file_hash(osm_file)
+
+    with open(osm_file, "a") as f:
+        f.write("\n")
+    campus = CampusGraph.from_cache(cache, osm_file=osm_file)
+    assert campus.source_hash == file_hash(osm_file)
+    assert read_compiled_graph(cache)[0]["source_hash"] == file_hash(osm_file)
@@ -0,0 +1,131 @@
+import itertools
+import math
+import xml.etree.ElementTree as ET
+import networkx as nx
+import pytest
+from graph_algorithms import CampusGraph
+from graph_patch import GraphPatch
+
+def write_osm(tmp_path, edit, name="edited.osm"):
+    """Copy giki.osm with `edit(root)` applied, to rebuild a graph from scratch for comparison"""
+    tree = ET.parse("giki.osm")
+    edit(tree.getroot())
+    path = tmp_path / name
+    tree.write(path, encoding="UTF-8", xml_declaration=True)
+    return str(path)
+
+def way_element(root, way_id):
+    return next(way for way in root.iter("way") if way.get("id") == str(way_id))
+
+def route_distances(campus):
+    distances = {}
+    for start, end in itertools.combinations(sorted(campus.node_positions), 2):
+        try:
+            distances[start, end] = campus.find_path(start, end, "network")[1]
+        except nx.NetworkXNoPath:
+            distances[start, end] = math.inf
+    return distances
+
+def assert_same_routes(patched, rebuilt):
+    assert sorted(patched.node_positions) == sorted(rebuilt.node_positions)
+    snapped = {loc: int(patched.network.node_ids[node]) for loc, node in patched.location_nodes.items()}
+    assert snapped == {loc: int(rebuilt.network.node_ids[node]) for loc, node in rebuilt.location_nodes.items()}
+    expected = route_distances(rebuilt)
+    for pair, distance in route_distances(patched).items():
+        assert distance == pytest.approx(expected[pair]), pair
+
+@pytest.fixture
+def campus():
+    campus = CampusGraph("giki.osm")
+    route_distances(campus)  # Fill the route cache, so stale entries would show up
+    return campus
+
+def cycle_edge(campus):
+    """A walkway edge whose removal keeps the network connected, as OSM node ids, with its way"""
+    graph = campus.network.to_networkx()
+    bridges = {frozenset(edge) for edge in nx.bridges(graph)}
+    ways = campus.ways
+    for i, way_id in enumerate(ways.ids.tolist()):
+        refs = ways.refs_of(way_id).tolist()
+        for k, edge in enumerate(zip(refs, refs[1:])):
+            if graph.has_edge(*edge) and frozenset(edge) not in bridges and 0 < k < len(refs) - 2:
+                return edge, way_id, k
+
+def split_way(root, way_id, k):
+    # Replace the way with two ways that leave out its k-th edge
+    way = way_element(root, way_id)
+    nds = way.findall("nd")
+    tail = ET.SubElement(root, "way", {"id": "9000000001", "version": "1"})
+    for nd in nds[k + 1:]:
+        way.remove(nd)
+        tail.append(nd)
+    for tag in way.findall("tag"):
+        ET.SubElement(tail, "tag", dict(tag.attrib))
+
+def test_close_and_open_edge(campus, tmp_path):
+    (u, v), way_id, k = cycle_edge(campus)
+    before = route_distances(campus)
+    campus.apply_patch(GraphPatch().close_edge(u, v))
+    assert_same_routes(campus, CampusGraph(write_osm(tmp_path, lambda root: split_way(root, way_id, k))))
+    assert route_distances(campus) != before
+
+    campus.apply_patch(GraphPatch().open_edge(u, v))
+    assert route_distances(campus) == pytest.approx(before)
+
+def test_set_way_adds_a_shortcut(campus, tmp_path):
+    names = sorted(campus.node_positions)
+    start, end = names[0], names[-1]
+    first = int(campus.network.node_ids[campus.location_nodes[start]])
+    last = int(campus.network.node_ids[campus.location_nodes[end]])
+    tags = (("highway", "footway"),)
+    before = campus.find_path(start, end, "network")[1]
+    campus.apply_patch(GraphPatch().set_way(9000000002, [first, last], tags))
+
+    def add_way(root):
+        way = ET.SubElement(root, "way", {"id": "9000000002", "version": "1"})
+        ET.SubElement(way, "nd", {"ref": str(first)})
+        ET.SubElement(way, "nd", {"ref": str(last)})
+        ET.SubElement(way, "tag", {"k": "highway", "v": "footway"})
+
+    assert_same_routes(campus, CampusGraph(write_osm(tmp_path, add_way)))
+    assert campus.find_path(start, end, "network")[1] < before
+
+def test_delete_way(campus, tmp_path):
+    _, way_id, _ = cycle_edge(campus)
+    campus.apply_patch(GraphPatch().delete_way(way_id))
+    rebuilt = CampusGraph(write_osm(tmp_path, lambda root: root.remove(way_element(root, way_id))))
+    assert_same_routes(campus, rebuilt)
+
+def test_add_and_remove_location(campus, tmp_path):
+    lat, lon = campus.node_positions["Library"]
+    campus.apply_patch(GraphPatch().add_location("Bookshop", lat + 0.0005, lon + 0.0005))
+
+    def add_node(root):
+        node = ET.SubElement(root, "node", {"id": "9000000003", "version": "1",
+                                            "lat": str(lat + 0.0005), "lon": str(lon + 0.0005)})
+        ET.SubElement(node, "tag", {"k": "name", "v": "Bookshop"})
+
+    assert_same_routes(campus, CampusGraph(write_osm(tmp_path, add_node)))
+    assert campus.find_path("Bookshop", "Entrance")[1] > 0
+
+    campus.apply_patch(GraphPatch().remove_location("Bookshop"))
+    assert_same_routes(campus, CampusGraph("giki.osm"))
+    with pytest.raises(nx.NodeNotFound):
+        campus.find_path("Bookshop", "Entrance")
+
+def test_osm_change_deletes_and_renames_locations(campus, tmp_path):
+    ids = campus.location_ids
+    library, tuc_shop = ids["Library"], ids["Tuc Shop"]
+    lat, lon = campus.node_positions["Tuc Shop"]
+    change = tmp_path / "change.osc"
+    change.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n<osmChange version="0.6">\n'
+        f'<delete><node id="{library}" version="9" lat="0" lon="0"/></delete>\n'
+        f'<modify><node id="{tuc_shop}" version="9" lat="{lat}" lon="{lon}">'
+        '<tag k="name" v="Tuck Shop"/></node></modify>\n</osmChange>\n')
+    campus.apply_patch(GraphPatch.from_osm_change(str(change), location_ids=campus.location_ids))
+
+    assert "Library" not in campus.node_positions and "Tuc Shop" not in campus.node_positions
+    assert campus.node_positions["Tuck Shop"] == (lat, lon)
+    assert campus.location_ids["Tuck Shop"] == tuc_shop
+    assert campus.location_resolver().resolve("tuck shop").source == "Tuck Shop"
@@ -0,0 +1,15 @@
+from landmarks import LandmarkIndex, verify_against_networkx
+from osm_stream import load_walkway_network
+
+def test_alt_matches_networkx_dijkstra():
+    _, network, _, _ = load_walkway_network("giki.osm")
+    index = LandmarkIndex.build(network)
+    assert len(index.landmarks) > 1
+    assert verify_against_networkx(network, index, samples=500) == []
+
+def test_lower_bound_never_exceeds_the_distance():
+    _, network, _, _ = load_walkway_network("giki.osm")
+    index = LandmarkIndex.build(network, count=4)
+    distances = network.shortest_distances(0)
+    for node in range(len(network)):
+        assert index.lower_bound(0, node) <= distances[node] + 1e-6
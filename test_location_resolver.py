@@ -0,0 +1,13 @@
+from location_resolver import LocationResolver
+
+NAMES = ["Hostel 7", "Girls Hostel", "Library", "Tuc Shop", "Entrance"]
+
+def test_unknown_numbered_place_is_not_a_mention():
+    resolver = LocationResolver(NAMES)
+    assert resolver.resolve("from hostel 9 to cafe").source is None
+    assert resolver.resolve("hostel 9 to library") == (None, "Library", 0.0)
+
+def test_numbered_place_still_matches_its_misspelling():
+    resolver = LocationResolver(NAMES)
+    assert resolver.resolve("from hostl 7 to library")[:2] == ("Hostel 7", "Library")
+    assert resolver.resolve("from girls hostel to library")[:2] == ("Girls Hostel", "Library")
@@ -0,0 +1,23 @@
+import json
+from graph_algorithms import CampusGraph
+from graph_patch import GraphPatch
+
+def test_base_layer_is_serialized_once_per_version_and_zoom():
+    campus = CampusGraph("giki.osm")
+    layer = campus.base_layer(16, walkways=True)
+    assert campus.base_layer(16, walkways=True) is layer
+    assert campus.base_layer(14, walkways=True) is not layer
+    names = {f["properties"]["name"] for f in json.loads(layer)["features"] if "name" in f["properties"]}
+    assert names == set(campus.node_positions)
+
+    lat, lon = campus.node_positions["Library"]
+    campus.apply_patch(GraphPatch().add_location("Bookshop", lat + 0.0005, lon + 0.0005))
+    assert "Bookshop" in campus.base_layer(16, walkways=True)
+    assert "Bookshop" in campus.visualize_path(["Bookshop"]).get_root().render()
+
+def test_clipped_base_layer_is_not_cached():
+    campus = CampusGraph("giki.osm")
+    lat, lon = campus.node_positions["Library"]
+    clipped = campus.base_layer(16, walkways=True, bounds=(lat - 0.001, lon - 0.001, lat + 0.001, lon + 0.001))
+    assert len(clipped) < len(campus.base_layer(16, walkways=True))
+    assert campus.map_layers().serialized.keys() == {(16, True)}
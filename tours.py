@@ -0,0 +1,148 @@
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
+import numpy as np
+from way_network import Route
+
+EXACT_MAX_STOPS = 12  # Held-Karp is O(2^n n^2): instant up to here, then local search takes over
+TIME_BUDGET = 0.5  # seconds of 2-opt / Or-opt improvement for larger tours
+OR_OPT_SEGMENTS = (1, 2, 3)  # Lengths of the stop sequences Or-opt tries to move
+
+class Tour(NamedTuple):
+    """An ordered visit of several locations."""
+    stops: List[str]  # Stops in visiting order, ending with the first again for a round trip
+    distance: float  # Total walking distance in meters
+    path: List[str]  # Every location passed, the legs stitched together
+    legs: List[Union[List[str], Route]]  # Path (or walkway Route) of each leg between consecutive stops
+    route: Optional[Route]  # The whole tour as one walkway route, when routed along the walkways
+    optimal: bool  # Whether the order is proven shortest (exact search) or the best found in the time budget
+
+def _cost(dist: np.ndarray, order: Sequence[int], closed: bool) -> float:
+    legs = list(zip(order, order[1:])) + ([(order[-1], order[0])] if closed and len(order) > 1 else [])
+    return float(sum(dist[u, v] for u, v in legs))
+
+def held_karp(dist: np.ndarray, closed: bool = True) -> Tuple[List[int], float]:
+    """
+    Exact shortest order of visiting every row of a distance matrix, starting at 0 and returning to it
+    if `closed`, by dynamic programming over subsets: best[S][j] is the shortest walk from 0 through
+    the set S of other stops ending at j. Returns the order (starting with 0, without the return) and its cost.
+    """
+    n = len(dist)
+    if n <= 2:
+        order = list(range(n))
+        return order, _cost(dist, order, closed)
+    d = dist.tolist()
+    m = n - 1  # Stops other than the start, as bits 0..m-1 for stops 1..n-1
+    full = (1 << m) - 1
+    best = [[float('inf')] * m for _ in range(1 << m)]
+    parent = [[-1] * m for _ in range(1 << m)]
+    for j in range(m):
+        best[1 << j][j] = d[0][j + 1]
+    for subset in range(1, 1 << m):
+        row = best[subset]
+        for j in range(m):
+            cost = row[j]
+            if cost == float('inf') or not subset >> j & 1:
+                continue
+            dj = d[j + 1]
+            for k in range(m):
+                if subset >> k & 1:
+                    continue
+                extended = subset | 1 << k
+                new_cost = cost + dj[k + 1]
+                if new_cost < best[extended][k]:
+                    best[extended][k] = new_cost
+                    parent[extended][k] = j
+    ends = [best[full][j] + (d[j + 1][0] if closed else 0.0) for j in range(m)]
+    last = min(range(m), key=ends.__getitem__)
+    order = []
+    subset = full
+    while last >= 0:
+        order.append(last + 1)
+        subset, last = subset & ~(1 << last), parent[subset][last]
+    order.append(0)
+    order.reverse()
+    return order, ends[order[-1] - 1]
+
+def nearest_neighbor(dist: np.ndarray) -> List[int]:
+    """Greedy order from stop 0: always walk to the closest stop not visited yet"""
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    order = [0]
+    for _ in range(n - 1):
+        candidates = np.where(visited, np.inf, dist[order[-1]])
+        nxt = int(np.argmin(candidates))
+        visited[nxt] = True
+        order.append(nxt)
+    return order
+
+def improve(dist: np.ndarray, order: List[int], closed: bool = True, time_budget: float = TIME_BUDGET) -> List[int]:
+    """
+    Shorten an order (starting with the fixed stop 0) by 2-opt segment reversals and Or-opt moves
+    of 1-3 consecutive stops, until no move helps or `time_budget` seconds have passed.
+    """
+    d = dist.tolist()
+    order = list(order)
+    n = len(order)
+    deadline = time.perf_counter() + time_budget
+
+    def link(a: int, b: Optional[int]) -> float:
+        # An open tour ends after its last stop, which costs nothing
+        return 0.0 if b is None else d[a][b]
+
+    def after(i: int) -> Optional[int]:
+        return order[i + 1] if i + 1 < n else (order[0] if closed else None)
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        # 2-opt: reverse order[i..j], replacing edges (a, b) and (c, e) with (a, c) and (b, e)
+        for i in range(1, n - 1):
+            a, b = order[i - 1], order[i]
+            for j in range(i + 1, n):
+                c, e = order[j], after(j)
+                if link(a, c) + link(b, e) < link(a, b) + link(c, e) - 1e-9:
+                    order[i:j + 1] = order[i:j + 1][::-1]
+                    b = order[i]
+                    improved = True
+            if time.perf_counter() >= deadline:
+                return order
+        # Or-opt: move a short run of stops (possibly reversed) between two other consecutive stops
+        for length in OR_OPT_SEGMENTS:
+            i = 1
+            while i + length <= n:
+                segment = order[i:i + length]
+                p, nxt = order[i - 1], after(i + length - 1)
+                removed = link(p, segment[0]) + link(segment[-1], nxt) - link(p, nxt)
+                rest = order[:i] + order[i + length:]
+                best_gain, best_move = 1e-9, None
+                for q in range(len(rest)):
+                    u = rest[q]
+                    w = rest[q + 1] if q + 1 < len(rest) else (rest[0] if closed else None)
+                    if u == p:
+                        continue  # Its current place
+                    for run in (segment, segment[::-1]):
+                        gain = removed - (link(u, run[0]) + link(run[-1], w) - link(u, w))
+                        if gain > best_gain:
+                            best_gain, best_move = gain, (q, run)
+                if best_move is not None:
+                    q, run = best_move
+                    order = rest[:q + 1] + run + rest[q + 1:]
+                    improved = True
+                i += 1
+            if time.perf_counter() >= deadline:
+                return order
+    return order
+
+def optimize_order(dist: np.ndarray, closed: bool = True, time_budget: float = TIME_BUDGET,
+                   exact_max_stops: int = EXACT_MAX_STOPS) -> Tuple[List[int], float, bool]:
+    """
+    Best order of visiting every row of a distance matrix, starting at row 0: exact for up to
+    `exact_max_stops` stops, otherwise nearest neighbor improved by local search within `time_budget`.
+    Returns the order, its cost and whether it is proven optimal.
+    """
+    if len(dist) <= exact_max_stops:
+        order, cost = held_karp(dist, closed)
+        return order, cost, True
+    order = improve(dist, nearest_neighbor(dist), closed, time_budget)
+    return order, _cost(dist, order, closed), False
@@ -0,0 +1,326 @@
+import heapq
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+import networkx as nx
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from geodesy import EARTH_RADIUS, haversine_distance
+from metrics import record_search
+from profiles import DEFAULT_PROFILE, PROFILES, TagSet, compile_profiles, intern_tags
+from spatial_index import SpatialIndex
+
+class RouteSegment(NamedTuple):
+    """A single straight piece of a route between two coordinates."""
+    start: Tuple[float, float]
+    end: Tuple[float, float]
+    length: float
+
+class Route(NamedTuple):
+    """A route along the walkway network between two named locations."""
+    path: List[str]  # Named locations passed along the way (start ... end)
+    distance: float  # Total walking distance in meters
+    nodes: List[int]  # OSM node ids of the walkway nodes visited
+    segments: List[RouteSegment]  # Per-segment geometry, including the access legs
+
+class WayNetwork:
+    """
+    Compact CSR (compressed sparse row) adjacency over the OSM walkway graph.
+    Nodes are addressed by dense integer indices; `node_ids` maps them back to OSM ids.
+    Each edge also has a tag class (the routing-relevant tags of its way), from which one
+    cost array per routing profile is precomputed over the same topology.
+    """
+
+    def __init__(self, node_ids: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+                 offsets: np.ndarray, targets: np.ndarray, weights: np.ndarray,
+                 spatial_index: Optional[SpatialIndex] = None, edge_classes: Optional[np.ndarray] = None,
+                 tag_classes: Optional[Sequence[TagSet]] = None):
+        self.node_ids = node_ids
+        self.lats = lats
+        self.lons = lons
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights  # Edge lengths in meters
+        self.edge_classes = np.zeros(len(targets), dtype=np.int32) if edge_classes is None else edge_classes
+        # Class id -> profile tags; class 0 is always the untagged class
+        self.tag_classes = [tuple(tuple(tag) for tag in tags) for tags in (tag_classes or [()])]
+        self.profile_weights = compile_profiles(weights, self.edge_classes, self.tag_classes)
+        # Lowest cost per meter of each profile, to scale straight-line distances into lower bounds
+        self.min_cost_per_meter = {name: min(cost(dict(tags)) for tags in self.tag_classes)
+                                   for name, cost in PROFILES.items()}
+        self.spatial_index = spatial_index or SpatialIndex(np.arange(len(node_ids)), lats, lons)
+        # Node ids are sorted when built, but nodes added by later patches are appended at the end
+        self._id_order = np.argsort(node_ids, kind='stable')
+        self._sorted_ids = np.asarray(node_ids)[self._id_order]
+        # Plain lists are much faster than NumPy scalars inside the search loop
+        self._offsets = offsets.tolist()
+        self._targets = targets.tolist()
+        self._weights = weights.tolist()
+        self._profile_weights = {name: self._weights if name == DEFAULT_PROFILE else costs.tolist()
+                                 for name, costs in self.profile_weights.items()}
+
+    @classmethod
+    def from_arrays(cls, node_ids: np.ndarray, lats: np.ndarray, lons: np.ndarray,
+                    sources: np.ndarray, targets: np.ndarray, weights: np.ndarray,
+                    edge_classes: Optional[np.ndarray] = None,
+                    tag_classes: Optional[Sequence[TagSet]] = None) -> "WayNetwork":
+        """
+        Build the CSR adjacency from parallel node arrays and undirected edge arrays (node positions),
+        keeping only the largest connected component. Duplicate edges and self-loops are dropped.
+        `edge_classes` gives each edge's index into `tag_classes`, the profile tags of its way.
+        """
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        order = np.argsort(node_ids, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        node_ids, lats, lons = node_ids[order], np.asarray(lats)[order], np.asarray(lons)[order]
+        sources, targets = rank[np.asarray(sources, dtype=np.int64)], rank[np.asarray(targets, dtype=np.int64)]
+        weights = np.asarray(weights, dtype=np.float64)
+        classes = (np.zeros(len(weights), dtype=np.int32) if edge_classes is None
+                   else np.asarray(edge_classes, dtype=np.int32))
+
+        # Normalize undirected edges to (low, high) and drop duplicates and self-loops
+        low, high = np.minimum(sources, targets), np.maximum(sources, targets)
+        keep = low != high
+        low, high, weights, classes = low[keep], high[keep], weights[keep], classes[keep]
+        _, first = np.unique(low * len(node_ids) + high, return_index=True)
+        low, high, weights, classes = low[first], high[first], weights[first], classes[first]
+
+        # Keep the largest connected component
+        if len(low):
+            adjacency = coo_matrix((np.ones(len(low)), (low, high)), shape=(len(node_ids), len(node_ids)))
+            _, labels = connected_components(adjacency, directed=False)
+            in_component = labels == np.argmax(np.bincount(labels))
+        else:
+            in_component = np.zeros(len(node_ids), dtype=bool)
+        position = np.cumsum(in_component) - 1
+        keep = in_component[low]
+        low, high, weights, classes = position[low[keep]], position[high[keep]], weights[keep], classes[keep]
+        node_ids, lats, lons = node_ids[in_component], lats[in_component], lons[in_component]
+
+        # Store both directions, grouped by source node
+        sources = np.concatenate((low, high))
+        targets = np.concatenate((high, low))
+        weights = np.concatenate((weights, weights))
+        classes = np.concatenate((classes, classes))
+        order = np.lexsort((targets, sources))
+        offsets = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(node_ids)), out=offsets[1:])
+
+        return cls(node_ids, np.ascontiguousarray(lats, dtype=np.float64), np.ascontiguousarray(lons, dtype=np.float64),
+                   offsets, targets[order].astype(np.int64), weights[order],
+                   edge_classes=classes[order], tag_classes=tag_classes)
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def index_of(self, node_id: int) -> int:
+        """Return the index of an OSM node id"""
+        i = int(self.indices_of([node_id])[0])
+        if i < 0:
+            raise KeyError(node_id)
+        return i
+
+    def indices_of(self, node_ids: Sequence[int]) -> np.ndarray:
+        """Return the indices of many OSM node ids, with -1 for ids not in the network"""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        if not len(self):
+            return np.full(len(node_ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self._sorted_ids, node_ids), len(self) - 1)
+        return np.where(self._sorted_ids[positions] == node_ids, self._id_order[positions], -1)
+
+    def patched(self, node_ids: Sequence[int] = (), lats: Sequence[float] = (), lons: Sequence[float] = (),
+                remove: Sequence[Tuple[int, int]] = (), add: Sequence[Tuple[int, int, float]] = (),
+                reweight: Sequence[Tuple[int, int, float]] = (),
+                add_tags: Optional[Sequence[TagSet]] = None) -> "WayNetwork":
+        """
+        Return a copy of the network with nodes appended and edges removed, added or reweighted.
+        Edges are given as node index pairs, where appended nodes continue the existing numbering.
+        `add_tags` gives the profile tags of each added edge (untagged if not given).
+        Existing node indices are unchanged, and this network is left untouched for in-flight searches.
+        """
+        n = len(self) + len(node_ids)
+        sources = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.offsets))
+        targets = np.asarray(self.targets, dtype=np.int64)
+        weights = np.array(self.weights, dtype=np.float64)
+        classes = np.asarray(self.edge_classes, dtype=np.int32)
+        keys = sources * n + targets
+
+        def edge_keys(edges):
+            pairs = np.asarray([edge[:2] for edge in edges], dtype=np.int64).reshape(-1, 2)
+            return np.concatenate((pairs[:, 0] * n + pairs[:, 1], pairs[:, 1] * n + pairs[:, 0]))
+
+        # Added edges replace any existing edge between the same nodes
+        keep = ~np.isin(keys, np.concatenate((edge_keys(remove), edge_keys(add))))
+        sources, targets, weights, classes, keys = sources[keep], targets[keep], weights[keep], classes[keep], keys[keep]
+
+        if len(reweight):
+            new_keys = edge_keys(reweight)
+            new_weights = np.tile(np.asarray([edge[2] for edge in reweight], dtype=np.float64), 2)
+            order = np.argsort(new_keys)
+            matched = np.isin(keys, new_keys)
+            weights[matched] = new_weights[order][np.searchsorted(new_keys[order], keys[matched])]
+
+        tag_classes = self.tag_classes
+        if len(add):
+            added = np.asarray([edge[:2] for edge in add], dtype=np.int64).reshape(-1, 2)
+            added_weights = np.asarray([edge[2] for edge in add], dtype=np.float64)
+            added_classes = np.zeros(len(add), dtype=np.int32)
+            if add_tags is not None:
+                tag_classes = list(tag_classes)
+                index = {tags: i for i, tags in enumerate(tag_classes)}
+                added_classes[:] = [intern_tags(tag_classes, index, tags) for tags in add_tags]
+            sources = np.concatenate((sources, added[:, 0], added[:, 1]))
+            targets = np.concatenate((targets, added[:, 1], added[:, 0]))
+            weights = np.concatenate((weights, added_weights, added_weights))
+            classes = np.concatenate((classes, added_classes, added_classes))
+
+        order = np.lexsort((targets, sources))
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+
+        if len(node_ids):
+            return WayNetwork(np.concatenate((self.node_ids, np.asarray(node_ids, dtype=np.int64))),
+                              np.concatenate((self.lats, np.asarray(lats, dtype=np.float64))),
+                              np.concatenate((self.lons, np.asarray(lons, dtype=np.float64))),
+                              offsets, targets[order], weights[order],
+                              edge_classes=classes[order], tag_classes=tag_classes)
+        # Same nodes, so the spatial index can be shared
+        return WayNetwork(self.node_ids, self.lats, self.lons, offsets, targets[order], weights[order],
+                          spatial_index=self.spatial_index, edge_classes=classes[order], tag_classes=tag_classes)
+
+    def coordinates(self, node: int) -> Tuple[float, float]:
+        """Return the (lat, lon) of a node index"""
+        return float(self.lats[node]), float(self.lons[node])
+
+    def nearest_node(self, lat: float, lon: float) -> int:
+        """Return the index of the network node closest to the given coordinates"""
+        return int(self.nearest_nodes([lat], [lon])[0])
+
+    def nearest_nodes(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        Return the indices of the network nodes closest to each pair of coordinates.
+        Nodes a patch has left without any edge are skipped, as a rebuilt network wouldn't have them.
+        """
+        nodes, _ = self.spatial_index.nearest_many(lats, lons)
+        degrees = np.diff(self.offsets)
+        isolated = degrees[nodes] == 0
+        if isolated.any() and degrees.any():
+            connected = np.nonzero(degrees)[0]
+            index = SpatialIndex(connected, self.lats[connected], self.lons[connected])
+            nodes[isolated], _ = index.nearest_many(np.asarray(lats)[isolated], np.asarray(lons)[isolated])
+        return nodes
+
+    def straight_line_distances(self, target: int) -> np.ndarray:
+        """
+        Chord distance in meters from every node to a node index. It never exceeds the walking distance,
+        so it is a consistent A* heuristic for edges weighted by their length.
+        """
+        points = self.spatial_index.tree.data  # Unit vectors, indexed like the nodes
+        offsets = points - points[target]
+        return np.sqrt(np.einsum('ij,ij->i', offsets, offsets)) * EARTH_RADIUS
+
+    def edge_weight(self, u: int, v: int) -> float:
+        """Return the weight of the edge between two node indices"""
+        for i in range(self._offsets[u], self._offsets[u + 1]):
+            if self._targets[i] == v:
+                return self._weights[i]
+        raise KeyError((u, v))
+
+    def shortest_path(self, source: int, target: int, profile: str = DEFAULT_PROFILE) -> Tuple[List[int], float]:
+        """
+        Dijkstra's algorithm over the CSR arrays, stopping once the target is settled.
+        Edge costs come from the precomputed array of `profile`; the returned cost is in its units.
+        """
+        offsets, targets, weights = self._offsets, self._targets, self._profile_weights[profile]
+        dist = [float('inf')] * len(offsets)
+        prev = [-1] * len(offsets)
+        settled = bytearray(len(offsets))
+        settled_count = 0
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+
+        while heap:
+            d, u = heapq.heappop(heap)
+            if settled[u]:
+                continue
+            if u == target:
+                break
+            settled[u] = 1
+            settled_count += 1
+            for i in range(offsets[u], offsets[u + 1]):
+                v = targets[i]
+                nd = d + weights[i]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(heap, (nd, v))
+        else:
+            record_search("network", settled_count)
+            raise nx.NetworkXNoPath(f"No walkway path between {source} and {target}")
+        record_search("network", settled_count + 1)
+
+        path = [target]
+        while path[-1] != source:
+            path.append(prev[path[-1]])
+        path.reverse()
+        return path, dist[target]
+
+    def shortest_distances(self, source: int, profile: str = DEFAULT_PROFILE) -> List[float]:
+        """Dijkstra's algorithm from one source to every node (inf where unreachable)"""
+        offsets, targets, weights = self._offsets, self._targets, self._profile_weights[profile]
+        dist = [float('inf')] * (len(offsets) - 1)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for i in range(offsets[u], offsets[u + 1]):
+                v = targets[i]
+                nd = d + weights[i]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return dist
+
+    def to_networkx(self) -> nx.Graph:
+        """Export the network as a networkx graph keyed by OSM node id, with 'pos' and 'weight' attributes"""
+        G = nx.Graph()
+        for i, node_id in enumerate(self.node_ids.tolist()):
+            G.add_node(node_id, pos=self.coordinates(i))
+        for u in range(len(self)):
+            for i in range(self._offsets[u], self._offsets[u + 1]):
+                G.add_edge(int(self.node_ids[u]), int(self.node_ids[self._targets[i]]), weight=self._weights[i])
+        return G
+
+    def segments(self, nodes: List[int]) -> List[RouteSegment]:
+        """Return the geometry of a node index path as a list of segments"""
+        return [RouteSegment(self.coordinates(u), self.coordinates(v), self.edge_weight(u, v))
+                for u, v in zip(nodes, nodes[1:])]
+
+def reverse_route(route: Route) -> Route:
+    """Return the same route walked in the opposite direction"""
+    return Route(route.path[::-1], route.distance, route.nodes[::-1],
+                 [RouteSegment(segment.end, segment.start, segment.length) for segment in reversed(route.segments)])
+
+def join_routes(routes: List[Route]) -> Route:
+    """Join routes that each start where the previous one ends into a single route"""
+    path = list(routes[0].path)
+    nodes = list(routes[0].nodes)
+    segments = list(routes[0].segments)
+    for route in routes[1:]:
+        path.extend(route.path[1:])
+        nodes.extend(route.nodes[1:] if nodes and route.nodes and route.nodes[0] == nodes[-1] else route.nodes)
+        segments.extend(route.segments)
+    return Route(path, sum(route.distance for route in routes), nodes, segments)
+
+def route_points(route: Route) -> List[Tuple[float, float]]:
+    """Coordinates along a route, from start to end (none for a route that stays in place)"""
+    if not route.segments:
+        return []
+    return [route.segments[0].start] + [segment.end for segment in route.segments]
+
+def access_segment(start: Tuple[float, float], end: Tuple[float, float]) -> RouteSegment:
+    """Straight segment between a named location and its snapped network node"""
+    return RouteSegment(start, end, haversine_distance(start[0], start[1], end[0], end[1]))